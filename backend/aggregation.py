@@ -0,0 +1,163 @@
+import re
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Mapping
+
+from indexes import DatasetIndexes, GROUP_DIMENSIONS
+from utils import segment_quantile
+
+DEFAULT_VALUE_COLUMN = 'Salary_Avg_USD'
+DEFAULT_AGGREGATES = ['count', 'mean', 'min', 'max']
+SIMPLE_AGGREGATES = {'count', 'sum', 'mean', 'min', 'max', 'std', 'median'}
+_PERCENTILE_PATTERN = re.compile(r'^p(\d{1,2}(?:\.\d+)?|100)$')
+
+
+def _split_list_arg(args: Mapping[str, str], name: str) -> List[str]:
+    raw = args.get(name) or ''
+    return [item.strip() for item in raw.split(',') if item.strip()]
+
+
+def parse_dimensions(args: Mapping[str, str], indexes: DatasetIndexes) -> List[str]:
+    """Read `dimensions=Country,Role_Name`; every name must be a known, loaded dimension."""
+    dimensions = _split_list_arg(args, 'dimensions')
+    for dimension in dimensions:
+        if dimension not in GROUP_DIMENSIONS:
+            raise ValueError(f"Unknown dimension '{dimension}' "
+                             f"(choose from {', '.join(GROUP_DIMENSIONS)})")
+        if dimension not in indexes.dimensions:
+            raise ValueError(f"Dimension '{dimension}' is not available for this dataset")
+    if len(set(dimensions)) != len(dimensions):
+        raise ValueError('Dimensions must not repeat')
+    return dimensions
+
+
+def parse_aggregates(args: Mapping[str, str]) -> List[str]:
+    """Read `aggregates=count,mean,p90`; percentiles are written pXX (0-100)."""
+    aggregates = _split_list_arg(args, 'aggregates') or list(DEFAULT_AGGREGATES)
+    for name in aggregates:
+        if name not in SIMPLE_AGGREGATES and not _PERCENTILE_PATTERN.match(name):
+            raise ValueError(f"Unknown aggregate '{name}' "
+                             f"(choose from {', '.join(sorted(SIMPLE_AGGREGATES))} or pXX)")
+    return aggregates
+
+
+def parse_percentiles(args: Mapping[str, str]) -> List[float]:
+    """Read `percentiles=25,50,90` (0-100) into fractions; defaults to the quartiles plus P90."""
+    raw = _split_list_arg(args, 'percentiles') or ['25', '50', '75', '90']
+    try:
+        fractions = [float(value) / 100 for value in raw]
+    except ValueError:
+        raise ValueError("Invalid value for 'percentiles': expected numbers") from None
+    if any(not 0 <= fraction <= 1 for fraction in fractions):
+        raise ValueError("Invalid value for 'percentiles': must be between 0 and 100")
+    return fractions
+
+
+def value_column(salary_data: pd.DataFrame, args: Mapping[str, str]) -> str:
+    """Read `value=` (defaults to Salary_Avg_USD); it must name a numeric column."""
+    column = args.get('value') or DEFAULT_VALUE_COLUMN
+    if column not in salary_data.columns or not pd.api.types.is_numeric_dtype(salary_data[column]):
+        raise ValueError(f"'{column}' is not a numeric column of this dataset")
+    return column
+
+
+def _quantile_fraction(name: str) -> float:
+    return 0.5 if name == 'median' else float(name[1:]) / 100
+
+
+def group_aggregate(indexes: DatasetIndexes, values: np.ndarray, positions: np.ndarray,
+                    dimensions: List[str], aggregates: List[str]) -> Dict[str, np.ndarray]:
+    """Aggregate `values[positions]` per combination of `dimensions`.
+
+    Group membership comes from the precomputed dimension codes, so this is one
+    bincount pass for count/sum/mean/std plus, only when order statistics are
+    requested, a single lexsort whose segments give min/max/median/pXX. Groups come
+    back in sorted key order (like pandas groupby) as parallel column arrays.
+    """
+    values = np.asarray(values, dtype=float)[positions]
+    valid = ~np.isnan(values)
+    values = values[valid]
+    codes = [indexes.dimensions[d].codes[positions][valid] for d in dimensions]
+    sizes = [len(indexes.dimensions[d].uniques) for d in dimensions]
+
+    if dimensions:
+        keys = np.ravel_multi_index(codes, sizes)
+    else:
+        keys = np.zeros(len(values), dtype=np.intp)
+    group_keys, group_ids = np.unique(keys, return_inverse=True)
+    group_count = len(group_keys)
+
+    columns = {}
+    if dimensions:
+        for dimension, dimension_codes in zip(dimensions, np.unravel_index(group_keys, sizes)):
+            columns[dimension] = indexes.dimensions[dimension].uniques[dimension_codes]
+
+    counts = np.bincount(group_ids, minlength=group_count)
+    sums = np.bincount(group_ids, weights=values, minlength=group_count)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+
+    needs_order = any(a not in ('count', 'sum', 'mean', 'std') for a in aggregates)
+    if needs_order and group_count:
+        order = np.lexsort((values, group_ids))
+        sorted_values = values[order]
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    for name in aggregates:
+        if name == 'count':
+            columns[name] = counts
+        elif name == 'sum':
+            columns[name] = sums
+        elif name == 'mean':
+            columns[name] = means
+        elif name == 'std':
+            deviations = values - means[group_ids]
+            squares = np.bincount(group_ids, weights=deviations ** 2, minlength=group_count)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                columns[name] = np.sqrt(np.where(counts > 1, squares / (counts - 1), np.nan))
+        elif not group_count:
+            columns[name] = np.array([], dtype=float)
+        elif name == 'min':
+            columns[name] = sorted_values[starts]
+        elif name == 'max':
+            columns[name] = sorted_values[starts + counts - 1]
+        else:
+            columns[name] = segment_quantile(sorted_values, starts, counts,
+                                             _quantile_fraction(name))
+
+    return columns
+
+
+def columns_to_json(columns: Dict[str, np.ndarray], decimals: int = None) -> Dict[str, list]:
+    """Convert column arrays to JSON-ready lists in one pass per column (NaN -> null)."""
+    result = {}
+    for name, column in columns.items():
+        column = np.asarray(column)
+        if column.dtype.kind == 'f':
+            if decimals is not None:
+                column = column.round(decimals)
+            missing = np.isnan(column)
+            if missing.any():
+                column = np.where(missing, None, column.astype(object))
+        result[name] = column.tolist()
+    return result
+
+
+def select_top(columns: Dict[str, np.ndarray], metric: str, n: int, descending: bool = True,
+               min_count: int = 1) -> Dict[str, np.ndarray]:
+    """Keep the `n` groups with the highest (or lowest) `metric` among groups with
+    at least `min_count` rows, best first.
+
+    Uses argpartition, so only the selected groups are ever fully sorted.
+    """
+    eligible = np.flatnonzero(columns['count'] >= min_count)
+    scores = np.asarray(columns[metric], dtype=float)[eligible]
+    eligible, scores = eligible[~np.isnan(scores)], scores[~np.isnan(scores)]
+    if descending:
+        scores = -scores
+    n = min(n, len(eligible))
+    if n == 0:
+        return {name: column[:0] for name, column in columns.items()}
+    top = np.argpartition(scores, n - 1)[:n]
+    top = top[np.argsort(scores[top], kind='stable')]
+    return {name: column[eligible[top]] for name, column in columns.items()}
@@ -1,10 +1,11 @@
-from flask import Flask, jsonify, request, send_file, send_from_directory
+from flask import Flask, g, jsonify, request, send_file
 from flask_cors import CORS
 from flask_compress import Compress
 import os
 import logging
 import pandas as pd
-import json
+import shutil
+import threading
 from werkzeug.utils import secure_filename
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
@@ -14,9 +15,53 @@ logger = logging.getLogger(__name__)
 from data_processor import DataProcessor
 from forecasting import SalaryForecaster
 from visualizations import ChartGenerator
-from utils import format_currency, get_vibrant_colors
+from utils import format_currency, get_vibrant_colors, parse_salary_range
+from dataset import DEFAULT_DATASET
+from registry import DatasetRegistry, DEFAULT_MEMORY_BUDGET_MB
+from columnar_store import ColumnarStore
+from sql_backend import SQLDataset, choose_backend, sql_filename
+from sketches import SKETCH_VALUE_COLUMN
+from queries import (
+    resolve_filters, order_positions, paginate, dimension_filters, rank_offers, parse_float_arg,
+    parse_int_arg
+)
+from skills import top_skills
+from aggregation import (
+    group_aggregate, parse_dimensions, parse_aggregates, parse_percentiles, value_column,
+    columns_to_json, select_top
+)
+from caching import lookup_totals, normalized_params
+from diff import diff_groups, version_groups
+from readiness import Readiness
+from watcher import FileWatcher
+from executor import Executor, Overloaded
+from compressed import EncodedPayload
+from static_assets import StaticManifest
+from serialization import APIJSONProvider, Records
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsRegistry, track_requests
+from profiling import RequestProfiler
 
 app = Flask(__name__)
+app.json = APIJSONProvider(app)  # orjson/NumPy-aware encoding for every response
+# Prometheus metrics at /metrics. With METRICS_DIR set, every worker process writes its
+# values there and a scrape reports them summed over all workers (see metrics.py).
+metrics_registry = MetricsRegistry(os.environ.get('METRICS_DIR') or None,
+                                   float(os.environ.get('METRICS_FLUSH_INTERVAL', 5)))
+track_requests(app, metrics_registry)  # registered first, so it times the whole request
+# Opt-in profiling (see profiling.py): PROFILE_TOKEN lets requests sending it in
+# X-Profile-Token ask for ?profile=collapsed|cprofile|html instead of their response.
+# PROFILE_SLOW_MS > 0 samples PROFILE_SAMPLE_RATE of the requests and writes the stacks
+# of those slower than that to PROFILE_DIR.
+request_profiler = RequestProfiler(os.environ.get('PROFILE_TOKEN', ''),
+                                   float(os.environ.get('PROFILE_SLOW_MS', 0)),
+                                   float(os.environ.get('PROFILE_SAMPLE_RATE', 0.01)),
+                                   os.environ.get('PROFILE_DIR', 'profiles'))
+request_profiler.install(app)
+dataset_load_seconds = metrics_registry.histogram(
+    'dataset_load_duration_seconds', 'Time to load the default dataset, by phase', ('phase',))
+compute_seconds = metrics_registry.histogram(
+    'compute_duration_seconds', 'Forecast and chart computation time, without queueing',
+    ('work_class', 'name'))
 CORS(app)  # Enable CORS for frontend communication
 Compress(app)  # gzip responses automatically
 
@@ -24,7 +69,7 @@ Compress(app)  # gzip responses automatically
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'csv', 'xlsx', 'xls'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', 16)) * 1024 * 1024  # 16MB by default
 
 # Create upload folder if it doesn't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -34,13 +79,49 @@ data_processor = DataProcessor()
 forecaster = SalaryForecaster()
 chart_generator = ChartGenerator()
 
-# In-memory data store (for demo purposes)
-app_data = {
-    'salary_data': None,
-    'economic_data': None,
-    'legal_data': None,
-    'processed': False
-}
+# Datasets by id; each request pins the current snapshot of the one it asks for.
+# Datasets beyond the memory budget are evicted to the columnar store on disk.
+DATASET_STORE_DIR = os.environ.get('DATASET_STORE_DIR', 'datasets')
+DATASET_MEMORY_BUDGET_MB = int(os.environ.get('DATASET_MEMORY_BUDGET_MB', DEFAULT_MEMORY_BUDGET_MB))
+# Salary tables at least this large live in the embedded SQL backend instead of memory;
+# DATASET_BACKEND=memory|sql forces one backend for every dataset
+SQL_BACKEND_THRESHOLD_MB = int(os.environ.get('SQL_BACKEND_THRESHOLD_MB', 512))
+DATASET_BACKEND = os.environ.get('DATASET_BACKEND', 'auto')
+# CPU-heavy work runs with per-class concurrency limits (see executor.py); forecasts,
+# charts and upload parsing go to a pool of EXECUTOR_PROCESSES processes per worker
+# (0 = on the request thread). Requests that wait longer than EXECUTOR_QUEUE_TIMEOUT
+# seconds for a slot and then a pool process get 503 with Retry-After.
+EXECUTOR_PROCESSES = int(os.environ.get('EXECUTOR_PROCESSES', 2))
+EXECUTOR_QUEUE_TIMEOUT = float(os.environ.get('EXECUTOR_QUEUE_TIMEOUT', 10))
+WORK_CLASS_LIMITS = {'forecast': 2, 'chart': 4, 'upload': 2, 'aggregate': 4}
+executor = Executor(EXECUTOR_PROCESSES, retry_after=max(1, round(EXECUTOR_QUEUE_TIMEOUT / 2)))
+for work_class, limit in WORK_CLASS_LIMITS.items():
+    executor.add_class(work_class, limit, EXECUTOR_QUEUE_TIMEOUT)
+
+# Endpoints that answer while the default dataset is still loading
+LIVENESS_ENDPOINTS = {'status', 'ready', 'metrics', 'serve_frontend', 'static'}
+STARTUP_RETRY_AFTER = 2  # seconds
+
+datasets = DatasetRegistry(
+    ColumnarStore(DATASET_STORE_DIR), DATASET_MEMORY_BUDGET_MB * 2**20,
+    {'memory': None, 'sql': 0}.get(DATASET_BACKEND, SQL_BACKEND_THRESHOLD_MB * 2**20),
+    summarize=version_groups)
+# Rows per chunk when streaming a large CSV upload into the SQL backend
+CSV_CHUNK_ROWS = 100_000
+if datasets.sql_threshold and datasets.sql_threshold > app.config['MAX_CONTENT_LENGTH']:
+    # See DEPLOYMENT.md: MAX_UPLOAD_MB and SQL_BACKEND_THRESHOLD_MB are raised together
+    logger.info(f"Uploads are capped below SQL_BACKEND_THRESHOLD_MB="
+                f"{SQL_BACKEND_THRESHOLD_MB}: every upload is loaded into memory")
+
+# /api/data/salaries pages with a larger JSON body are not kept in the result cache
+SALARY_PAGE_CACHE_BYTES = int(os.environ.get('SALARY_PAGE_CACHE_KB', 1024)) * 1024
+
+# Result size bounds for /api/similar
+SIMILAR_DEFAULT_K = 20
+SIMILAR_MAX_K = 1000
+
+# Salary_*_USD columns are derived from the euro figures at this fixed rate
+EUR_TO_USD = 1.1
 
 # BMW Dataset path — env var wins; otherwise try same dir (Docker) then parent dir (local dev)
 def _locate_bmw_dataset() -> str:
@@ -51,89 +132,287 @@ def _locate_bmw_dataset() -> str:
     return same_dir if os.path.exists(same_dir) else os.path.join(here, '..', 'BMW Data Set for WebApp.xlsx')
 
 BMW_DATASET_PATH = _locate_bmw_dataset()
+# Seconds between checks of BMW_DATASET_PATH for changes (0 = don't watch), and how
+# long the file must stay unchanged before it is reloaded
+DATASET_WATCH_INTERVAL = float(os.environ.get('DATASET_WATCH_INTERVAL', 0))
+DATASET_WATCH_DEBOUNCE = float(os.environ.get('DATASET_WATCH_DEBOUNCE', 5))
+# Serializes loads of the workbook so an older read never publishes over a newer one
+_bmw_load_lock = threading.Lock()
+
+def _salary_range_bounds_eur(df: pd.DataFrame, salary_eur: pd.Series):
+    """Convert the posted local-currency salary range to euro bounds.
+
+    Rows whose range can't be parsed fall back to the reported euro salary.
+    """
+    bounds = parse_salary_range(df['salary_range'].fillna(''))
+    if 'Conversion rate' in df.columns:
+        rate = pd.to_numeric(df['Conversion rate'], errors='coerce')
+    else:
+        rate = pd.to_numeric(df['reported_salary'], errors='coerce') / salary_eur
+    rate = rate.where(rate > 0)
+
+    range_min = (bounds['low'] / rate).fillna(salary_eur)
+    range_max = (bounds['high'] / rate).fillna(salary_eur)
+    return range_min, range_max
 
 def load_bmw_dataset():
     """Load and process BMW dataset"""
     try:
         logger.info(f"Loading BMW dataset from: {BMW_DATASET_PATH}")
 
-        df = pd.read_excel(BMW_DATASET_PATH)
+        with dataset_load_seconds.time(('read',)):
+            df = pd.read_excel(BMW_DATASET_PATH)
         df.columns = df.columns.str.strip()  # remove accidental leading/trailing spaces
 
         logger.info(f"Loaded {len(df)} records from BMW dataset")
 
-        salary_col = 'salary adjusted to euro'
-        processed_df = pd.DataFrame({
-            'Country': df['country'].fillna('Unknown'),
-            'Role_Name': df['job_role'].fillna('Unknown'),
-            'Experience_Level': df['level_of_experience'].fillna('Unknown'),
-            'Years_of_Experience': df['years_of_experience'].fillna(0),
-            'Salary_EUR': df[salary_col].fillna(0),
-            'Salary_Avg_USD': df[salary_col].fillna(0) * 1.1,
-            'Salary_Min_USD': df[salary_col].fillna(0) * 0.9,
-            'Salary_Max_USD': df[salary_col].fillna(0) * 1.3,
-            'Skills': df['skills'].fillna(''),
-            'Location': df['location'].fillna('Unknown'),
-            'Salary_Range': df['salary_range'].fillna(''),
-            'Team_Setup': 'Hybrid',
-        })
+        with dataset_load_seconds.time(('transform',)):
+            salary_col = 'salary adjusted to euro'
+            salary_eur = df[salary_col].fillna(0)
+            range_min, range_max = _salary_range_bounds_eur(df, salary_eur)
+            processed_df = pd.DataFrame({
+                'Country': df['country'].fillna('Unknown'),
+                'Role_Name': df['job_role'].fillna('Unknown'),
+                'Experience_Level': df['level_of_experience'].fillna('Unknown'),
+                'Years_of_Experience': df['years_of_experience'].fillna(0),
+                'Salary_EUR': salary_eur,
+                'Salary_Avg_USD': salary_eur * EUR_TO_USD,
+                'Salary_Min_USD': range_min * EUR_TO_USD,
+                'Salary_Max_USD': range_max * EUR_TO_USD,
+                'Salary_Range_Min_EUR': range_min,
+                'Salary_Range_Max_EUR': range_max,
+                'Skills': df['skills'].fillna(''),
+                'Location': df['location'].fillna('Unknown'),
+                'Salary_Range': df['salary_range'].fillna(''),
+                'Team_Setup': 'Hybrid',
+            })
 
-        processed_df = processed_df[processed_df['Salary_EUR'] > 0]
+            processed_df = processed_df[processed_df['Salary_EUR'] > 0]
         logger.info(f"Processed {len(processed_df)} valid records")
         return processed_df
     except Exception as e:
         logger.error(f"Error loading BMW dataset: {e}", exc_info=True)
         return None
 
+def publish_dataset(salary_data, economic_data, legal_data, source):
+    """Build indexes for the default dataset and swap it in as its current snapshot"""
+    with dataset_load_seconds.time(('publish',)):
+        return datasets.publish(DEFAULT_DATASET, salary_data, economic_data, legal_data, source)
+
 def initialize_bmw_data():
     """Initialize app with BMW dataset"""
-    global app_data
-    
-    bmw_data = load_bmw_dataset()
-    
-    if bmw_data is not None and len(bmw_data) > 0:
-        app_data['salary_data'] = bmw_data
-        app_data['economic_data'] = data_processor._create_default_data()['economic_data']
-        app_data['legal_data'] = data_processor._create_default_data()['legal_data']
-        app_data['processed'] = True
-        logger.info(f"BMW dataset initialized with {len(bmw_data)} records")
-        return True
-    else:
-        logger.warning("Failed to load BMW dataset, falling back to demo data")
-        default_data = data_processor._create_default_data()
-        app_data['salary_data'] = default_data['salary_data']
-        app_data['economic_data'] = default_data['economic_data']
-        app_data['legal_data'] = default_data['legal_data']
-        app_data['processed'] = True
-        return False
+    with _bmw_load_lock:
+        bmw_data = load_bmw_dataset()
+        
+        if bmw_data is not None and len(bmw_data) > 0:
+            default_data = data_processor._create_default_data()
+            publish_dataset(bmw_data, default_data['economic_data'], default_data['legal_data'],
+                            'bmw_dataset')
+            logger.info(f"BMW dataset initialized with {len(bmw_data)} records")
+            return True
+        else:
+            logger.warning("Failed to load BMW dataset, falling back to demo data")
+            default_data = data_processor._create_default_data()
+            publish_dataset(default_data['salary_data'], default_data['economic_data'],
+                            default_data['legal_data'], 'demo_data')
+            return False
+
+def reload_bmw_data():
+    """Re-read the BMW workbook after it changed on disk and swap it in.
 
-# Load BMW dataset on startup
-logger.info("Initializing backend with BMW dataset")
-initialize_bmw_data()
+    Runs on the file watcher's thread: requests keep their pinned snapshot and
+    new ones get the new version once it is published. A workbook that can't
+    be parsed leaves the current data in place rather than falling back to demo data.
+    """
+    with _bmw_load_lock:
+        bmw_data = load_bmw_dataset()
+        if bmw_data is None or len(bmw_data) == 0:
+            logger.warning("Reloaded BMW dataset is unusable, keeping the current data")
+            return False
+        default_data = data_processor._create_default_data()
+        snapshot = publish_dataset(bmw_data, default_data['economic_data'],
+                                   default_data['legal_data'], 'bmw_dataset')
+    logger.info(f"BMW dataset reloaded as version {snapshot.version} "
+                f"with {len(bmw_data)} records")
+    _warm_up()
+    _warm_forecast()
+    return True
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def create_sql_dataset_from_csv(filepath, source):
+    """Stream a large CSV into a new SQL-backed dataset without loading it whole"""
+    scratch = datasets.store.scratch_dir()
+    try:
+        path = os.path.join(scratch, sql_filename())
+        sql = SQLDataset.create(path, data_processor.stream_salary_csv(filepath, CSV_CHUNK_ROWS))
+        countries = sql.distinct('Country')
+        sql.close()
+        return datasets.publish_sql(datasets.new_id(), path,
+                                    data_processor._create_default_economic_data(countries),
+                                    data_processor._create_default_legal_data(countries), source)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+def append_upload(filepath, snapshot, dedup):
+    """Append an uploaded file's rows to the snapshot's dataset; CSVs are read in chunks"""
+    columns = list(_schema(snapshot).columns)
+    if filepath.endswith('.csv'):
+        with pd.read_csv(filepath, chunksize=CSV_CHUNK_ROWS) as reader:
+            chunks = (data_processor.process_appended_data(chunk, columns) for chunk in reader)
+            return datasets.append(snapshot.dataset_id, chunks, dedup,
+                                   data_processor.extend_country_data)
+    rows = data_processor.process_appended_data(pd.read_excel(filepath), columns)
+    return datasets.append(snapshot.dataset_id, [rows], dedup, data_processor.extend_country_data)
+
+def _lookups(snapshot):
+    """What the argument parsers check dimensions and sort keys against"""
+    return snapshot.sql if snapshot.sql is not None else snapshot.indexes
+
+def _schema(snapshot):
+    """A frame with the salary table's columns and dtypes"""
+    return snapshot.sql.schema if snapshot.sql is not None else snapshot.salary_data
+
+def _filtered_aggregate(snapshot, args, dimensions, aggregates, column):
+    """group_aggregate() over the filtered rows; pushed down to SQL when SQL-backed"""
+    if snapshot.sql is not None:
+        return snapshot.sql.aggregate(args, dimensions, aggregates, column)
+    positions = resolve_filters(snapshot.salary_data, snapshot.indexes, args)
+    return group_aggregate(snapshot.indexes, snapshot.salary_data[column].to_numpy(), positions,
+                           dimensions, aggregates)
+
+@app.before_request
+def pin_snapshot():
+    """Pin the requested dataset's current snapshot for the whole request"""
+    if request.endpoint in LIVENESS_ENDPOINTS:
+        # Whatever is resident: a health check or scrape must never load a dataset
+        g.snapshot = datasets.peek(DEFAULT_DATASET)
+        return None
+    dataset_id = request.args.get('dataset') or DEFAULT_DATASET
+    if dataset_id == DEFAULT_DATASET and not readiness.is_done('dataset'):
+        # Still loading at startup: data endpoints ask to retry
+        response = jsonify(dict(readiness.describe(), error='Dataset is still loading'))
+        response.headers['Retry-After'] = str(STARTUP_RETRY_AFTER)
+        return response, 503
+    try:
+        g.snapshot = datasets.get(dataset_id)
+    except (KeyError, ValueError):
+        return jsonify({'error': f"Unknown dataset '{dataset_id}'"}), 404
+
+def _overloaded(e):
+    """503 for work rejected by the executor, telling the client when to retry"""
+    response = jsonify({'error': str(e), 'work_class': e.work_class})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 503
+
 @app.route('/api/status')
 def status():
-    """Health check endpoint"""
+    """Liveness check: the worker is serving requests (it may still be warming up)"""
     return jsonify({
         'status': 'ok', 
         'service': 'euro-trends-backend',
         'version': '1.0.0',
-        'data_loaded': app_data['processed']
+        'ready': readiness.ready,
+        'data_loaded': g.snapshot is not None,
+        'dataset_version': g.snapshot.version if g.snapshot is not None else None
     })
 
+@app.route('/api/ready')
+def ready():
+    """Readiness check: 200 once the dataset is loaded and the caches are warm, else 503"""
+    return jsonify(readiness.describe()), 200 if readiness.ready else 503
+
+@app.route('/api/executor', methods=['GET'])
+def executor_stats():
+    """Concurrency limits, queue depth, wait times and rejections per work class"""
+    return jsonify(executor.describe())
+
+dataset_rows = metrics_registry.gauge(
+    'dataset_rows', 'Rows of each dataset known to the worker', ('dataset',), mode='livemax')
+dataset_memory = metrics_registry.gauge(
+    'dataset_memory_bytes', 'Memory held by resident datasets, summed over workers', ('dataset',))
+cache_lookups = metrics_registry.counter(
+    'result_cache_lookups_total', 'Result cache lookups by outcome (hits, misses, coalesced)',
+    ('result',))
+cache_entries = metrics_registry.gauge('result_cache_entries', 'Cached results of resident datasets')
+cache_bytes = metrics_registry.gauge('result_cache_bytes', 'Bytes of cached results')
+executor_running = metrics_registry.gauge(
+    'executor_running', 'Work currently running, by work class', ('work_class',))
+executor_queued = metrics_registry.gauge(
+    'executor_queued', 'Work waiting for a slot, by work class', ('work_class',))
+executor_completed = metrics_registry.counter(
+    'executor_completed_total', 'Work finished, by work class', ('work_class',))
+executor_rejected = metrics_registry.counter(
+    'executor_rejected_total', 'Work rejected with 503 after the queue timeout', ('work_class',))
+executor_wait = metrics_registry.counter(
+    'executor_queue_wait_seconds_total', 'Time spent waiting for a slot', ('work_class',))
+app_ready = metrics_registry.gauge(
+    'app_ready', '1 once every worker has loaded the dataset and warmed its caches',
+    mode='livemin')
+
+def _collect_metrics():
+    """Copy the registry, cache and executor stats of this worker into its metrics"""
+    described = datasets.describe()
+    dataset_rows.clear()
+    dataset_memory.clear()
+    for row in described:
+        dataset_rows.set(row['records'], (row['dataset_id'],))
+        dataset_memory.set(row['memory_bytes'], (row['dataset_id'],))
+    caches = [row['cache'] for row in described if row['cache'] is not None]
+    cache_entries.set(sum(cache['entries'] for cache in caches))
+    cache_bytes.set(sum(cache['bytes'] for cache in caches))
+    for outcome, count in lookup_totals().items():
+        cache_lookups.set_total(count, (outcome,))
+    for work_class, work in executor.describe()['classes'].items():
+        executor_running.set(work['running'], (work_class,))
+        executor_queued.set(work['queued'], (work_class,))
+        executor_completed.set_total(work['completed'], (work_class,))
+        executor_rejected.set_total(work['rejected'], (work_class,))
+        executor_wait.set_total(work['wait_seconds'], (work_class,))
+    app_ready.set(int(readiness.ready))
+
+metrics_registry.add_collector(_collect_metrics)
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics of all workers (of this worker only without METRICS_DIR)"""
+    return app.response_class(metrics_registry.exposition(), content_type=METRICS_CONTENT_TYPE)
+
+@app.route('/api/datasets', methods=['GET'])
+def list_datasets():
+    """Known datasets with their memory/disk footprint and the memory budget"""
+    return jsonify({
+        'datasets': datasets.describe(),
+        'memory_bytes': datasets.memory_usage(),
+        'memory_budget_bytes': datasets.memory_budget,
+        'evictions': datasets.evictions,
+        'reloads': datasets.reloads
+    })
+
+@app.route('/api/datasets/<dataset_id>', methods=['DELETE'])
+def delete_dataset(dataset_id):
+    """Remove an uploaded dataset from memory and disk"""
+    try:
+        datasets.delete(dataset_id)
+        return jsonify({'success': True, 'dataset_id': dataset_id})
+    except KeyError:
+        return jsonify({'error': f"Unknown dataset '{dataset_id}'"}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
 @app.route('/api/init', methods=['POST'])
 def initialize_demo_data():
     """Initialize with BMW dataset (or demo data as fallback)"""
     try:
         success = initialize_bmw_data()
+        snapshot = datasets.get(DEFAULT_DATASET)
         
         return jsonify({
             'success': True,
             'message': 'BMW dataset loaded' if success else 'Demo data loaded (BMW dataset unavailable)',
-            'records': len(app_data['salary_data']),
+            'records': snapshot.records,
+            'dataset_version': snapshot.version,
             'source': 'bmw_dataset' if success else 'demo_data'
         })
     except Exception as e:
@@ -141,7 +420,19 @@ def initialize_demo_data():
 
 @app.route('/api/upload', methods=['POST'])
 def upload():
-    """Upload and process dataset (CSV/Excel)"""
+    """Upload and process dataset (CSV/Excel)
+
+    mode=create (default) registers the file as a new dataset. mode=append adds
+    its rows to the dataset picked by ?dataset= instead, updating the indexes from
+    the new rows only; dedup=Col1,Col2 skips rows whose values in those columns
+    match a row already in the dataset.
+    """
+    mode = (request.values.get('mode') or 'create').lower()
+    if mode not in ('create', 'append'):
+        return jsonify({'error': "Invalid value for 'mode': expected 'create' or 'append'"}), 400
+    if mode == 'append' and g.snapshot is None:
+        return jsonify({'error': 'No data loaded'}), 400
+    
     if 'file' not in request.files:
         return jsonify({'error': 'No file uploaded'}), 400
     
@@ -158,216 +449,697 @@ def upload():
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         file.save(filepath)
         
-        # Process the file
-        if filename.endswith('.csv'):
-            raw_data = pd.read_csv(filepath)
-        else:
-            raw_data = pd.read_excel(filepath)
+        # Unless appending, every upload becomes its own dataset and the default dataset
+        # stays untouched. CSVs too large for memory are streamed straight into SQL.
+        appended = None
+        with executor.slot('upload'):
+            if mode == 'append':
+                dedup = [c.strip() for c in (request.values.get('dedup') or '').split(',')
+                         if c.strip()]
+                snapshot, appended = append_upload(filepath, g.snapshot, dedup or None)
+            elif filename.endswith('.csv') and choose_backend(
+                    None, datasets.sql_threshold, os.path.getsize(filepath)) == 'sql':
+                snapshot = create_sql_dataset_from_csv(filepath, f'upload:{filename}')
+            else:
+                # Parsing runs in the pool; indexes are built here, where they are kept
+                processed_data = executor.run(data_processor.process_file, filepath)
+                snapshot = datasets.create(processed_data['salary_data'],
+                                           processed_data['economic_data'],
+                                           processed_data['legal_data'], f'upload:{filename}')
         
-        processed_data = data_processor.process_raw_data(raw_data)
-        app_data['salary_data'] = processed_data['salary_data']
-        app_data['economic_data'] = processed_data['economic_data']
-        app_data['legal_data'] = processed_data['legal_data']
-        app_data['processed'] = True
+        if snapshot.sql is not None:
+            countries, roles = snapshot.sql.distinct('Country'), snapshot.sql.distinct('Role_Name')
+        else:
+            countries = snapshot.salary_data['Country'].unique().tolist()
+            roles = snapshot.salary_data['Role_Name'].unique().tolist()
         
-        return jsonify({
+        result = {
             'success': True,
             'filename': filename,
-            'records': len(app_data['salary_data']),
-            'countries': app_data['salary_data']['Country'].unique().tolist(),
-            'roles': app_data['salary_data']['Role_Name'].unique().tolist()
-        })
+            'dataset_id': snapshot.dataset_id,
+            'backend': snapshot.backend,
+            'records': snapshot.records,
+            'dataset_version': snapshot.version,
+            'countries': countries,
+            'roles': roles
+        }
+        if appended is not None:
+            result['appended'] = appended
+        return jsonify(result)
+    except Overloaded as e:
+        return _overloaded(e)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def _encoded(snapshot, key, compute, keep=None):
+    """JSON of a result cached with the dataset version, serialized once and compressed
+    once per encoding (see compressed.py); `keep(payload)` false = don't cache it"""
+    return snapshot.cache.get_or_compute(
+        key, lambda: EncodedPayload(app.json.response(compute()).get_data()), keep)
+
+def _send_encoded(payload):
+    """Response with the payload variant matching Accept-Encoding (not compressed again)"""
+    encoding = payload.negotiate(request.headers.get('Accept-Encoding', ''))
+    response = app.response_class(payload.variant(encoding), mimetype=payload.mimetype)
+    response.headers['Vary'] = 'Accept-Encoding'
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    response.set_etag(f'{payload.etag}:{encoding}' if encoding else payload.etag)
+    return response.make_conditional(request)
+
+def _summary(snapshot):
+    """Summary payload of a dataset version (cached with it)"""
+    if snapshot.sql is not None:
+        sql = snapshot.sql
+        overall = sql.group_summary({}, [], [], SKETCH_VALUE_COLUMN)
+        median = sql.median(SKETCH_VALUE_COLUMN)
+        countries, roles, team_setups = (
+            sql.distinct(c) for c in ('Country', 'Role_Name', 'Team_Setup'))
+        salary_min, salary_max = sql.value_range('Salary_Min_USD', 'Salary_Max_USD')
+    else:
+        salary_data = snapshot.salary_data
+        # avg/std come from the group moments; the median is an exact selection,
+        # computed once per version since the payload is cached with it
+        overall = snapshot.indexes.sketches.query({}, [], [])
+        median = salary_data[SKETCH_VALUE_COLUMN].median()
+        countries = salary_data['Country'].unique().tolist()
+        roles = salary_data['Role_Name'].unique().tolist()
+        team_setups = salary_data['Team_Setup'].unique().tolist()
+        salary_min = salary_data['Salary_Min_USD'].min()
+        salary_max = salary_data['Salary_Max_USD'].max()
+    
+    return {
+        'total_records': snapshot.records,
+        'countries': countries,
+        'roles': roles,
+        'team_setups': team_setups,
+        'salary_stats': {
+            'min': float(salary_min),
+            'max': float(salary_max),
+            'avg': float(overall['mean'][0]),
+            'median': float(median),
+            'std': float(overall['std'][0])
+        }
+    }
+
 @app.route('/api/data/summary', methods=['GET'])
 def get_summary():
     """Get summary statistics of salary data"""
-    if not app_data['processed']:
+    snapshot = g.snapshot
+    if snapshot is None:
         return jsonify({'error': 'No data loaded. Upload a file or initialize demo data.'}), 400
     
     try:
-        salary_data = app_data['salary_data']
+        return _send_encoded(_encoded(snapshot, ('summary',), lambda: _summary(snapshot)))
+    except Overloaded as e:
+        return _overloaded(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/data/percentiles', methods=['GET'])
+def get_percentiles():
+    """Approximate salary percentiles from the per-group quantile sketches
+
+    dimensions: comma-separated group-by columns (none = one overall group).
+    percentiles: comma-separated values in 0-100 (default 25,50,75,90).
+    Only the exact-match filters (country, role, ...) apply. Percentiles carry the
+    sketch's rank error (about 1.65%); count/mean/std/min/max are exact. SQL-backed
+    datasets use the sketches stored at load time, or exact percentiles computed in
+    the engine when the dataset has none.
+    """
+    snapshot = g.snapshot
+    if snapshot is None:
+        return jsonify({'error': 'No data loaded'}), 400
+    
+    try:
+        lookups = _lookups(snapshot)
+        if SKETCH_VALUE_COLUMN not in _schema(snapshot).columns:
+            return jsonify({'error': 'Percentiles are not available for this dataset'}), 400
+        dimensions = parse_dimensions(request.args, lookups)
+        fractions = parse_percentiles(request.args)
+        filters = dimension_filters(request.args, lookups)
         
-        summary = {
-            'total_records': len(salary_data),
-            'countries': salary_data['Country'].unique().tolist(),
-            'roles': salary_data['Role_Name'].unique().tolist(),
-            'team_setups': salary_data['Team_Setup'].unique().tolist(),
-            'salary_stats': {
-                'min': float(salary_data['Salary_Min_USD'].min()),
-                'max': float(salary_data['Salary_Max_USD'].max()),
-                'avg': float(salary_data['Salary_Avg_USD'].mean()),
-                'median': float(salary_data['Salary_Avg_USD'].median()),
-                'std': float(salary_data['Salary_Avg_USD'].std())
-            }
-        }
+        if snapshot.sql is not None:
+            columns = snapshot.sql.group_summary(filters, dimensions, fractions,
+                                                 SKETCH_VALUE_COLUMN)
+        else:
+            columns = snapshot.indexes.sketches.query(filters, dimensions, fractions)
         
-        return jsonify(summary)
+        return jsonify({
+            'success': True,
+            'dimensions': dimensions,
+            'value': SKETCH_VALUE_COLUMN,
+            'groups': len(columns['count']),
+            'columns': columns_to_json(columns)
+        })
+    except Overloaded as e:
+        return _overloaded(e)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/data/rank', methods=['GET', 'POST'])
+def get_salary_rank():
+    """Percentile of a salary offer among peers in the same country and role
+
+    GET: salary, country, role and optional experience_level (narrows the peers
+    to that level). POST: {"offers": [{"salary", "country", "role",
+    "experience_level"?}, ...]} ranks the whole batch in one vectorized lookup.
+    """
+    snapshot = g.snapshot
+    if snapshot is None:
+        return jsonify({'error': 'No data loaded'}), 400
+    
+    try:
+        if request.method == 'POST':
+            payload = request.get_json(silent=True)
+            offers = payload.get('offers') if isinstance(payload, dict) else payload
+            if not isinstance(offers, list):
+                return jsonify({'error': 'Expected a JSON body with an "offers" list'}), 400
+        else:
+            offer = {'salary': parse_float_arg(request.args, 'salary')}
+            for field in ('country', 'role', 'experience_level'):
+                if request.args.get(field):
+                    offer[field] = request.args.get(field)
+            offers = [offer]
+        
+        if snapshot.sql is not None:
+            ranks = columns_to_json(snapshot.sql.rank_offers(offers))
+            value = snapshot.sql.sorted_columns['salary']
+        else:
+            ranks = columns_to_json(rank_offers(snapshot.indexes, offers))
+            value = snapshot.indexes.sorted_columns['salary'].column
+        results = [
+            dict(offer, percentile=percentile, peers=size, below=below)
+            for offer, percentile, size, below in zip(
+                offers, ranks['percentile'], ranks['group_size'], ranks['below'])
+        ]
+        
+        return jsonify({
+            'success': True,
+            'value': value,
+            'dataset_version': snapshot.version,
+            'count': len(results),
+            'data': results
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/data/salaries', methods=['GET'])
 def get_salaries():
-    """Get filtered salary data"""
-    if not app_data['processed']:
+    """Get filtered salary data
+
+    Filters: country, role, team_setup, experience_level, location (exact match);
+    skills (comma-separated, records must list all of them); salary_min/salary_max,
+    which keep records whose salary range overlaps the requested band; and
+    salary_from/salary_to, experience_from/experience_to (inclusive bounds).
+    Ordering and paging: sort=salary|experience, order=asc|desc, offset, limit.
+    SQL-backed datasets serve pages of at most 10000 records, 1000 without a limit.
+    """
+    snapshot = g.snapshot
+    if snapshot is None:
         return jsonify({'error': 'No data loaded'}), 400
     
+    def compute():
+        if snapshot.sql is not None:
+            result, total = snapshot.sql.rows(request.args)
+        else:
+            salary_data = snapshot.salary_data
+            indexes = snapshot.indexes
+            positions = resolve_filters(salary_data, indexes, request.args)
+            positions = order_positions(indexes, positions, request.args)
+            page = paginate(positions, request.args)
+            total = len(positions)
+            
+            result = Records(salary_data.iloc[page])
+        
+        return {
+            'success': True,
+            'count': len(result),
+            'total': total,
+            'data': result
+        }
+    
     try:
-        salary_data = app_data['salary_data'].copy()
+        # Large pages are rarely requested twice, and would evict the warmed payloads
+        return _send_encoded(_encoded(
+            snapshot, ('salaries', normalized_params(request.args)), compute,
+            keep=lambda payload: len(payload.body) <= SALARY_PAGE_CACHE_BYTES))
+    except Overloaded as e:
+        return _overloaded(e)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/data/aggregate', methods=['GET'])
+def get_aggregate():
+    """Group-by/aggregate query over the salary data
+
+    dimensions: comma-separated subset of Country, Role_Name, Experience_Level,
+    Team_Setup, Location (none = one overall group).
+    aggregates: comma-separated subset of count, sum, mean, min, max, std, median, pXX.
+    value: numeric column to aggregate (default Salary_Avg_USD).
+    Accepts the same filters as /api/data/salaries. Results are column-wise and
+    cached per dataset version.
+    """
+    snapshot = g.snapshot
+    if snapshot is None:
+        return jsonify({'error': 'No data loaded'}), 400
+    
+    try:
+        dimensions = parse_dimensions(request.args, _lookups(snapshot))
+        aggregates = parse_aggregates(request.args)
+        column = value_column(_schema(snapshot), request.args)
+        
+        def compute():
+            with executor.slot('aggregate'):
+                columns = _filtered_aggregate(snapshot, request.args, dimensions, aggregates,
+                                              column)
+            return {
+                'success': True,
+                'dimensions': dimensions,
+                'aggregates': aggregates,
+                'value': column,
+                'groups': len(columns[aggregates[0]]),
+                'columns': columns_to_json(columns)
+            }
         
-        # Apply filters from query parameters
-        country = request.args.get('country')
-        role = request.args.get('role')
-        team_setup = request.args.get('team_setup')
+        return _send_encoded(_encoded(
+            snapshot, ('aggregate', normalized_params(request.args)), compute))
+    except Overloaded as e:
+        return _overloaded(e)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/data/top', methods=['GET'])
+def get_top_groups():
+    """Leaderboard of groups, e.g. the 10 best-paying role/country combinations
+
+    dimensions: group-by columns (default Role_Name,Country); metric: any
+    /api/data/aggregate aggregate (default mean); n (default 10);
+    direction=desc|asc; min_count (default 1); value; plus the usual filters.
+    Results are cached per dataset version.
+    """
+    snapshot = g.snapshot
+    if snapshot is None:
+        return jsonify({'error': 'No data loaded'}), 400
+    
+    try:
+        version = snapshot.version
         
-        if country:
-            salary_data = salary_data[salary_data['Country'] == country]
-        if role:
-            salary_data = salary_data[salary_data['Role_Name'] == role]
-        if team_setup:
-            salary_data = salary_data[salary_data['Team_Setup'] == team_setup]
+        def compute():
+            args = request.args.to_dict()
+            args.setdefault('dimensions', 'Role_Name,Country')
+            dimensions = parse_dimensions(args, _lookups(snapshot))
+            metric = parse_aggregates({'aggregates': args.get('metric') or 'mean'})
+            if len(metric) != 1:
+                raise ValueError("'metric' takes a single aggregate")
+            direction = (args.get('direction') or 'desc').lower()
+            if direction not in ('asc', 'desc'):
+                raise ValueError("Invalid value for 'direction': expected 'asc' or 'desc'")
+            n = parse_int_arg(args, 'n', minimum=1) or 10
+            min_count = parse_int_arg(args, 'min_count') or 1
+            column = value_column(_schema(snapshot), args)
+            
+            with executor.slot('aggregate'):
+                columns = _filtered_aggregate(snapshot, args, dimensions,
+                                              list(dict.fromkeys(metric + ['count'])), column)
+            top = select_top(columns, metric[0], n, direction == 'desc', min_count)
+            return {
+                'success': True,
+                'dimensions': dimensions,
+                'metric': metric[0],
+                'value': column,
+                'direction': direction,
+                'dataset_version': version,
+                'groups': len(top['count']),
+                'columns': columns_to_json(top)
+            }
         
-        # Convert to JSON-friendly format
-        result = salary_data.to_dict(orient='records')
+        return _send_encoded(_encoded(
+            snapshot, ('top', normalized_params(request.args)), compute))
+    except Overloaded as e:
+        return _overloaded(e)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _version_groups(spec):
+    """Group aggregates of `dataset[@version]` (defaults: pinned dataset, current version)"""
+    dataset_id, _, version = spec.partition('@')
+    try:
+        snapshot = datasets.get(dataset_id) if dataset_id else g.snapshot
+    except (KeyError, ValueError):
+        raise LookupError(f"Unknown dataset '{dataset_id}'") from None
+    if snapshot is None:
+        raise ValueError('No data loaded')
+    if version:
+        try:
+            version = int(version)
+        except ValueError:
+            raise ValueError(f"Invalid version in '{spec}': expected an integer") from None
+    if not version or version == snapshot.version:
+        groups, version = version_groups(snapshot), snapshot.version
+    else:
+        groups = datasets.retired(snapshot.dataset_id, version)
+        if groups is None:
+            raise LookupError(f"Version {version} of dataset '{snapshot.dataset_id}' "
+                              f"is not available")
+    if groups is None:
+        raise ValueError(f"Dataset '{snapshot.dataset_id}' has no salary values to compare")
+    return {'dataset_id': snapshot.dataset_id, 'version': version}, groups
+
+@app.route('/api/data/diff', methods=['GET'])
+def get_diff():
+    """What moved between two dataset versions or two uploads
+
+    base (required) and target (default: the ?dataset= dataset) are
+    `<dataset_id>[@<version>]`; '@<version>' alone means the ?dataset= dataset.
+    Past versions can be compared while the registry still keeps their
+    aggregates. Compares count, mean and median salary per Country x Role x
+    Experience group; n (default 10) and min_count (default 1) pick the movers.
+    """
+    try:
+        if not request.args.get('base'):
+            return jsonify({'error': "Missing 'base' (dataset id, optionally @version)"}), 400
+        n = parse_int_arg(request.args, 'n', minimum=1) or 10
+        min_count = parse_int_arg(request.args, 'min_count') or 1
+        base, base_groups = _version_groups(request.args['base'])
+        target, target_groups = _version_groups(request.args.get('target') or '')
         
+        diff = diff_groups(base_groups, target_groups, n, min_count)
+        base['groups'], target['groups'] = len(base_groups['count']), len(target_groups['count'])
         return jsonify({
             'success': True,
-            'count': len(result),
-            'data': result
+            'base': base,
+            'target': target,
+            'dimensions': diff['dimensions'],
+            **{part: columns_to_json(diff[part])
+               for part in ('changed', 'appeared', 'disappeared', 'movers')}
         })
+    except Overloaded as e:
+        return _overloaded(e)
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _salary_by_dimension(snapshot, args, dimension, label):
+    """Average/min/max/count of Salary_Avg_USD per value of one dimension (cached per filters)"""
+    return _encoded(snapshot, ('by-dimension', dimension, normalized_params(args)),
+                    lambda: _salary_by_dimension_rows(snapshot, args, dimension, label))
+
+def _salary_by_dimension_rows(snapshot, args, dimension, label):
+    columns = columns_to_json(_filtered_aggregate(
+        snapshot, args, [dimension], ['mean', 'min', 'max', 'count'], 'Salary_Avg_USD'),
+        decimals=2)
+    
+    return [
+        {label: key, 'avg_salary': avg, 'min_salary': low, 'max_salary': high, 'count': count}
+        for key, avg, low, high, count in zip(columns[dimension], columns['mean'],
+                                              columns['min'], columns['max'], columns['count'])
+    ]
+
 @app.route('/api/data/by-country', methods=['GET'])
 def get_by_country():
     """Get salary data grouped by country"""
-    if not app_data['processed']:
+    snapshot = g.snapshot
+    if snapshot is None:
         return jsonify({'error': 'No data loaded'}), 400
     
     try:
-        salary_data = app_data['salary_data']
-        
-        by_country = salary_data.groupby('Country').agg({
-            'Salary_Avg_USD': ['mean', 'min', 'max', 'count']
-        }).round(2)
-        
-        result = []
-        for country in by_country.index:
-            result.append({
-                'country': country,
-                'avg_salary': float(by_country.loc[country, ('Salary_Avg_USD', 'mean')]),
-                'min_salary': float(by_country.loc[country, ('Salary_Avg_USD', 'min')]),
-                'max_salary': float(by_country.loc[country, ('Salary_Avg_USD', 'max')]),
-                'count': int(by_country.loc[country, ('Salary_Avg_USD', 'count')])
-            })
-        
-        return jsonify(result)
+        return _send_encoded(_salary_by_dimension(snapshot, request.args, 'Country', 'country'))
+    except Overloaded as e:
+        return _overloaded(e)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/data/by-role', methods=['GET'])
 def get_by_role():
     """Get salary data grouped by role"""
-    if not app_data['processed']:
+    snapshot = g.snapshot
+    if snapshot is None:
         return jsonify({'error': 'No data loaded'}), 400
     
     try:
-        salary_data = app_data['salary_data']
+        return _send_encoded(_salary_by_dimension(snapshot, request.args, 'Role_Name', 'role'))
+    except Overloaded as e:
+        return _overloaded(e)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/skills', methods=['GET'])
+def get_skill_frequency():
+    """How often each skill is listed among the (filtered) salary records
+
+    Accepts the /api/data/salaries filters plus min_count and limit.
+    """
+    snapshot = g.snapshot
+    if snapshot is None:
+        return jsonify({'error': 'No data loaded'}), 400
+    if snapshot.sql is not None:
+        return jsonify({'error': 'Not available for SQL-backed datasets'}), 400
+    
+    try:
+        salary_data = snapshot.salary_data
+        indexes = snapshot.indexes
+        if indexes.skills is None:
+            return jsonify({'error': 'Skills are not available for this dataset'}), 400
+        positions = resolve_filters(salary_data, indexes, request.args)
         
-        by_role = salary_data.groupby('Role_Name').agg({
-            'Salary_Avg_USD': ['mean', 'min', 'max', 'count']
-        }).round(2)
+        columns = top_skills(indexes.skills.frequency(positions), 'count',
+                             parse_int_arg(request.args, 'min_count') or 1,
+                             parse_int_arg(request.args, 'limit'))
         
-        result = []
-        for role in by_role.index:
-            result.append({
-                'role': role,
-                'avg_salary': float(by_role.loc[role, ('Salary_Avg_USD', 'mean')]),
-                'min_salary': float(by_role.loc[role, ('Salary_Avg_USD', 'min')]),
-                'max_salary': float(by_role.loc[role, ('Salary_Avg_USD', 'max')]),
-                'count': int(by_role.loc[role, ('Salary_Avg_USD', 'count')])
-            })
+        return jsonify({
+            'success': True,
+            'records': len(positions),
+            'skills': len(columns['skill']),
+            'columns': columns_to_json(columns, decimals=4)
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/skills/salary', methods=['GET'])
+def get_salary_by_skill():
+    """Mean/median salary per skill and the premium over the role baseline
+
+    premium = average of (salary - mean salary of the record's role) over the
+    records listing the skill. Accepts the /api/data/salaries filters plus
+    sort=count|mean_salary|median_salary|premium, min_count and limit.
+    """
+    snapshot = g.snapshot
+    if snapshot is None:
+        return jsonify({'error': 'No data loaded'}), 400
+    if snapshot.sql is not None:
+        return jsonify({'error': 'Not available for SQL-backed datasets'}), 400
+    
+    try:
+        salary_data = snapshot.salary_data
+        indexes = snapshot.indexes
+        if indexes.skills is None:
+            return jsonify({'error': 'Skills are not available for this dataset'}), 400
+        positions = resolve_filters(salary_data, indexes, request.args)
+        column = indexes.sorted_columns['salary'].column
         
-        return jsonify(result)
+        columns = indexes.skills.salary_by_skill(
+            positions, salary_data[column].to_numpy(dtype=float),
+            indexes.dimensions['Role_Name'].codes)
+        columns = top_skills(columns, request.args.get('sort') or 'count',
+                             parse_int_arg(request.args, 'min_count') or 1,
+                             parse_int_arg(request.args, 'limit'))
+        
+        return jsonify({
+            'success': True,
+            'value': column,
+            'baseline': 'Role_Name',
+            'records': len(positions),
+            'skills': len(columns['skill']),
+            'columns': columns_to_json(columns, decimals=2)
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/forecast', methods=['GET'])
-def get_forecast():
-    """Generate 5-year salary forecast"""
-    if not app_data['processed']:
+@app.route('/api/similar', methods=['GET', 'POST'])
+def get_similar_records():
+    """Records most similar to a profile (role, country, skills, years)
+
+    GET: role, country, experience_level, skills (comma-separated), years, k (default 20).
+    POST: {"profiles": [{...}, ...], "k": 20} answers a batch with one matrix product.
+    """
+    snapshot = g.snapshot
+    if snapshot is None:
         return jsonify({'error': 'No data loaded'}), 400
+    if snapshot.sql is not None:
+        return jsonify({'error': 'Not available for SQL-backed datasets'}), 400
     
     try:
-        salary_data = app_data['salary_data']
-        forecast_data = forecaster.generate_forecast(salary_data)
+        if request.method == 'POST':
+            payload = request.get_json(silent=True) or {}
+            profiles = payload.get('profiles') if isinstance(payload, dict) else None
+            k = payload.get('k', SIMILAR_DEFAULT_K) if isinstance(payload, dict) else None
+            if not isinstance(profiles, list) or not all(isinstance(p, dict) for p in profiles):
+                return jsonify({'error': 'Expected a JSON body with a "profiles" list'}), 400
+            if not isinstance(k, int) or k < 1:
+                return jsonify({'error': "Invalid value for 'k': expected a positive integer"}), 400
+        else:
+            profiles = [{
+                field: request.args.get(field)
+                for field in ('role', 'country', 'experience_level', 'skills', 'years')
+            }]
+            k = parse_int_arg(request.args, 'k', minimum=1) or SIMILAR_DEFAULT_K
         
-        if forecast_data.empty:
-            return jsonify({'error': 'Unable to generate forecast'}), 400
+        salary_data = snapshot.salary_data
+        indexes = snapshot.indexes
+        if indexes.profiles is None:
+            return jsonify({'error': 'Similarity search is not available for this dataset'}), 400
         
-        result = forecast_data.to_dict(orient='records')
+        results = []
+        for positions, scores in indexes.profiles.most_similar(profiles, min(k, SIMILAR_MAX_K)):
+            matches = salary_data.iloc[positions].to_dict(orient='records')
+            for match, score in zip(matches, scores.round(4).tolist()):
+                match['similarity'] = score
+            results.append(matches)
         
         return jsonify({
+            'success': True,
+            'count': len(results),
+            'data': results if request.method == 'POST' else results[0]
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _timed_call(work_class, name, fn, *args):
+    """executor.call() recording the compute time, not the wait for a slot, as a metric"""
+    with executor.slot(work_class):
+        with compute_seconds.time((work_class, name)):
+            return executor.run(fn, *args)
+
+def _forecast(snapshot):
+    """Forecast response of a dataset version (None when no forecast can be made)"""
+    def compute():
+        forecast_data = _timed_call('forecast', 'forecast', forecaster.generate_forecast,
+                                    snapshot.salary_data)
+        if forecast_data.empty:
+            return None
+        result = Records(forecast_data)
+        return EncodedPayload(app.json.response({
             'success': True,
             'count': len(result),
             'data': result
-        })
+        }).get_data())
+    
+    return snapshot.cache.get_or_compute(('forecast',), compute)
+
+@app.route('/api/forecast', methods=['GET'])
+def get_forecast():
+    """Generate 5-year salary forecast"""
+    snapshot = g.snapshot
+    if snapshot is None:
+        return jsonify({'error': 'No data loaded'}), 400
+    if snapshot.sql is not None:
+        return jsonify({'error': 'Not available for SQL-backed datasets'}), 400
+    
+    try:
+        payload = _forecast(snapshot)
+        if payload is None:
+            return jsonify({'error': 'Unable to generate forecast'}), 400
+        
+        return _send_encoded(payload)
+    except Overloaded as e:
+        return _overloaded(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+CHARTS = {
+    'country-salary': chart_generator.create_country_salary_chart,
+    'role-salary': chart_generator.create_role_salary_chart,
+    'heatmap': chart_generator.create_salary_heatmap,
+}
+
+def _chart(snapshot, name):
+    """Plotly figure JSON of one chart for a dataset version (cached with it)"""
+    return snapshot.cache.get_or_compute(('chart', name), lambda: EncodedPayload(
+        _timed_call('chart', name, CHARTS[name], snapshot.salary_data).to_json().encode()))
+
 @app.route('/api/charts/country-salary', methods=['GET'])
 def get_country_salary_chart():
     """Get country salary comparison chart data"""
-    if not app_data['processed']:
+    snapshot = g.snapshot
+    if snapshot is None:
         return jsonify({'error': 'No data loaded'}), 400
+    if snapshot.sql is not None:
+        return jsonify({'error': 'Not available for SQL-backed datasets'}), 400
     
     try:
-        salary_data = app_data['salary_data']
-        chart = chart_generator.create_country_salary_chart(salary_data)
-        
-        # Convert Plotly figure to JSON
-        return jsonify(json.loads(chart.to_json()))
+        return _send_encoded(_chart(snapshot, 'country-salary'))
+    except Overloaded as e:
+        return _overloaded(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/charts/role-salary', methods=['GET'])
 def get_role_salary_chart():
     """Get role salary comparison chart data"""
-    if not app_data['processed']:
+    snapshot = g.snapshot
+    if snapshot is None:
         return jsonify({'error': 'No data loaded'}), 400
+    if snapshot.sql is not None:
+        return jsonify({'error': 'Not available for SQL-backed datasets'}), 400
     
     try:
-        salary_data = app_data['salary_data']
-        chart = chart_generator.create_role_salary_chart(salary_data)
-        
-        return jsonify(json.loads(chart.to_json()))
+        return _send_encoded(_chart(snapshot, 'role-salary'))
+    except Overloaded as e:
+        return _overloaded(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/charts/heatmap', methods=['GET'])
 def get_heatmap():
     """Get salary heatmap chart data"""
-    if not app_data['processed']:
+    snapshot = g.snapshot
+    if snapshot is None:
         return jsonify({'error': 'No data loaded'}), 400
+    if snapshot.sql is not None:
+        return jsonify({'error': 'Not available for SQL-backed datasets'}), 400
     
     try:
-        salary_data = app_data['salary_data']
-        chart = chart_generator.create_salary_heatmap(salary_data)
-        
-        return jsonify(json.loads(chart.to_json()))
+        return _send_encoded(_chart(snapshot, 'heatmap'))
+    except Overloaded as e:
+        return _overloaded(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/economic', methods=['GET'])
 def get_economic_data():
     """Get economic context data"""
-    if not app_data['processed']:
+    snapshot = g.snapshot
+    if snapshot is None:
         return jsonify({'error': 'No data loaded'}), 400
     
     try:
-        economic_data = app_data['economic_data']
-        result = economic_data.to_dict(orient='records')
+        result = Records(snapshot.economic_data)
         
         return jsonify({
             'success': True,
@@ -379,12 +1151,12 @@ def get_economic_data():
 @app.route('/api/legal', methods=['GET'])
 def get_legal_data():
     """Get legal and cultural context data"""
-    if not app_data['processed']:
+    snapshot = g.snapshot
+    if snapshot is None:
         return jsonify({'error': 'No data loaded'}), 400
     
     try:
-        legal_data = app_data['legal_data']
-        result = legal_data.to_dict(orient='records')
+        result = Records(snapshot.legal_data)
         
         return jsonify({
             'success': True,
@@ -394,15 +1166,75 @@ def get_legal_data():
         return jsonify({'error': str(e)}), 500
 
 # Serve the pre-built React frontend for any non-API route.
-# The dist/ directory lives at ../frontend/dist relative to this file.
+# The dist/ directory lives at ../frontend/dist relative to this file; it is read
+# into memory once (see static_assets.py), so serving it never touches the disk.
 _FRONTEND_DIST = os.path.join(os.path.dirname(__file__), '..', 'frontend', 'dist')
+frontend_assets = StaticManifest(_FRONTEND_DIST)
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve_frontend(path):
-    if path and os.path.exists(os.path.join(_FRONTEND_DIST, path)):
-        return send_from_directory(_FRONTEND_DIST, path)
-    return send_from_directory(_FRONTEND_DIST, 'index.html')
+    # Unknown paths are client-side routes of the SPA
+    asset = (path and frontend_assets.lookup(path)) or frontend_assets.index
+    if asset is None:
+        return jsonify({'error': 'Frontend not built'}), 404
+    response = _send_encoded(asset)
+    response.headers['Cache-Control'] = asset.cache_control
+    return response
+
+
+def _warm_up():
+    """Fill the default dataset's result cache with the payloads the dashboard opens with"""
+    snapshot = datasets.get(DEFAULT_DATASET)
+    with dataset_load_seconds.time(('warm_caches',)):
+        payloads = [_encoded(snapshot, ('summary',), lambda: _summary(snapshot)),
+                    _salary_by_dimension(snapshot, {}, 'Country', 'country'),
+                    _salary_by_dimension(snapshot, {}, 'Role_Name', 'role')]
+        if snapshot.salary_data is not None:
+            payloads += [_chart(snapshot, name) for name in CHARTS]
+        # Compressed at the high levels here rather than on the first requests
+        for payload in payloads:
+            payload.precompress()
+    if snapshot.indexes is not None:
+        # Built on first use otherwise, by the first rank or similarity request
+        with dataset_load_seconds.time(('lookup_indexes',)):
+            snapshot.indexes.salary_ranks
+            snapshot.indexes.profiles
+
+def _warm_forecast():
+    snapshot = datasets.get(DEFAULT_DATASET)
+    if snapshot.salary_data is not None:
+        payload = _forecast(snapshot)
+        if payload is not None:
+            payload.precompress()
+
+# Load the dataset and warm the caches off the request path: /api/status
+# answers straight away, /api/ready once every step has finished.
+# STARTUP_MODE=sync runs the steps before the module finishes importing;
+# manual leaves calling readiness.run() to the importer (see startup_profile.py).
+readiness = Readiness()
+readiness.add_step('dataset', initialize_bmw_data)
+readiness.add_step('summaries', _warm_up)
+readiness.add_step('forecast', _warm_forecast)
+STARTUP_MODE = os.environ.get('STARTUP_MODE', 'background')
+# Executor pool processes import the main script under this name when the app runs
+# as `python app.py`; they only execute pool functions, so they skip startup
+_POOL_PROCESS = __name__ == '__mp_main__'
+if STARTUP_MODE == 'sync' and not _POOL_PROCESS:
+    readiness.run()
+elif STARTUP_MODE not in ('sync', 'manual') and not _POOL_PROCESS:
+    readiness.start()
+
+if not _POOL_PROCESS:
+    metrics_registry.start_flushing()
+
+# Opt-in: every worker watches the workbook itself, so a replaced file reaches all
+# of them (POST /api/init only reloads the worker that answers it)
+dataset_watcher = None
+if DATASET_WATCH_INTERVAL > 0 and not _POOL_PROCESS:
+    dataset_watcher = FileWatcher(BMW_DATASET_PATH, reload_bmw_data,
+                                  DATASET_WATCH_INTERVAL, DATASET_WATCH_DEBOUNCE)
+    dataset_watcher.start()
 
 
 if __name__ == '__main__':
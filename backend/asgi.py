@@ -0,0 +1,20 @@
+"""ASGI entry point: the same /api/* routes, served from an event loop.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5000 --workers 2
+
+Connections (idle keep-alives, slow clients, uploads still arriving) are held
+by the event loop; a request occupies one of ASGI_THREADS threads only while
+the app handles it, and CPU-heavy work still goes to the executor's process
+pool. See asgi_adapter.py, and serving_benchmark.py for a comparison with the
+gunicorn deployment.
+"""
+import os
+
+from app import app, executor
+from asgi_adapter import WsgiToAsgi
+
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 32))
+
+application = WsgiToAsgi(app, threads=ASGI_THREADS,
+                         max_body_bytes=app.config['MAX_CONTENT_LENGTH'],
+                         on_shutdown=executor.shutdown)
@@ -0,0 +1,190 @@
+"""Serve a WSGI app from an ASGI server's event loop.
+
+The event loop owns the connections: idle keep-alive clients, slow clients and
+uploads still arriving cost a coroutine, not a thread. A request takes a thread
+from a bounded pool only once its whole body has arrived (spooled to a
+temporary file beyond `spool_bytes`), and gives it back once the response has
+been sent. The response is passed on chunk by chunk as the WSGI app yields it,
+and the thread waits for the client to accept each chunk (backpressure).
+
+asgiref's WsgiToAsgi does the same but is not a dependency of the app; this
+adapter covers what the API needs (HTTP and lifespan, no websockets).
+"""
+import asyncio
+import logging
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ClientDisconnected(Exception):
+    """The client went away before the request body or response was complete."""
+
+
+class WsgiToAsgi:
+    """ASGI 3 application wrapping `wsgi_app`.
+
+    `threads` bounds the requests being handled at once; `max_body_bytes`
+    rejects larger request bodies with 413 before they are read;
+    `on_shutdown` runs when the server stops (ASGI lifespan).
+    """
+
+    def __init__(self, wsgi_app, threads: int = 16, max_body_bytes: Optional[int] = None,
+                 spool_bytes: int = 1024 * 1024, on_shutdown: Optional[Callable[[], object]] = None):
+        self.wsgi_app = wsgi_app
+        self.max_body_bytes = max_body_bytes
+        self.spool_bytes = spool_bytes
+        self.on_shutdown = on_shutdown
+        self.threads = ThreadPoolExecutor(threads, thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        else:
+            raise ValueError(f"Unsupported ASGI scope type '{scope['type']}'")
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.on_shutdown is not None:
+                    self.on_shutdown()
+                self.threads.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        length = _header(scope, b'content-length')
+        if (self.max_body_bytes is not None and length is not None
+                and length.isdigit() and int(length) > self.max_body_bytes):
+            await _send_error(send, 413, b'Request body too large')
+            return
+        try:
+            body = await self._read_body(receive)
+        except ClientDisconnected:
+            return
+        if body is None:
+            await _send_error(send, 413, b'Request body too large')
+            return
+
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self.threads, self._run_wsgi, scope, body, send, loop)
+        except ClientDisconnected:
+            pass
+        finally:
+            body.close()
+
+    async def _read_body(self, receive):
+        """The request body in a (spooled) file, or None once it exceeds max_body_bytes."""
+        body = tempfile.SpooledTemporaryFile(max_size=self.spool_bytes)
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                raise ClientDisconnected()
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if self.max_body_bytes is not None and size > self.max_body_bytes:
+                body.close()
+                return None
+            body.write(chunk)
+            if not message.get('more_body', False):
+                body.seek(0)
+                return body
+
+    def _run_wsgi(self, scope, body, send, loop):
+        """Call the WSGI app on a pool thread, forwarding its response to the event loop."""
+        response: List[Tuple[int, list]] = []
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info is not None and sent_headers:
+                raise exc_info[1].with_traceback(exc_info[2])
+            response[:] = [(int(status.split(' ', 1)[0]),
+                            [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                             for name, value in headers])]
+
+        def forward(message):
+            try:
+                asyncio.run_coroutine_threadsafe(send(message), loop).result()
+            except Exception as e:  # the server raises once the client has gone
+                raise ClientDisconnected() from e
+
+        sent_headers = False
+        result = self.wsgi_app(_environ(scope, body), start_response)
+        try:
+            for chunk in result:
+                if not chunk:
+                    continue
+                if not sent_headers:
+                    status, headers = response[0]
+                    forward({'type': 'http.response.start', 'status': status, 'headers': headers})
+                    sent_headers = True
+                forward({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            if not sent_headers:
+                status, headers = response[0]
+                forward({'type': 'http.response.start', 'status': status, 'headers': headers})
+            forward({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get('headers', []):
+        if key.lower() == name:
+            return value.decode('latin-1')
+    return None
+
+
+async def _send_error(send, status: int, message: bytes):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'text/plain'),
+                            (b'content-length', str(len(message)).encode())]})
+    await send({'type': 'http.response.body', 'body': message})
+
+
+def _environ(scope, body) -> dict:
+    """WSGI environ for an ASGI HTTP scope (PEP 3333 strings are latin-1 decoded bytes)."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    # The decoded path, as WSGI servers pass it (raw_path is still percent-encoded)
+    path = scope['path']
+    root_path = scope.get('root_path', '')
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': str(client[0]),
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+            continue
+        key = f'HTTP_{name}'
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
@@ -0,0 +1,165 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Mapping, Optional
+
+from executor import Overloaded
+
+# Bound on the bytes of cached values that report their size (`nbytes`, e.g.
+# serialized responses and arrays) per cache, i.e. per dataset version
+RESULT_CACHE_MAX_BYTES = 64 * 2**20
+# How long a caller waits for a result another caller is computing, in seconds,
+# before giving up with Overloaded (503); and the Retry-After it suggests then
+COALESCED_WAIT_TIMEOUT = 60.0
+COALESCED_RETRY_AFTER = 5
+
+# Lookups over every cache of this process. Per-cache stats restart with each
+# dataset version; these only grow, as monitoring counters must.
+_totals = {'hits': 0, 'misses': 0, 'coalesced': 0}
+_totals_lock = threading.Lock()
+
+
+def lookup_totals() -> dict:
+    """Hits, misses and coalesced waits of every ResultCache in this process."""
+    with _totals_lock:
+        return dict(_totals)
+
+
+def _count(outcome: str):
+    with _totals_lock:
+        _totals[outcome] += 1
+
+
+def normalized_params(args: Mapping[str, str]) -> tuple:
+    """Order-independent, hashable form of query parameters for cache keys."""
+    items = args.items(multi=True) if hasattr(args, 'getlist') else args.items()
+    return tuple(sorted((key, value) for key, value in items if value != ''))
+
+
+class _Flight:
+    """One computation in progress, shared by every caller asking for its key."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+def _fresh(error: BaseException) -> BaseException:
+    """A new exception of the same type and arguments, for one more waiting caller.
+
+    Raising one exception object on several threads would have each of them
+    append its frames to the same traceback.
+    """
+    fresh = type(error).__new__(type(error), *error.args)
+    fresh.__dict__.update(getattr(error, '__dict__', {}))
+    return fresh
+
+
+class ResultCache:
+    """Small thread-safe LRU of computed results.
+
+    One cache belongs to one dataset version (it lives on that version's
+    indexes), so swapping the dataset drops every cached entry with it.
+
+    Misses are coalesced (single-flight): while one caller computes a key,
+    concurrent callers for the same key wait for that result, or its
+    exception, instead of computing it again. `coalesced` counts those waits.
+    A waiter gives up after `wait_timeout` seconds with Overloaded.
+
+    Besides `max_entries`, values reporting `nbytes` are held to `max_bytes`
+    in total. They are sized when they are stored, and again whenever a value
+    with `on_resize` (such as an EncodedPayload gaining a compressed variant)
+    reports a change.
+    """
+
+    def __init__(self, max_entries: int = 256,
+                 max_bytes: Optional[int] = RESULT_CACHE_MAX_BYTES,
+                 wait_timeout: float = COALESCED_WAIT_TIMEOUT):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.wait_timeout = wait_timeout
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._inflight: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any],
+                       keep: Optional[Callable[[Any], bool]] = None) -> Any:
+        """Cached value of `key`, else compute() - stored unless keep(value) is false."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                _count('hits')
+                return self._entries[key]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.misses += 1
+                _count('misses')
+            else:
+                self.coalesced += 1
+                _count('coalesced')
+
+        if not leader:
+            if not flight.done.wait(self.wait_timeout):
+                raise Overloaded('coalesced', COALESCED_RETRY_AFTER)
+            if flight.error is not None:
+                raise _fresh(flight.error) from flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if flight.error is None and (keep is None or keep(flight.value)):
+                    self._store(key, flight.value)
+                del self._inflight[key]
+            flight.done.set()
+        return flight.value
+
+    def _store(self, key: Hashable, value: Any):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        on_resize = getattr(value, 'on_resize', None)
+        if on_resize is not None:
+            on_resize(lambda: self._resize(key, value))
+        self._account(key, value)
+
+    def _resize(self, key: Hashable, value: Any):
+        with self._lock:
+            if self._entries.get(key) is value:
+                self._account(key, value)
+
+    def _account(self, key: Hashable, value: Any):
+        """(Re)count the size of a stored entry, evicting the oldest entries if needed."""
+        size = getattr(value, 'nbytes', 0)
+        self.nbytes += size - self._sizes.get(key, 0)
+        self._sizes[key] = size
+        while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self.nbytes > self.max_bytes
+                and len(self._entries) > 1):
+            evicted, _ = self._entries.popitem(last=False)
+            self.nbytes -= self._sizes.pop(evicted)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def stats(self) -> dict:
+        return {'entries': len(self._entries), 'bytes': self.nbytes, 'hits': self.hits,
+                'misses': self.misses, 'coalesced': self.coalesced}
+
+    def __len__(self):
+        return len(self._entries)
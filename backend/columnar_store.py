@@ -0,0 +1,264 @@
+"""On-disk columnar storage for datasets that are not resident in memory.
+
+A stored dataset is a directory with one sub-directory per table (plus any
+files saved alongside, such as a SQL database). Each table
+holds one .npy file per column plus meta.json with the column order and how
+each column is encoded:
+
+- plain: numeric, boolean and datetime columns, saved as their numpy array
+- dictionary: string columns, saved as int32 codes (-1 = missing) with the
+  distinct values listed in meta.json
+- json: anything else (lists, mixed objects), saved as a JSON array
+
+append() adds rows to a stored table as a new part - another table directory,
+listed in dataset.json - instead of rewriting the rows already stored. Parts
+are merged size-tiered: a part is merged with the one before it while that one
+holds at most PART_MERGE_RATIO times its rows. A table thus keeps a few parts,
+and each row is rewritten a logarithmic number of times as the table grows.
+
+Several worker processes share one store. Writers hold lock(key) and readers
+lock(key, shared=True), so nobody loads a dataset while it is being replaced.
+version(key) tells a process whether its copy is still the stored one.
+"""
+import json
+import os
+import re
+import shutil
+import tempfile
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: lock() only serializes what the registry's own locks do
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+_SAFE_KEY = re.compile(r'^[A-Za-z0-9_-]+$')
+PART_MERGE_RATIO = 2
+
+
+def _encode_column(series: pd.Series, path: str) -> dict:
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biufMm':
+        np.save(path, series.to_numpy(), allow_pickle=False)
+        return {'encoding': 'plain'}
+
+    try:
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        if all(isinstance(value, str) for value in uniques):
+            np.save(path, codes.astype(np.int32), allow_pickle=False)
+            return {'encoding': 'dictionary', 'values': list(uniques)}
+    except TypeError:  # unhashable values such as lists
+        pass
+    return {'encoding': 'json', 'values': [_json_value(value) for value in series.tolist()]}
+
+
+def _json_value(value):
+    if isinstance(value, (list, tuple, dict)):
+        return value
+    return None if pd.isna(value) else value
+
+
+def _decode_column(spec: dict, path: str) -> np.ndarray:
+    if spec['encoding'] == 'plain':
+        return np.load(path, allow_pickle=False)
+    if spec['encoding'] == 'dictionary':
+        codes = np.load(path, allow_pickle=False)
+        values = np.empty(len(spec['values']) + 1, dtype=object)
+        values[:-1] = spec['values']
+        values[-1] = None
+        return values[codes]  # code -1 picks the trailing None
+    column = np.empty(len(spec['values']), dtype=object)
+    column[:] = spec['values']
+    return column
+
+
+def _write_table(frame: pd.DataFrame, directory: str):
+    os.makedirs(directory)
+    columns = []
+    for position, (name, series) in enumerate(frame.items()):
+        spec = _encode_column(series, os.path.join(directory, f'c{position}.npy'))
+        spec.update(name=name, dtype=str(series.dtype))
+        columns.append(spec)
+    index = frame.index.to_numpy()
+    keep_index = not isinstance(frame.index, pd.RangeIndex) and index.dtype.kind in 'iu'
+    if keep_index:
+        np.save(os.path.join(directory, 'index.npy'), index, allow_pickle=False)
+    with open(os.path.join(directory, 'meta.json'), 'w', encoding='utf-8') as handle:
+        json.dump({'rows': len(frame), 'columns': columns, 'index': keep_index}, handle,
+                  default=str)
+
+
+def _read_table(directory: str) -> pd.DataFrame:
+    with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as handle:
+        meta = json.load(handle)
+    data = {}
+    for position, spec in enumerate(meta['columns']):
+        column = _decode_column(spec, os.path.join(directory, f'c{position}.npy'))
+        try:
+            data[spec['name']] = pd.Series(column, dtype=spec['dtype'], copy=False)
+        except (TypeError, ValueError):
+            data[spec['name']] = pd.Series(column, copy=False)
+    frame = pd.DataFrame(data, columns=[spec['name'] for spec in meta['columns']])
+    if meta['index']:
+        frame.index = np.load(os.path.join(directory, 'index.npy'), allow_pickle=False)
+    elif not meta['columns']:
+        frame = pd.DataFrame(index=pd.RangeIndex(meta['rows']))
+    return frame
+
+
+class ColumnarStore:
+    """Directory of stored datasets, one sub-directory per dataset id."""
+
+    def __init__(self, root: str):
+        self.root = root
+        # key -> (stat signature of dataset.json, version read from it)
+        self._versions: Dict[str, Tuple[tuple, int]] = {}
+
+    def _path(self, key: str) -> str:
+        if not _SAFE_KEY.match(key):
+            raise ValueError(f"Invalid dataset id '{key}'")
+        return os.path.join(self.root, key)
+
+    def save(self, key: str, tables: Dict[str, pd.DataFrame], meta: dict,
+             files: Optional[Dict[str, str]] = None):
+        """Write all tables of a dataset, replacing any stored copy in one rename.
+
+        `files` maps names to existing files that are moved in with the tables.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=f'.{key}-', dir=self.root)
+        try:
+            for name, frame in tables.items():
+                _write_table(frame, os.path.join(staging, name))
+            for name, source in (files or {}).items():
+                os.replace(source, os.path.join(staging, name))
+            with open(os.path.join(staging, 'dataset.json'), 'w', encoding='utf-8') as handle:
+                json.dump(dict(meta, tables=list(tables), parts={
+                    name: [{'dir': name, 'rows': len(frame)}] for name, frame in tables.items()}),
+                    handle)
+            target = self._path(key)
+            if os.path.exists(target):
+                shutil.rmtree(target)
+            os.replace(staging, target)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    def append(self, key: str, meta: dict, rows: Optional[Dict[str, pd.DataFrame]] = None,
+               replace: Optional[Dict[str, pd.DataFrame]] = None):
+        """Add `rows` to stored tables and replace whole (small) tables, then set `meta`.
+
+        Only the new rows, the replaced tables and any parts merged with them
+        are written; dataset.json switches to them in one rename. Appended
+        tables are read back with a fresh RangeIndex.
+        """
+        path = self._path(key)
+        with open(os.path.join(path, 'dataset.json'), encoding='utf-8') as handle:
+            stored = json.load(handle)
+        tables, parts = stored['tables'], stored.get('parts', {})
+        before = {part['dir'] for name in tables for part in self._parts(name, parts)}
+        parts = {name: self._parts(name, parts) for name in tables}
+
+        for name, frame in (replace or {}).items():
+            parts[name] = [self._write_part(path, name, frame)]
+        for name, frame in (rows or {}).items():
+            if not len(frame):
+                continue
+            merged = [frame]
+            table = parts[name]
+            # Size-tiered: fold in earlier parts not much larger than what is written
+            while table and table[-1]['rows'] is not None and (
+                    table[-1]['rows'] <= PART_MERGE_RATIO * sum(map(len, merged))):
+                merged.insert(0, _read_table(os.path.join(path, table.pop()['dir'])))
+            frame = pd.concat(merged, ignore_index=True) if len(merged) > 1 else frame
+            table.append(self._write_part(path, name, frame.reset_index(drop=True)))
+
+        staging = os.path.join(path, 'dataset.json.tmp')
+        with open(staging, 'w', encoding='utf-8') as handle:
+            json.dump(dict(meta, tables=list(parts), parts=parts), handle)
+        os.replace(staging, os.path.join(path, 'dataset.json'))
+        after = {part['dir'] for table in parts.values() for part in table}
+        for directory in before - after:
+            shutil.rmtree(os.path.join(path, directory), ignore_errors=True)
+
+    @staticmethod
+    def _parts(name: str, parts: dict) -> list:
+        """Parts of a stored table; save() writes each table as a single one.
+
+        Stores written before parts existed don't list them (rows unknown).
+        """
+        return list(parts.get(name) or [{'dir': name, 'rows': None}])
+
+    @staticmethod
+    def _write_part(path: str, name: str, frame: pd.DataFrame) -> dict:
+        directory = f'{name}.{uuid.uuid4().hex[:8]}'
+        _write_table(frame, os.path.join(path, directory))
+        return {'dir': directory, 'rows': len(frame)}
+
+    def load(self, key: str) -> Tuple[Dict[str, pd.DataFrame], dict]:
+        """Read back (tables, meta) as written by save() and append()."""
+        path = self._path(key)
+        with open(os.path.join(path, 'dataset.json'), encoding='utf-8') as handle:
+            meta = json.load(handle)
+        parts = meta.pop('parts', {})
+        tables = {}
+        for name in meta.pop('tables'):
+            frames = [_read_table(os.path.join(path, part['dir']))
+                      for part in self._parts(name, parts)]
+            tables[name] = (frames[0] if len(frames) == 1
+                            else pd.concat(frames, ignore_index=True))
+        return tables, meta
+
+    @contextmanager
+    def lock(self, key: str, shared: bool = False):
+        """Hold the cross-process lock of one dataset; exclusive unless `shared`."""
+        os.makedirs(self.root, exist_ok=True)
+        # Next to the dataset directory, which save() replaces
+        path = os.path.join(self.root, f'.{os.path.basename(self._path(key))}.lock')
+        with open(path, 'a+b') as handle:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            yield  # closing the file releases the lock
+
+    def version(self, key: str) -> Optional[int]:
+        """Version in the stored meta (None if not stored), re-read only when the file changed."""
+        path = os.path.join(self._path(key), 'dataset.json')
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        cached = self._versions.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        try:
+            with open(path, encoding='utf-8') as handle:
+                version = json.load(handle)['version']
+        except FileNotFoundError:  # deleted since the stat
+            return None
+        self._versions[key] = (signature, version)
+        return version
+
+    def scratch_dir(self) -> str:
+        """A fresh directory on the store's filesystem for building files to save()."""
+        os.makedirs(self.root, exist_ok=True)
+        return tempfile.mkdtemp(prefix='.scratch-', dir=self.root)
+
+    def file_path(self, key: str, name: str) -> str:
+        return os.path.join(self._path(key), name)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(os.path.join(self._path(key), 'dataset.json'))
+
+    def delete(self, key: str):
+        shutil.rmtree(self._path(key), ignore_errors=True)
+
+    def disk_bytes(self, key: str) -> int:
+        total = 0
+        for directory, _, files in os.walk(self._path(key)):
+            total += sum(os.path.getsize(os.path.join(directory, name)) for name in files)
+        return total
@@ -0,0 +1,139 @@
+"""Serialized and precompressed response bodies for cached results.
+
+A cacheable endpoint serializes its result once per dataset version and keeps
+the bytes together with their gzip and brotli variants, each compressed the
+first time a client asks for it. Repeated requests then only pick the variant
+matching Accept-Encoding; the response carries Content-Encoding, so
+flask_compress leaves it alone instead of compressing it again.
+
+A variant is first compressed on the request that asks for it, so it uses the
+fast levels of on-the-fly compression (a one-off page of several MB takes
+about 0.2 s at brotli 4, and 1 s at 9). Payloads that are served again - the
+variant's RECOMPRESS_AFTER-th time - and payloads warmed off the request path
+(precompress()) get the higher levels, which pay off over many responses.
+"""
+import gzip
+import hashlib
+import threading
+from typing import Callable, Dict, Optional
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 9
+# Levels of a variant compressed for the request that first asks for it
+FAST_GZIP_LEVEL = 6
+FAST_BROTLI_QUALITY = 4
+# Serves of a fast variant after which it is compressed again at the higher levels
+RECOMPRESS_AFTER = 3
+# Bodies smaller than this are sent as they are
+MIN_COMPRESS_BYTES = 500
+
+
+def _compress(body: bytes, encoding: str, fast: bool = False) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=FAST_BROTLI_QUALITY if fast else BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=FAST_GZIP_LEVEL if fast else GZIP_LEVEL, mtime=0)
+
+
+def available_encodings() -> tuple:
+    """Encodings we can produce, most preferred first."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(accept_encoding: str, encodings: tuple = None) -> Optional[str]:
+    """Best of `encodings` acceptable per an Accept-Encoding header (None = identity)."""
+    encodings = available_encodings() if encodings is None else encodings
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class EncodedPayload:
+    """One serialized response body and its compressed variants.
+
+    `variants` supplies variants compressed elsewhere (e.g. .gz/.br files);
+    `compressible=False` is for already compressed content such as images.
+    """
+
+    def __init__(self, body: bytes, mimetype: str = 'application/json',
+                 variants: Optional[Dict[str, bytes]] = None, compressible: bool = True):
+        self.body = body
+        self.mimetype = mimetype
+        self.compressible = compressible
+        self.etag = hashlib.sha1(body).hexdigest()
+        self._variants: Dict[str, bytes] = dict(variants or {})
+        # Variants still at the fast levels -> times served
+        self._serves: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._resized: Optional[Callable[[], None]] = None
+
+    def on_resize(self, callback: Callable[[], None]):
+        """Call `callback` whenever a variant is added or replaced (nbytes changed)."""
+        self._resized = callback
+
+    def variant(self, encoding: Optional[str]) -> bytes:
+        """The body in `encoding` (None = uncompressed), compressed on first use."""
+        if encoding is None:
+            return self.body
+        with self._lock:
+            added = encoding not in self._variants
+            if added:
+                self._variants[encoding] = _compress(self.body, encoding, fast=True)
+                self._serves[encoding] = 0
+            data = self._variants[encoding]
+            recompress = False
+            if encoding in self._serves:
+                self._serves[encoding] += 1
+                recompress = self._serves[encoding] == RECOMPRESS_AFTER
+        if recompress:
+            self._replace(encoding, _compress(self.body, encoding))
+        elif added and self._resized is not None:
+            self._resized()
+        return data
+
+    def precompress(self, encodings: Optional[tuple] = None):
+        """Compress variants at the higher levels now, e.g. while warming caches."""
+        if not self.compressible or len(self.body) < MIN_COMPRESS_BYTES:
+            return
+        for encoding in available_encodings() if encodings is None else encodings:
+            with self._lock:
+                done = encoding in self._variants and encoding not in self._serves
+            if not done:
+                self._replace(encoding, _compress(self.body, encoding))
+
+    def _replace(self, encoding: str, data: bytes):
+        with self._lock:
+            self._variants[encoding] = data
+            self._serves.pop(encoding, None)
+        if self._resized is not None:
+            self._resized()
+
+    def negotiate(self, accept_encoding: str) -> Optional[str]:
+        if not self.compressible or len(self.body) < MIN_COMPRESS_BYTES:
+            return None
+        return choose_encoding(accept_encoding, tuple(
+            dict.fromkeys(available_encodings() + tuple(self._variants))))
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            return len(self.body) + sum(len(variant) for variant in self._variants.values())
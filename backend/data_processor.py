@@ -28,6 +28,47 @@ class DataProcessor:
         except Exception as e:
             return self._create_default_data()
     
+    def process_salary_chunks(self, chunks):
+        """Clean salary rows chunk by chunk, for inputs too large to load at once."""
+        for chunk in chunks:
+            salary_data = self._extract_salary_data(chunk)
+            if len(salary_data):
+                yield salary_data
+    
+    def process_file(self, filepath: str) -> Dict[str, pd.DataFrame]:
+        """Read an uploaded CSV/Excel file and process it like process_raw_data()."""
+        if filepath.endswith('.csv'):
+            return self.process_raw_data(pd.read_csv(filepath))
+        return self.process_raw_data(pd.read_excel(filepath))
+    
+    def stream_salary_csv(self, filepath: str, chunk_rows: int):
+        """Read and clean a CSV `chunk_rows` rows at a time; memory stays bounded by one chunk."""
+        with pd.read_csv(filepath, chunksize=chunk_rows) as reader:
+            yield from self.process_salary_chunks(reader)
+    
+    def process_appended_data(self, raw_data: pd.DataFrame, columns: list) -> pd.DataFrame:
+        """Clean rows to append to an existing salary table with `columns`."""
+        try:
+            salary_data = self._extract_salary_data(raw_data)
+        except KeyError as e:
+            raise ValueError(f"Appended data lacks column {e}") from None
+        missing = [col for col in self.required_salary_columns
+                   if col in columns and col not in salary_data.columns]
+        if missing:
+            raise ValueError(f"Appended data lacks columns: {', '.join(missing)}")
+        return salary_data.reindex(columns=columns)
+    
+    def extend_country_data(self, economic_data: pd.DataFrame, legal_data: pd.DataFrame,
+                            countries: list):
+        """Add default economic/legal rows for countries the tables do not cover yet."""
+        tables = []
+        for table, create in ((economic_data, self._create_default_economic_data),
+                              (legal_data, self._create_default_legal_data)):
+            known = set(table['country']) if 'country' in table.columns else set()
+            added = create([country for country in countries if country not in known])
+            tables.append(pd.concat([table, added], ignore_index=True) if len(added) else table)
+        return tables[0], tables[1]
+    
     def _is_combined_data(self, data: pd.DataFrame) -> bool:
         """Check if data contains multiple data types."""
         salary_cols = sum(1 for col in self.required_salary_columns if col in data.columns)
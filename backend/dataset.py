@@ -0,0 +1,133 @@
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from indexes import DatasetIndexes
+from sql_backend import SQLDataset
+
+DEFAULT_DATASET = 'default'
+
+
+def estimate_nbytes(obj, _seen: Optional[set] = None) -> int:
+    """Approximate bytes held by the arrays, frames and containers reachable from `obj`."""
+    seen = set() if _seen is None else _seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=True))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        return size + sum(estimate_nbytes(key, seen) + estimate_nbytes(value, seen)
+                          for key, value in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return size + sum(estimate_nbytes(item, seen) for item in obj)
+    if hasattr(obj, '__dict__') and not isinstance(obj, type):
+        return size + estimate_nbytes(vars(obj), seen)
+    return size
+
+
+@dataclass(frozen=True)
+class DatasetSnapshot:
+    """One published dataset: its tables plus everything derived from them.
+
+    Snapshots are never modified after publication - a new upload or reload
+    publishes a new snapshot instead - so a request that pins one sees a
+    consistent salary/economic/legal set for its whole lifetime, even while
+    another thread publishes. The tables must be treated as read-only.
+
+    SQL-backed snapshots keep the salary table on disk: `sql` is set and
+    `salary_data` and `indexes` are None.
+    """
+    version: int
+    salary_data: Optional[pd.DataFrame]
+    economic_data: pd.DataFrame
+    legal_data: pd.DataFrame
+    indexes: Optional[DatasetIndexes]
+    source: str
+    dataset_id: str = DEFAULT_DATASET
+    sql: Optional[SQLDataset] = None
+    published_at: float = field(default_factory=time.time)
+
+    @property
+    def records(self) -> int:
+        return self.sql.row_count if self.sql is not None else len(self.salary_data)
+
+    @property
+    def backend(self) -> str:
+        return 'sql' if self.sql is not None else 'memory'
+
+    @property
+    def cache(self):
+        """Result cache of this dataset version"""
+        return self.sql.cache if self.sql is not None else self.indexes.cache
+
+
+class SnapshotStore:
+    """Holds the current snapshot of one dataset; publishing is a single reference swap.
+
+    Indexes are built before the swap, outside the lock, so readers are never
+    blocked and never see a half-built dataset.
+    """
+
+    def __init__(self, dataset_id: str = DEFAULT_DATASET):
+        self.dataset_id = dataset_id
+        self._current: Optional[DatasetSnapshot] = None
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def current(self) -> Optional[DatasetSnapshot]:
+        return self._current
+
+    @property
+    def version(self) -> int:
+        """Latest version number handed out"""
+        return self._version
+
+    def publish(self, salary_data: Optional[pd.DataFrame], economic_data: pd.DataFrame,
+                legal_data: pd.DataFrame, source: str, version: Optional[int] = None,
+                sql: Optional[SQLDataset] = None,
+                indexes: Optional[DatasetIndexes] = None) -> DatasetSnapshot:
+        """Swap in new tables; `version` restores a previously published version number.
+
+        Pass `sql` (and no salary_data) to publish a SQL-backed salary table, or
+        `indexes` already derived for salary_data (see DatasetIndexes.extended()).
+        """
+        if indexes is None and sql is None:
+            indexes = DatasetIndexes(salary_data)
+        with self._lock:
+            if version is None:
+                self._version += 1
+                version = self._version
+            else:
+                self._version = max(self._version, version)
+            snapshot = DatasetSnapshot(
+                version=version,
+                salary_data=salary_data,
+                economic_data=economic_data,
+                legal_data=legal_data,
+                indexes=indexes,
+                source=source,
+                dataset_id=self.dataset_id,
+                sql=sql,
+            )
+            self._current = snapshot
+        return snapshot
+
+    def evict(self, snapshot: DatasetSnapshot) -> bool:
+        """Drop `snapshot` if it is still current; requests that pinned it keep it."""
+        with self._lock:
+            if self._current is not snapshot:
+                return False
+            self._current = None
+            return True
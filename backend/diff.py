@@ -0,0 +1,89 @@
+"""Compare the group aggregates of two dataset versions (/api/data/diff).
+
+Each version is reduced once to count, mean and median salary per
+Country x Role x Experience group, taken from its group sketches (or SQL
+partials) rather than its rows and cached with the version. A diff then only
+joins two small group tables on their keys.
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from aggregation import select_top
+from sketches import SKETCH_VALUE_COLUMN
+
+DIFF_DIMENSIONS = ['Country', 'Role_Name', 'Experience_Level']
+
+
+def version_groups(snapshot) -> Optional[Dict[str, np.ndarray]]:
+    """Count/mean/median of Salary_Avg_USD per DIFF_DIMENSIONS group (None without salaries)."""
+    def compute():
+        if snapshot.sql is not None:
+            if SKETCH_VALUE_COLUMN not in snapshot.sql.columns:
+                return None
+            dimensions = [d for d in DIFF_DIMENSIONS if d in snapshot.sql.dimensions]
+            summary = snapshot.sql.group_summary({}, dimensions, [0.5], SKETCH_VALUE_COLUMN)
+        else:
+            if snapshot.indexes.sketches is None:
+                return None
+            dimensions = [d for d in DIFF_DIMENSIONS if d in snapshot.indexes.dimensions]
+            summary = snapshot.indexes.sketches.query({}, dimensions, [0.5])
+        groups = {d: summary[d] for d in dimensions}
+        groups.update(count=summary['count'], mean=summary['mean'], median=summary['p50'])
+        return groups
+
+    return snapshot.cache.get_or_compute(('version-groups',), compute)
+
+
+def _keys(groups: Dict[str, np.ndarray], dimensions: List[str]) -> pd.Index:
+    if not dimensions:
+        return pd.Index(np.zeros(len(groups['count']), dtype=np.int64))
+    return pd.MultiIndex.from_arrays([groups[d] for d in dimensions])
+
+
+def _take(groups: Dict[str, np.ndarray], positions: np.ndarray) -> Dict[str, np.ndarray]:
+    return {name: column[positions] for name, column in groups.items()}
+
+
+def diff_groups(base: Dict[str, np.ndarray], target: Dict[str, np.ndarray], n: int = 10,
+                min_count: int = 1) -> Dict[str, object]:
+    """Join two version_groups() tables on their group keys.
+
+    Returns `changed` (groups in both, with base/target/delta columns),
+    `appeared` and `disappeared` groups, and `movers`: the `n` groups present in
+    both versions with the largest absolute change in mean salary, among groups
+    with at least `min_count` rows in each version.
+    """
+    dimensions = [d for d in DIFF_DIMENSIONS if d in target]
+    if [d for d in DIFF_DIMENSIONS if d in base] != dimensions:
+        raise ValueError('The two versions are not grouped by the same dimensions')
+
+    positions = _keys(base, dimensions).get_indexer(_keys(target, dimensions))
+    matched = np.flatnonzero(positions >= 0)
+    previous = positions[matched]
+    gone = np.ones(len(base['count']), dtype=bool)
+    gone[previous] = False
+
+    changed = {d: target[d][matched] for d in dimensions}
+    for name in ('count', 'mean', 'median'):
+        before, after = base[name][previous], target[name][matched]
+        changed[f'{name}_base'] = before
+        changed[f'{name}_target'] = after
+        changed[f'{name}_delta'] = after - before
+    with np.errstate(invalid='ignore', divide='ignore'):
+        changed['mean_change_pct'] = 100.0 * changed['mean_delta'] / changed['mean_base']
+
+    ranking = dict(changed, count=np.minimum(changed['count_base'], changed['count_target']),
+                   abs_mean_delta=np.abs(changed['mean_delta']))
+    movers = select_top(ranking, 'abs_mean_delta', n, True, min_count)
+    for helper in ('count', 'abs_mean_delta'):
+        movers.pop(helper)
+
+    return {
+        'dimensions': dimensions,
+        'changed': changed,
+        'appeared': _take(target, np.flatnonzero(positions < 0)),
+        'disappeared': _take(base, np.flatnonzero(gone)),
+        'movers': movers,
+    }
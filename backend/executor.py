@@ -0,0 +1,168 @@
+"""Bounded execution of CPU-heavy work, so cheap requests are not stuck behind it.
+
+Work is grouped into classes (forecast, chart, upload, aggregate), each with
+its own concurrency limit. A request that can't get a slot within the class's
+queue timeout is rejected with Overloaded, which the app turns into
+503 + Retry-After rather than letting the worker run into its timeout.
+The pool has fewer processes than the classes have slots: the same timeout,
+counted from when the request started queueing for its slot, also bounds
+the wait for a pool process.
+
+`call()` runs a function in a shared process pool, off the GIL of the worker
+serving requests; arguments and results are pickled, so it suits work with
+small inputs relative to its CPU time. `slot()` only applies the limit and
+keeps the work on the request thread, for work on structures that are too
+large or too shared to ship to another process (indexes, the registry).
+"""
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Overloaded(Exception):
+    """No slot of a work class freed up within its queue timeout."""
+
+    def __init__(self, work_class: str, retry_after: int):
+        super().__init__(f"Too many concurrent '{work_class}' requests, retry in {retry_after}s")
+        self.work_class = work_class
+        self.retry_after = retry_after
+
+
+class _WorkClass:
+    def __init__(self, name: str, limit: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self.slots = threading.BoundedSemaphore(limit)
+        self.running = 0
+        self.queued = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def describe(self) -> dict:
+        return {
+            'limit': self.limit,
+            'queue_timeout': self.queue_timeout,
+            'running': self.running,
+            'queued': self.queued,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'wait_seconds': round(self.wait_seconds, 3),
+            'max_wait_seconds': round(self.max_wait_seconds, 3),
+        }
+
+
+class Executor:
+    """Per-class concurrency limits in front of a lazily started process pool.
+
+    `processes=0` runs call() on the request thread (limits still apply).
+    """
+
+    def __init__(self, processes: int = 2, retry_after: int = 5):
+        self.processes = processes
+        self.retry_after = retry_after
+        self._classes: Dict[str, _WorkClass] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        # The slots the current thread holds: [(work class, deadline)], innermost last
+        self._held = threading.local()
+
+    def add_class(self, name: str, limit: int, queue_timeout: float):
+        self._classes[name] = _WorkClass(name, limit, queue_timeout)
+
+    @contextmanager
+    def slot(self, work_class: str):
+        """Hold one slot of `work_class` for the duration of the block."""
+        work = self._classes[work_class]
+        with self._lock:
+            work.queued += 1
+        started = time.perf_counter()
+        acquired = work.slots.acquire(timeout=work.queue_timeout)
+        waited = time.perf_counter() - started
+        with self._lock:
+            work.queued -= 1
+            work.wait_seconds += waited
+            work.max_wait_seconds = max(work.max_wait_seconds, waited)
+            if acquired:
+                work.running += 1
+            else:
+                work.rejected += 1
+        if not acquired:
+            raise Overloaded(work_class, self.retry_after)
+        held = self._held.__dict__.setdefault('slots', [])
+        held.append((work, started + work.queue_timeout))
+        try:
+            yield
+        finally:
+            held.pop()
+            with self._lock:
+                work.running -= 1
+                work.completed += 1
+            work.slots.release()
+
+    def call(self, work_class: str, fn: Callable[..., Any], *args) -> Any:
+        """Run fn(*args) in the process pool within the limit of `work_class`."""
+        with self.slot(work_class):
+            return self.run(fn, *args)
+
+    def run(self, fn: Callable[..., Any], *args) -> Any:
+        """Run fn(*args) in the process pool, e.g. from inside an already held slot().
+
+        Inside a slot, work that no pool process has picked up by the slot's
+        queue deadline is cancelled with Overloaded; work already running is
+        waited for.
+        """
+        if self.processes <= 0:
+            return fn(*args)
+        pool = self._get_pool()
+        held = getattr(self._held, 'slots', None)
+        try:
+            future = pool.submit(fn, *args)
+            if held:
+                work, deadline = held[-1]
+                try:
+                    return future.result(timeout=max(0.0, deadline - time.perf_counter()))
+                except TimeoutError:
+                    if future.cancel():
+                        with self._lock:
+                            work.rejected += 1
+                        raise Overloaded(work.name, self.retry_after) from None
+            return future.result()
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory): start a fresh pool next time
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = None
+            raise
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn: forking a threaded server can copy locks held by other threads
+                self._pool = ProcessPoolExecutor(
+                    self.processes, mp_context=multiprocessing.get_context('spawn'))
+                logger.info(f"Started a pool of {self.processes} worker processes")
+            return self._pool
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    def describe(self) -> dict:
+        with self._lock:
+            return {
+                'processes': self.processes,
+                'pool_started': self._pool is not None,
+                'classes': {name: work.describe() for name, work in self._classes.items()},
+            }
@@ -2,8 +2,6 @@ import pandas as pd
 import numpy as np
 import warnings
 from typing import Dict, Any
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import PolynomialFeatures
 
 warnings.filterwarnings('ignore')
 
@@ -0,0 +1,390 @@
+import threading
+
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+from sketches import GroupSketches
+from skills import SKILLS_COLUMN, SkillIndex
+from similarity import ProfileIndex
+from caching import ResultCache
+
+# Lower/upper salary bound columns, in order of preference
+SALARY_RANGE_COLUMNS = [
+    ('Salary_Range_Min_EUR', 'Salary_Range_Max_EUR'),
+    ('Salary_Min_USD', 'Salary_Max_USD'),
+]
+
+# Categorical columns that can be filtered and grouped on via integer codes
+GROUP_DIMENSIONS = ['Country', 'Role_Name', 'Experience_Level', 'Team_Setup', 'Location']
+
+# Peer groups for salary rank lookups: name -> dimensions
+RANK_GROUPINGS = {
+    'role': ['Country', 'Role_Name'],
+    'experience': ['Country', 'Role_Name', 'Experience_Level'],
+}
+
+# API sort/range key -> candidate columns, first present wins
+SORTED_COLUMNS = {
+    'salary': ['Salary_EUR', 'Salary_Avg_USD'],
+    'experience': ['Years_of_Experience'],
+}
+
+
+def _merge_slots(existing: np.ndarray, added: np.ndarray) -> np.ndarray:
+    """Mask over the merged length marking where sorted `added` items land among sorted
+    `existing` ones; ties go after existing items, as in a stable sort of the longer table."""
+    slots = np.searchsorted(existing, added, side='right') + np.arange(len(added))
+    mask = np.zeros(len(existing) + len(added), dtype=bool)
+    mask[slots] = True
+    return mask
+
+
+def _interleave(mask: np.ndarray, existing: np.ndarray, added: np.ndarray) -> np.ndarray:
+    merged = np.empty(len(mask), dtype=np.result_type(existing, added))
+    merged[mask] = added
+    merged[~mask] = existing
+    return merged
+
+
+def hash_rows(data: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    """64-bit signature of each row's values in `columns` (numbers compare as floats)."""
+    normalized = {}
+    for column in columns:
+        values = data[column]
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            normalized[column] = values.astype(float)
+        else:
+            normalized[column] = values.astype(str).where(values.notna(), '\0')
+    return pd.util.hash_pandas_object(pd.DataFrame(normalized), index=False).to_numpy()
+
+
+class RowSignatures:
+    """Sorted row signatures (see hash_rows) of a table, for dropping duplicate appends."""
+
+    def __init__(self, columns: List[str], hashes: np.ndarray):
+        self.columns = list(columns)
+        self.hashes = np.unique(hashes)
+
+    def contains(self, hashes: np.ndarray) -> np.ndarray:
+        if not len(self.hashes):
+            return np.zeros(len(hashes), dtype=bool)
+        slots = np.minimum(np.searchsorted(self.hashes, hashes), len(self.hashes) - 1)
+        return self.hashes[slots] == hashes
+
+    def extended(self, hashes: np.ndarray) -> 'RowSignatures':
+        added = np.unique(hashes)
+        added = added[~self.contains(added)]
+        signatures = RowSignatures.__new__(RowSignatures)
+        signatures.columns = self.columns
+        signatures.hashes = _interleave(_merge_slots(self.hashes, added), self.hashes, added)
+        return signatures
+
+
+class SalaryRangeIndex:
+    """Salary ranges sorted by lower bound, answering overlap queries by binary search."""
+
+    def __init__(self, lower: np.ndarray, upper: np.ndarray):
+        lower = np.asarray(lower, dtype=float)
+        upper = np.asarray(upper, dtype=float)
+        valid = np.flatnonzero(~(np.isnan(lower) | np.isnan(upper)))
+        order = np.argsort(lower[valid], kind='stable')
+
+        self.positions = valid[order]
+        self.lower = lower[self.positions]
+        self.upper = upper[self.positions]
+        # No range is wider than this, so nothing starting before `low - max_width` can reach `low`
+        self.max_width = float((self.upper - self.lower).max()) if len(self.positions) else 0.0
+
+    @staticmethod
+    def _bounds(data: pd.DataFrame):
+        for lower_col, upper_col in SALARY_RANGE_COLUMNS:
+            if lower_col in data.columns and upper_col in data.columns:
+                return (pd.to_numeric(data[lower_col], errors='coerce').to_numpy(dtype=float),
+                        pd.to_numeric(data[upper_col], errors='coerce').to_numpy(dtype=float))
+        return None
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame) -> Optional['SalaryRangeIndex']:
+        """Build the index from the first available pair of salary bound columns."""
+        bounds = cls._bounds(data)
+        return cls(*bounds) if bounds is not None else None
+
+    def extended(self, rows: pd.DataFrame, start: int) -> 'SalaryRangeIndex':
+        """This index plus `rows`, appended at row position `start`, merged in sorted order."""
+        added = SalaryRangeIndex(*self._bounds(rows))
+        mask = _merge_slots(self.lower, added.lower)
+        index = SalaryRangeIndex.__new__(SalaryRangeIndex)
+        index.positions = _interleave(mask, self.positions, added.positions + start)
+        index.lower = _interleave(mask, self.lower, added.lower)
+        index.upper = _interleave(mask, self.upper, added.upper)
+        index.max_width = max(self.max_width, added.max_width)
+        return index
+
+    def overlapping(self, low: float = -np.inf, high: float = np.inf) -> np.ndarray:
+        """Return row positions (in load order) whose range overlaps [low, high]."""
+        if low > high:
+            raise ValueError('salary_min must not be greater than salary_max')
+
+        # Ranges starting inside [low, high] overlap by construction
+        inside_start = np.searchsorted(self.lower, low, side='left')
+        inside_end = np.searchsorted(self.lower, high, side='right')
+        # Ranges starting before `low` overlap only if they reach it
+        reach_start = np.searchsorted(self.lower, low - self.max_width, side='left')
+        straddling = slice(reach_start, inside_start)
+        reaching = self.positions[straddling][self.upper[straddling] >= low]
+
+        return np.sort(np.concatenate([reaching, self.positions[inside_start:inside_end]]))
+
+
+class SortedColumnIndex:
+    """Argsort permutation of one numeric column, for range lookups and ordered paging."""
+
+    def __init__(self, column: str, values: np.ndarray):
+        values = np.asarray(values, dtype=float)
+        self.column = column
+        # argsort puts NaNs last; only the leading `valid_count` values are searchable
+        self.order = np.argsort(values, kind='stable')
+        self.sorted_values = values[self.order]
+        self.valid_count = int(np.count_nonzero(~np.isnan(values)))
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame, candidates: list) -> Optional['SortedColumnIndex']:
+        for column in candidates:
+            if column in data.columns:
+                return cls(column, pd.to_numeric(data[column], errors='coerce').to_numpy())
+        return None
+
+    def extended(self, values: np.ndarray, start: int) -> 'SortedColumnIndex':
+        """This index plus `values`, appended at row position `start`, merged in sorted order."""
+        added = SortedColumnIndex(self.column, values)
+        valid, added_valid = self.valid_count, added.valid_count
+        mask = _merge_slots(self.sorted_values[:valid], added.sorted_values[:added_valid])
+        index = SortedColumnIndex.__new__(SortedColumnIndex)
+        index.column = self.column
+        # Missing values stay last, in load order
+        index.order = np.concatenate([
+            _interleave(mask, self.order[:valid], added.order[:added_valid] + start),
+            self.order[valid:], added.order[added_valid:] + start])
+        index.sorted_values = np.concatenate([
+            _interleave(mask, self.sorted_values[:valid], added.sorted_values[:added_valid]),
+            self.sorted_values[valid:], added.sorted_values[added_valid:]])
+        index.valid_count = valid + added_valid
+        return index
+
+    def between(self, low: float = -np.inf, high: float = np.inf) -> np.ndarray:
+        """Return row positions (in load order) with low <= value <= high."""
+        searchable = self.sorted_values[:self.valid_count]
+        start = np.searchsorted(searchable, low, side='left')
+        end = np.searchsorted(searchable, high, side='right')
+        return np.sort(self.order[start:end])
+
+    def ordered(self, positions: np.ndarray, descending: bool = False) -> np.ndarray:
+        """Reorder a subset of row positions by this column; NaNs always come last."""
+        if len(positions) == len(self.order):
+            selected = self.order
+            valid = self.valid_count
+        else:
+            keep = np.zeros(len(self.order), dtype=bool)
+            keep[positions] = True
+            selected = self.order[keep[self.order]]
+            valid = int(np.count_nonzero(keep[self.order[:self.valid_count]]))
+
+        if descending:
+            return np.concatenate([selected[:valid][::-1], selected[valid:]])
+        return selected
+
+
+class DimensionCodes:
+    """Integer codes for one categorical column; `uniques` is sorted so codes follow value order."""
+
+    def __init__(self, column: str, values):
+        codes, uniques = pd.factorize(pd.Series(values).astype(str), sort=True)
+        self.column = column
+        self.codes = codes.astype(np.int32)
+        self.uniques = np.asarray(uniques, dtype=object)
+        self._index = pd.Index(self.uniques)
+
+    def extended(self, values) -> 'DimensionCodes':
+        """Codes with `values` appended; existing codes are only remapped when new values appear."""
+        values = pd.Series(values).astype(str)
+        added = pd.Index(values.unique()).difference(self._index)
+        codes = DimensionCodes.__new__(DimensionCodes)
+        codes.column = self.column
+        codes.uniques = self.uniques
+        existing = self.codes
+        if len(added):
+            uniques = self._index.append(added).sort_values()
+            codes.uniques = np.asarray(uniques, dtype=object)
+            existing = uniques.get_indexer(self._index)[self.codes].astype(np.int32)
+        codes._index = pd.Index(codes.uniques)
+        codes.codes = np.concatenate([existing, codes._index.get_indexer(values).astype(np.int32)])
+        return codes
+
+    def code_of(self, value: str) -> int:
+        """Code for `value`, or -1 when it never occurs (matches no rows)."""
+        return int(self.codes_of([value])[0])
+
+    def codes_of(self, values) -> np.ndarray:
+        """Vectorized code_of()."""
+        return self._index.get_indexer(pd.Index(values, dtype=object).astype(str))
+
+
+class SalaryRankIndex:
+    """Salaries sorted within each peer group, answering "what percentile is this offer?".
+
+    All groups live in one array ordered by (group, salary). Each salary is also
+    encoded as `group_slot * span + (salary - offset)`, which keeps that array
+    sorted, so a whole batch of offers resolves with a single np.searchsorted.
+    """
+
+    def __init__(self, dimensions: List[DimensionCodes], values: np.ndarray):
+        values = np.asarray(values, dtype=float)
+        valid = np.flatnonzero(~np.isnan(values))
+        self.dimensions = dimensions
+        self.sizes = [len(d.uniques) for d in dimensions]
+        keys = np.ravel_multi_index([d.codes[valid] for d in dimensions], self.sizes)
+        values = values[valid]
+        order = np.lexsort((values, keys))
+        keys, self.values = keys[order], values[order]
+
+        self.group_keys, self.starts, self.counts = np.unique(
+            keys, return_index=True, return_counts=True)
+        slots = np.repeat(np.arange(len(self.group_keys)), self.counts)
+        self.offset = float(self.values.min()) if len(self.values) else 0.0
+        self.span = (float(self.values.max()) - self.offset + 1.0) if len(self.values) else 1.0
+        self.encoded = slots * self.span + (self.values - self.offset)
+
+    def lookup(self, group_values: List[list], salaries) -> Dict[str, np.ndarray]:
+        """Rank many offers at once.
+
+        `group_values[i]` holds the offers' values for the i-th dimension. Returns
+        per-offer `group_size`, `below` (peers paid strictly less), `equal` and
+        `percentile` (mid-rank, 0-100; NaN when the peer group is empty).
+        """
+        salaries = np.asarray(salaries, dtype=float)
+        if not len(self.group_keys):
+            nothing = np.zeros(len(salaries), dtype=np.int64)
+            return {'group_size': nothing, 'below': nothing, 'equal': nothing,
+                    'percentile': np.full(len(salaries), np.nan)}
+
+        codes = [d.codes_of(v) for d, v in zip(self.dimensions, group_values)]
+        known = np.all([c >= 0 for c in codes], axis=0) & ~np.isnan(salaries)
+        keys = np.ravel_multi_index([np.where(known, c, 0) for c in codes], self.sizes)
+        slots = np.minimum(np.searchsorted(self.group_keys, keys), len(self.group_keys) - 1)
+        found = known & (self.group_keys[slots] == keys)
+
+        # Clamping keeps every query inside its own group's slice of `encoded`
+        position = np.clip(np.nan_to_num(salaries - self.offset), -0.5, self.span - 0.5)
+        encoded = slots * self.span + position
+        below = np.searchsorted(self.encoded, encoded, side='left') - self.starts[slots]
+        equal = np.searchsorted(self.encoded, encoded, side='right') - self.starts[slots] - below
+        group_size = np.where(found, self.counts[slots], 0)
+        below = np.where(found, below, 0)
+        equal = np.where(found, equal, 0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            percentile = np.where(found, 100.0 * (below + 0.5 * equal) / group_size, np.nan)
+
+        return {'group_size': group_size, 'below': below, 'equal': equal,
+                'percentile': percentile}
+
+
+class DatasetIndexes:
+    """Lookup structures derived from one salary table; rebuilt whenever the table changes.
+
+    extended() derives the indexes of the table with rows appended from these ones
+    and the new rows alone. The similarity and rank indexes depend on every row
+    (IDF weights, per-group layouts), so they are built on first use instead,
+    once per version even when concurrent requests ask for them (the warm-up
+    builds the default dataset's).
+    """
+
+    def __init__(self, salary_data: pd.DataFrame):
+        self._salary_data = salary_data
+        self.row_count = len(salary_data)
+        # Results computed from this dataset version; discarded with it
+        self.cache = ResultCache()
+        self.salary_range = SalaryRangeIndex.from_frame(salary_data)
+        self.dimensions = {
+            column: DimensionCodes(column, salary_data[column])
+            for column in GROUP_DIMENSIONS if column in salary_data.columns
+        }
+        self.sketches = GroupSketches.from_frame(salary_data, list(self.dimensions))
+        self.sorted_columns = {}
+        for key, candidates in SORTED_COLUMNS.items():
+            index = SortedColumnIndex.from_frame(salary_data, candidates)
+            if index is not None:
+                self.sorted_columns[key] = index
+        self.skills = SkillIndex.from_frame(salary_data)
+        # Row signatures per dedup key, built on the first append that asks for them
+        self.signatures: Dict[tuple, RowSignatures] = {}
+        # Guards the structures built on first use: snapshots are shared by requests
+        self._lock = threading.Lock()
+        self._derived: Dict[str, object] = {}
+
+    def extended(self, salary_data: pd.DataFrame, start: int) -> 'DatasetIndexes':
+        """Indexes of `salary_data`, whose rows from `start` on were appended to this table.
+
+        Work is proportional to the appended rows, apart from copying arrays.
+        """
+        rows = salary_data.iloc[start:]
+        indexes = DatasetIndexes.__new__(DatasetIndexes)
+        indexes._salary_data = salary_data
+        indexes.row_count = len(salary_data)
+        indexes.cache = ResultCache()
+        indexes.salary_range = (self.salary_range.extended(rows, start)
+                                if self.salary_range is not None else None)
+        indexes.dimensions = {column: codes.extended(rows[column])
+                              for column, codes in self.dimensions.items()}
+        indexes.sketches = None
+        if self.sketches is not None:
+            indexes.sketches = self.sketches.copy()
+            indexes.sketches.update(rows)
+        indexes.sorted_columns = {
+            key: index.extended(pd.to_numeric(rows[index.column], errors='coerce').to_numpy(), start)
+            for key, index in self.sorted_columns.items()}
+        indexes.skills = (self.skills.extended(rows[SKILLS_COLUMN])
+                          if self.skills is not None else None)
+        with self._lock:
+            signatures = list(self.signatures.items())
+        indexes.signatures = {key: value.extended(hash_rows(rows, value.columns))
+                              for key, value in signatures}
+        indexes._lock = threading.Lock()
+        indexes._derived = {}
+        return indexes
+
+    def row_signatures(self, columns: List[str]) -> RowSignatures:
+        key = tuple(columns)
+        with self._lock:
+            if key not in self.signatures:
+                self.signatures[key] = RowSignatures(columns,
+                                                     hash_rows(self._salary_data, columns))
+            return self.signatures[key]
+
+    def _built(self, name: str, build):
+        """The structure `name`, built by the first caller while concurrent ones wait."""
+        if name not in self._derived:
+            with self._lock:
+                if name not in self._derived:
+                    self._derived[name] = build()
+        return self._derived[name]
+
+    @property
+    def profiles(self) -> Optional[ProfileIndex]:
+        return self._built('profiles', lambda: ProfileIndex.from_indexes(
+            self._salary_data, self.skills, self.dimensions))
+
+    @property
+    def salary_ranks(self) -> Dict[str, SalaryRankIndex]:
+        return self._built('salary_ranks', self._salary_ranks)
+
+    def _salary_ranks(self) -> Dict[str, SalaryRankIndex]:
+        ranks = {}
+        if 'salary' in self.sorted_columns:
+            salaries = self.sorted_columns['salary']
+            for name, dimensions in RANK_GROUPINGS.items():
+                if all(d in self.dimensions for d in dimensions):
+                    ranks[name] = SalaryRankIndex(
+                        [self.dimensions[d] for d in dimensions],
+                        self._salary_data[salaries.column].to_numpy(dtype=float))
+        return ranks
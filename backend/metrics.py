@@ -0,0 +1,355 @@
+"""Prometheus metrics in the text exposition format, summed across worker processes.
+
+Counters, gauges and histograms live in process memory. Recording one is a
+lock, a dictionary update and, for histograms, a bisect over the buckets, so the
+request path stays cheap.
+
+gunicorn runs several workers, and a scrape reaches only one of them. Set
+`directory` (METRICS_DIR in the app) and every process writes its values to
+`<directory>/metrics_<pid>.json`. It writes them every `flush_interval`
+seconds, at exit and when it answers a scrape. The scraped process merges
+all the files, the same approach as prometheus_client's multiprocess mode:
+
+- counters and histograms are summed over every file, including those of
+  workers that have exited, so totals don't drop when a worker is replaced;
+- gauges only count processes that are still running, combined by their
+  `mode`: livesum, livemax or livemin.
+
+Values from other workers can be up to `flush_interval` seconds old. Values
+kept elsewhere (cache and executor stats, dataset sizes) are copied in by
+collectors, which run before every flush and scrape.
+"""
+import atexit
+import bisect
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+FLUSH_INTERVAL = 5.0  # seconds
+GAUGE_MODES = ('livesum', 'livemax', 'livemin')
+
+Labels = Tuple[str, ...]
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, object] = {}
+        self._lock = threading.Lock()
+
+    def state(self) -> list:
+        with self._lock:
+            return [[list(labels), value] for labels, value in self._values.items()]
+
+    def clear(self):
+        """Drop every label set, e.g. before a collector sets the current ones."""
+        with self._lock:
+            self._values.clear()
+
+    def describe(self) -> dict:
+        return {'kind': self.kind, 'help': self.documentation,
+                'labelnames': list(self.labelnames)}
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, labels: Labels = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def set_total(self, value: float, labels: Labels = ()):
+        """Copy in a count kept elsewhere; it must never decrease."""
+        with self._lock:
+            self._values[labels] = value
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 mode: str = 'livesum'):
+        if mode not in GAUGE_MODES:
+            raise ValueError(f"Unknown gauge mode '{mode}' (expected one of {GAUGE_MODES})")
+        super().__init__(name, documentation, labelnames)
+        self.mode = mode
+
+    def set(self, value: float, labels: Labels = ()):
+        with self._lock:
+            self._values[labels] = value
+
+    def describe(self) -> dict:
+        return dict(super().describe(), mode=self.mode)
+
+
+class Histogram(_Metric):
+    """Per label set: [count per bucket (the last one +Inf), sum]."""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, labels: Labels = ()):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def state(self) -> list:
+        with self._lock:
+            return [[list(labels), [list(counts), total]]
+                    for labels, (counts, total) in self._values.items()]
+
+    @contextmanager
+    def time(self, labels: Labels = ()):
+        """Observe the duration of the block in seconds (also when it raises)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, labels)
+
+    def describe(self) -> dict:
+        return dict(super().describe(), buckets=list(self.buckets))
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # exists, owned by someone else
+        return True
+    return True
+
+
+def _merge(metric: dict, value, other):
+    """Combine two processes' values for one label set of `metric`."""
+    if metric['kind'] == 'histogram':
+        return [[a + b for a, b in zip(value[0], other[0])], value[1] + other[1]]
+    if metric.get('mode') == 'livemax':
+        return max(value, other)
+    if metric.get('mode') == 'livemin':
+        return min(value, other)
+    return value + other
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _number(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+def render(metrics: Dict[str, dict]) -> str:
+    """Text exposition of merged metric states (see MetricsRegistry.merged())."""
+    lines = []
+    for name, metric in metrics.items():
+        lines.append(f'# HELP {name} {metric["help"]}')
+        lines.append(f'# TYPE {name} {metric["kind"]}')
+        names = metric['labelnames']
+        for labels, value in metric['samples']:
+            if metric['kind'] != 'histogram':
+                lines.append(f'{name}{_labels(names, labels)} {_number(value)}')
+                continue
+            counts, total = value
+            cumulative = 0
+            bounds = [_number(float(bound)) for bound in metric['buckets']] + ['+Inf']
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f'{name}_bucket{_labels(names, labels, le)} {cumulative}')
+            lines.append(f'{name}_sum{_labels(names, labels)} {_number(total)}')
+            lines.append(f'{name}_count{_labels(names, labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsRegistry:
+    """The metrics of one process, merged with the other workers' on scrape."""
+
+    def __init__(self, directory: Optional[str] = None, flush_interval: float = FLUSH_INTERVAL):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._collect_lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _add(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              mode: str = 'livesum') -> Gauge:
+        return self._add(Gauge(name, documentation, labelnames, mode))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collect: Callable[[], None]):
+        """Register a function copying current values into metrics before each export."""
+        self._collectors.append(collect)
+
+    def collect(self):
+        with self._collect_lock:
+            for collect in self._collectors:
+                try:
+                    collect()
+                except Exception as e:  # one broken collector must not break the scrape
+                    logger.warning(f"Metrics collector {collect.__name__} failed: {e}")
+
+    def state(self) -> Dict[str, dict]:
+        return {name: dict(metric.describe(), samples=metric.state())
+                for name, metric in self._metrics.items()}
+
+    def _path(self, pid: int) -> str:
+        return os.path.join(self.directory, f'metrics_{pid}.json')
+
+    def flush(self):
+        """Collect and write this process's values to its file in `directory`."""
+        if not self.directory:
+            return
+        self.collect()
+        pid = os.getpid()
+        path = self._path(pid)
+        scratch = f'{path}.{threading.get_ident()}.tmp'
+        with open(scratch, 'w', encoding='utf-8') as handle:
+            json.dump({'pid': pid, 'metrics': self.state()}, handle)
+        os.replace(scratch, path)
+
+    def _process_states(self) -> List[Tuple[int, Dict[str, dict]]]:
+        states = []
+        for filename in sorted(os.listdir(self.directory)):
+            if not (filename.startswith('metrics_') and filename.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename), encoding='utf-8') as handle:
+                    data = json.load(handle)
+            except (OSError, ValueError):
+                continue  # replaced or removed while we read it
+            states.append((data['pid'], data['metrics']))
+        return states
+
+    def merged(self) -> Dict[str, dict]:
+        """Every process's values combined per metric and label set."""
+        if not self.directory:
+            self.collect()
+            return self.state()
+        self.flush()
+        merged: Dict[str, dict] = {}
+        values: Dict[str, Dict[tuple, object]] = {}
+        for pid, state in self._process_states():
+            alive = None
+            for name, metric in state.items():
+                if metric['kind'] == 'gauge':
+                    alive = _alive(pid) if alive is None else alive
+                    if not alive:
+                        continue
+                merged.setdefault(name, {key: item for key, item in metric.items()
+                                         if key != 'samples'})
+                samples = values.setdefault(name, {})
+                for labels, value in metric['samples']:
+                    labels = tuple(labels)
+                    samples[labels] = (value if labels not in samples
+                                       else _merge(metric, samples[labels], value))
+        for name, metric in merged.items():
+            metric['samples'] = [[list(labels), value] for labels, value in values[name].items()]
+        return merged
+
+    def exposition(self) -> str:
+        return render(self.merged())
+
+    def start_flushing(self) -> Optional[threading.Thread]:
+        """Flush every `flush_interval` seconds and at exit (multiprocess mode only)."""
+        if not self.directory or self._flusher is not None:
+            return None
+
+        def loop():
+            while True:
+                time.sleep(self.flush_interval)
+                try:
+                    self.flush()
+                except Exception as e:
+                    logger.warning(f"Writing metrics to {self.directory} failed: {e}")
+
+        self._flusher = threading.Thread(target=loop, name='metrics-flush', daemon=True)
+        self._flusher.start()
+        atexit.register(self.flush)
+        return self._flusher
+
+
+def track_requests(app, registry: MetricsRegistry):
+    """Count requests and record their latency and response size per route.
+
+    Call it right after creating the app, so its before_request hook runs first
+    and its after_request hook runs last (after compression).
+    """
+    requests_total = registry.counter(
+        'http_requests_total', 'HTTP requests by route, method and status',
+        ('route', 'method', 'status'))
+    latency = registry.histogram(
+        'http_request_duration_seconds', 'Time to produce a response, by route',
+        ('route', 'method'))
+    sizes = registry.histogram(
+        'http_response_size_bytes', 'Response body bytes as sent, by route',
+        ('route',), SIZE_BUCKETS)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.get('request_started')
+        if started is None:  # a before_request hook registered earlier answered
+            return response
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        requests_total.inc((route, request.method, str(response.status_code)))
+        latency.observe(time.perf_counter() - started, (route, request.method))
+        size = response.calculate_content_length()
+        if size is not None:  # streamed bodies have no length up front
+            sizes.observe(size, (route,))
+        return response
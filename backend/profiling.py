@@ -0,0 +1,241 @@
+"""Opt-in profiles of single requests, to see where a slow endpoint spends its time.
+
+On demand: with a token configured (PROFILE_TOKEN in the app), a request
+carrying it in X-Profile-Token and asking for a profile, with ?profile=<format>
+or an X-Profile: <format> header, gets the profile instead of its normal
+response:
+
+- `collapsed` (or `1`): stacks sampled every millisecond, one
+  `frame;frame;... count` line per distinct stack. This is the input of
+  flamegraph.pl and speedscope. Pure-Python code holding the GIL is sampled
+  only every switch interval (5 ms).
+- `cprofile`: cProfile's deterministic statistics as text, by cumulative time.
+- `html`: pyinstrument's interactive report, when pyinstrument is installed.
+
+Slow requests: with `slow_ms` set, a `sample_rate` fraction of requests is
+sampled. Those that take at least `slow_ms` milliseconds have their collapsed
+stacks written to `dump_dir`, which keeps the newest `max_dumps` files.
+
+The sampler is one background thread, and it reads the stacks of the sampled
+request threads only while there are any. A request that is not profiled
+only costs a parameter and header lookup and one random() call.
+"""
+import cProfile
+import hmac
+import io
+import itertools
+import logging
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+from flask import g, jsonify, request
+
+try:
+    import pyinstrument
+except ImportError:  # optional; only needed for the html format
+    pyinstrument = None
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_INTERVAL = 0.001  # seconds
+FORMATS = ('collapsed', 'cprofile', 'html')
+TOKEN_HEADER = 'X-Profile-Token'
+PROFILE_HEADER = 'X-Profile'
+
+
+class StackSampler:
+    """Samples the stacks of registered threads every `interval` seconds."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self._active: Dict[int, Counter] = {}
+        self._labels: Dict[object, str] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def begin(self, thread_id: int):
+        with self._lock:
+            self._active[thread_id] = Counter()
+            self._wake.set()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='stack-sampler',
+                                                daemon=True)
+                self._thread.start()
+
+    def end(self, thread_id: int) -> Counter:
+        """Stop sampling the thread; its stacks (root first, ';'-joined) with their counts."""
+        with self._lock:
+            return self._active.pop(thread_id, Counter())
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            # Parent directory too: flask/app.py is not the backend's app.py
+            directory, filename = os.path.split(code.co_filename)
+            where = f'{os.path.basename(directory)}/{filename}:{code.co_firstlineno}'
+            label = self._labels[code] = f'{code.co_name} ({where})'
+        return label
+
+    def _stack(self, frame) -> str:
+        labels = []
+        while frame is not None:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        return ';'.join(reversed(labels))
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                if not self._active:
+                    self._wake.clear()
+                    continue
+                for thread_id, stacks in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[self._stack(frame)] += 1
+
+
+def collapsed(stacks: Counter) -> str:
+    return ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
+
+
+def _cprofile_text(profile: cProfile.Profile) -> str:
+    out = io.StringIO()
+    pstats.Stats(profile, stream=out).sort_stats('cumulative').print_stats(80)
+    return out.getvalue()
+
+
+class RequestProfiler:
+    """Flask hooks serving on-demand profiles and dumping slow requests' stacks."""
+
+    def __init__(self, token: str = '', slow_ms: float = 0, sample_rate: float = 0.0,
+                 dump_dir: str = 'profiles', max_dumps: int = 100,
+                 sampler: Optional[StackSampler] = None):
+        self.token = token
+        self.slow_ms = slow_ms
+        self.sample_rate = sample_rate
+        self.dump_dir = dump_dir
+        self.max_dumps = max_dumps
+        self.sampler = sampler or StackSampler()
+        # Only one deterministic profiler can be active in a process at a time
+        self._cprofile_lock = threading.Lock()
+        self._dump_numbers = itertools.count(1)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token) or (self.slow_ms > 0 and self.sample_rate > 0)
+
+    def install(self, app):
+        """Register the hooks; call it right after the app's metrics (see metrics.py)."""
+        if not self.enabled:
+            return
+        app.before_request(self._before)
+        app.after_request(self._after)
+        app.teardown_request(self._teardown)
+
+    def _requested_format(self) -> Optional[str]:
+        value = request.args.get('profile') or request.headers.get(PROFILE_HEADER)
+        if not value or not self.token:
+            return None
+        return 'collapsed' if value == '1' else value
+
+    def _before(self):
+        fmt = self._requested_format()
+        if fmt is not None:
+            given = request.headers.get(TOKEN_HEADER, '')
+            if not hmac.compare_digest(given.encode(), self.token.encode()):
+                return jsonify({'error': 'Invalid or missing profiling token'}), 403
+            if fmt not in FORMATS:
+                return jsonify({'error': f"Unknown profile format '{fmt}' "
+                                         f"(expected one of {', '.join(FORMATS)})"}), 400
+            if fmt == 'html' and pyinstrument is None:
+                return jsonify({'error': 'The html format needs pyinstrument installed'}), 400
+        elif not (self.slow_ms > 0 and random.random() < self.sample_rate):
+            return None
+
+        profiler = None
+        if fmt == 'cprofile':
+            if not self._cprofile_lock.acquire(blocking=False):
+                return jsonify({'error': 'Another request is being profiled, retry'}), 409
+            profiler = cProfile.Profile()
+            profiler.enable()
+        elif fmt == 'html':
+            profiler = pyinstrument.Profiler(async_mode='disabled')
+            profiler.start()
+        else:
+            self.sampler.begin(threading.get_ident())
+        # (format, None = sampled for the slow-request log; profiler; start time)
+        g.profile = (fmt, profiler, time.perf_counter())
+        return None
+
+    def _stop(self):
+        """Stop this request's profiler: the format, the result and the elapsed ms."""
+        fmt, profiler, started = g.pop('profile')
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if fmt == 'cprofile':
+            profiler.disable()
+            self._cprofile_lock.release()
+            return fmt, profiler, elapsed_ms
+        if fmt == 'html':
+            profiler.stop()
+            return fmt, profiler, elapsed_ms
+        return fmt, self.sampler.end(threading.get_ident()), elapsed_ms
+
+    def _after(self, response):
+        if 'profile' not in g:
+            return response
+        fmt, result, elapsed_ms = self._stop()
+        if fmt is None:
+            if elapsed_ms >= self.slow_ms:
+                self._dump(result, elapsed_ms)
+            return response
+
+        if fmt == 'collapsed':
+            body, mimetype = collapsed(result), 'text/plain'
+        elif fmt == 'cprofile':
+            body, mimetype = _cprofile_text(result), 'text/plain'
+        else:
+            body, mimetype = result.output_html(), 'text/html'
+        profiled = type(response)(body, mimetype=mimetype)
+        profiled.headers['X-Profiled-Status'] = str(response.status_code)
+        profiled.headers['X-Profiled-Ms'] = f'{elapsed_ms:.1f}'
+        profiled.headers['Cache-Control'] = 'no-store'
+        return profiled
+
+    def _teardown(self, error=None):
+        # after_request is skipped when no response could be built: still stop
+        if 'profile' in g:
+            self._stop()
+
+    def _dump(self, stacks: Counter, elapsed_ms: float):
+        os.makedirs(self.dump_dir, exist_ok=True)
+        endpoint = re.sub(r'[^A-Za-z0-9_.-]', '_', request.endpoint or 'unmatched')
+        name = (f'{time.strftime("%Y%m%dT%H%M%S")}-{os.getpid()}-{next(self._dump_numbers)}'
+                f'-{endpoint}-{elapsed_ms:.0f}ms')
+        path = os.path.join(self.dump_dir, f'{name}.collapsed')
+        with open(path, 'w', encoding='utf-8') as handle:
+            handle.write(collapsed(stacks))
+        logger.warning(f"Slow request {request.method} {request.path} took {elapsed_ms:.0f} ms, "
+                       f"stacks written to {path}")
+        self._prune()
+
+    def _prune(self):
+        files = sorted((entry for entry in os.scandir(self.dump_dir)
+                        if entry.name.endswith('.collapsed')),
+                       key=lambda entry: entry.stat().st_mtime)
+        for entry in files[:max(0, len(files) - self.max_dumps)]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
@@ -0,0 +1,185 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Mapping, Optional
+
+from indexes import DatasetIndexes
+
+# Query parameter -> column for the exact-match filters
+EQUALITY_FILTERS = {
+    'country': 'Country',
+    'role': 'Role_Name',
+    'team_setup': 'Team_Setup',
+    'experience_level': 'Experience_Level',
+    'location': 'Location',
+}
+
+
+def parse_float_arg(args: Mapping[str, str], name: str) -> Optional[float]:
+    """Read an optional numeric query parameter, rejecting anything non-numeric."""
+    raw = args.get(name)
+    if raw is None or raw == '':
+        return None
+    try:
+        return float(raw)
+    except ValueError:
+        raise ValueError(f"Invalid value for '{name}': expected a number") from None
+
+
+def parse_int_arg(args: Mapping[str, str], name: str, minimum: int = 0) -> Optional[int]:
+    """Read an optional integer query parameter no smaller than `minimum`."""
+    raw = args.get(name)
+    if raw is None or raw == '':
+        return None
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ValueError(f"Invalid value for '{name}': expected an integer") from None
+    if value < minimum:
+        raise ValueError(f"Invalid value for '{name}': must be at least {minimum}")
+    return value
+
+
+def range_filter_params(indexes: DatasetIndexes) -> list:
+    """Names of the numeric range filters understood by resolve_filters()."""
+    params = ['salary_min', 'salary_max']
+    for key in indexes.sorted_columns:
+        params += [f'{key}_from', f'{key}_to']
+    return params
+
+
+def dimension_filters(args: Mapping[str, str], indexes: DatasetIndexes) -> Dict[str, str]:
+    """Collect the exact-match filters as {column: value}, rejecting range filters.
+
+    Used by endpoints answered from per-group summaries, which can only slice
+    along dimension columns.
+    """
+    unsupported = [param for param in range_filter_params(indexes) if args.get(param)]
+    if unsupported:
+        raise ValueError(f"Filters not supported here: {', '.join(unsupported)}")
+    return {
+        column: args.get(param)
+        for param, column in EQUALITY_FILTERS.items()
+        if args.get(param) and column in indexes.dimensions
+    }
+
+
+def parse_offers(offers: List[dict]):
+    """Validate salary offers into (frame, salaries, experience levels, has-level mask)."""
+    if not offers:
+        raise ValueError('No offers given')
+    frame = pd.DataFrame(offers)
+    for field in ('salary', 'country', 'role'):
+        if field not in frame.columns or frame[field].isna().any():
+            raise ValueError(f"Every offer needs a '{field}'")
+    salaries = pd.to_numeric(frame['salary'], errors='coerce').to_numpy(dtype=float)
+    if np.isnan(salaries).any():
+        raise ValueError("Invalid value for 'salary': expected a number")
+    levels = frame['experience_level'] if 'experience_level' in frame.columns else \
+        pd.Series([None] * len(frame))
+    return frame, salaries, levels, levels.notna().to_numpy()
+
+
+def rank_offers(indexes: DatasetIndexes, offers: List[dict]) -> Dict[str, np.ndarray]:
+    """Percentile of each offer's salary among its peers.
+
+    Offers carry salary, country and role; those that also give experience_level
+    are ranked within that level. Each peer grouping is resolved with one
+    vectorized lookup over all of its offers.
+    """
+    if not indexes.salary_ranks:
+        raise ValueError('Salary ranks are not available for this dataset')
+    frame, salaries, levels, by_level = parse_offers(offers)
+    if by_level.any() and 'experience' not in indexes.salary_ranks:
+        raise ValueError('Experience levels are not available for this dataset')
+
+    result = {
+        'group_size': np.zeros(len(frame), dtype=np.int64),
+        'below': np.zeros(len(frame), dtype=np.int64),
+        'equal': np.zeros(len(frame), dtype=np.int64),
+        'percentile': np.full(len(frame), np.nan),
+    }
+    for grouping, selected in (('role', ~by_level), ('experience', by_level)):
+        if not selected.any():
+            continue
+        group_values = [frame['country'][selected], frame['role'][selected]]
+        if grouping == 'experience':
+            group_values.append(levels[selected])
+        ranks = indexes.salary_ranks[grouping].lookup(group_values, salaries[selected])
+        for name, values in ranks.items():
+            result[name][selected] = values
+    return result
+
+
+def resolve_filters(salary_data: pd.DataFrame, indexes: DatasetIndexes,
+                    args: Mapping[str, str]) -> np.ndarray:
+    """Turn request filters into sorted row positions of `salary_data`."""
+    positions = np.arange(len(salary_data))
+
+    mask = None
+    for param, column in EQUALITY_FILTERS.items():
+        value = args.get(param)
+        if not value:
+            continue
+        if column not in indexes.dimensions:
+            continue
+        dimension = indexes.dimensions[column]
+        matches = dimension.codes == dimension.code_of(value)
+        mask = matches if mask is None else mask & matches
+    if mask is not None:
+        positions = np.flatnonzero(mask)
+
+    salary_min = parse_float_arg(args, 'salary_min')
+    salary_max = parse_float_arg(args, 'salary_max')
+    if salary_min is not None or salary_max is not None:
+        if indexes.salary_range is None:
+            raise ValueError('Salary range filters are not available for this dataset')
+        overlapping = indexes.salary_range.overlapping(
+            -np.inf if salary_min is None else salary_min,
+            np.inf if salary_max is None else salary_max,
+        )
+        positions = np.intersect1d(positions, overlapping, assume_unique=True)
+
+    # skills=Docker,Kubernetes keeps records listing all of them (posting list intersection)
+    skills = [name for name in (args.get('skills') or '').split(',') if name.strip()]
+    if skills:
+        if indexes.skills is None:
+            raise ValueError('Skill filters are not available for this dataset')
+        positions = np.intersect1d(positions, indexes.skills.rows_with_all(skills),
+                                   assume_unique=True)
+
+    # <key>_from / <key>_to range filters over the sorted columns (salary, experience)
+    for key, index in indexes.sorted_columns.items():
+        low = parse_float_arg(args, f'{key}_from')
+        high = parse_float_arg(args, f'{key}_to')
+        if low is None and high is None:
+            continue
+        low = -np.inf if low is None else low
+        high = np.inf if high is None else high
+        if low > high:
+            raise ValueError(f"'{key}_from' must not be greater than '{key}_to'")
+        positions = np.intersect1d(positions, index.between(low, high), assume_unique=True)
+
+    return positions
+
+
+def order_positions(indexes: DatasetIndexes, positions: np.ndarray,
+                    args: Mapping[str, str]) -> np.ndarray:
+    """Apply `sort=` / `order=` using the precomputed permutations (no re-sorting)."""
+    sort_key = args.get('sort')
+    order = (args.get('order') or 'asc').lower()
+    if order not in ('asc', 'desc'):
+        raise ValueError("Invalid value for 'order': expected 'asc' or 'desc'")
+    if not sort_key:
+        return positions
+    if sort_key not in indexes.sorted_columns:
+        available = ', '.join(sorted(indexes.sorted_columns)) or 'none'
+        raise ValueError(f"Cannot sort by '{sort_key}' (available: {available})")
+    return indexes.sorted_columns[sort_key].ordered(positions, descending=order == 'desc')
+
+
+def paginate(positions: np.ndarray, args: Mapping[str, str]) -> np.ndarray:
+    """Slice positions by `offset=` / `limit=`; no limit returns everything after offset."""
+    offset = parse_int_arg(args, 'offset') or 0
+    limit = parse_int_arg(args, 'limit')
+    end = None if limit is None else offset + limit
+    return positions[offset:end]
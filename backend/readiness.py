@@ -0,0 +1,74 @@
+"""Startup progress, so a worker can be alive before it is ready.
+
+The app registers its startup steps (load the dataset, warm the caches) and
+runs them on a background thread. Liveness checks pass as soon as the worker
+serves requests; readiness waits until every step has finished.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    """Named startup steps, each pending, running, done or failed."""
+
+    def __init__(self):
+        self._steps: 'OrderedDict[str, Callable[[], object]]' = OrderedDict()
+        self._state: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        self.started_at = None
+
+    def add_step(self, name: str, run: Callable[[], object]):
+        self._steps[name] = run
+        self._state[name] = {'name': name, 'state': 'pending', 'seconds': None, 'error': None}
+
+    def run(self):
+        """Run every step in order; a failed step is logged and the rest still run."""
+        self.started_at = time.time()
+        for name, step in self._steps.items():
+            self._set(name, state='running')
+            started = time.perf_counter()
+            try:
+                step()
+                self._set(name, state='done', seconds=round(time.perf_counter() - started, 3))
+            except Exception as e:
+                logger.error(f"Startup step '{name}' failed: {e}", exc_info=True)
+                self._set(name, state='failed', error=str(e),
+                          seconds=round(time.perf_counter() - started, 3))
+        self._finished.set()
+        logger.info(f"Ready after {time.time() - self.started_at:.1f}s")
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.run, name='startup', daemon=True)
+        thread.start()
+        return thread
+
+    def _set(self, name: str, **changes):
+        with self._lock:
+            self._state[name].update(changes)
+
+    def is_done(self, name: str) -> bool:
+        """Whether step `name` has finished (successfully or not)."""
+        return self._state[name]['state'] in ('done', 'failed')
+
+    @property
+    def ready(self) -> bool:
+        return self._finished.is_set()
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._finished.wait(timeout)
+
+    def describe(self) -> dict:
+        with self._lock:
+            steps: List[dict] = [dict(state) for state in self._state.values()]
+        finished = sum(step['state'] in ('done', 'failed') for step in steps)
+        return {
+            'ready': self.ready,
+            'progress': round(finished / len(steps), 3) if steps else 1.0,
+            'steps': steps,
+        }
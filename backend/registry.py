@@ -0,0 +1,403 @@
+"""Registry of independent datasets sharing one memory budget.
+
+Each dataset id owns a SnapshotStore. When the resident datasets outgrow the
+budget, the least recently used ones are written to the columnar store and
+dropped from memory; the next request for them reloads the tables from disk
+and rebuilds the indexes. Uploaded datasets are written through to the store
+when they are created, so every worker process can serve them by id.
+
+Datasets of at least `sql_threshold` bytes are not kept in memory at all: their
+salary table goes to an embedded SQL database inside the store (see sql_backend).
+
+append() adds rows to a dataset without rebuilding it: in-memory indexes are
+extended from the new rows (DatasetIndexes.extended) and SQL tables are appended
+in place (SQLDataset.append).
+
+Uploaded datasets are shared by every worker through the store, so each one
+checks the stored version before serving or appending to its own copy and
+reloads it when another worker has stored a newer one. Writes to the store hold
+its cross-process lock for the dataset (ColumnarStore.lock()).
+
+When a version is replaced, `summarize(snapshot)` (if given) is kept for the
+last RETIRED_VERSIONS replaced versions, so later versions can be compared with
+it (see retired()).
+"""
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import nullcontext
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from caching import ResultCache
+from columnar_store import ColumnarStore
+from dataset import DEFAULT_DATASET, DatasetSnapshot, SnapshotStore, estimate_nbytes
+from indexes import hash_rows
+from sql_backend import SQL_ENGINE, SQLDataset, choose_backend, sql_filename
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MEMORY_BUDGET_MB = 1024
+# Summaries of replaced dataset versions kept for comparisons
+RETIRED_VERSIONS = 64
+
+
+class _Entry:
+    def __init__(self, dataset_id: str):
+        self.store = SnapshotStore(dataset_id)
+        # Estimated footprint of the current snapshot without its result cache
+        # (see _measure()), and the part of it derived per salary row
+        self.nbytes = 0
+        self.derived_per_row = 0.0
+        self.records = 0
+        self.source = ''
+        self.last_used = time.time()
+        # Version currently saved in the columnar store (None = not on disk)
+        self.stored_version: Optional[int] = None
+        # Serializes publish, reload and eviction of this one dataset
+        self.lock = threading.Lock()
+
+
+class DatasetRegistry:
+    """Datasets keyed by id, kept resident within `memory_budget` bytes (LRU eviction)."""
+
+    def __init__(self, store: ColumnarStore, memory_budget: int,
+                 sql_threshold: Optional[int] = None,
+                 summarize: Optional[Callable[[DatasetSnapshot], object]] = None):
+        self.store = store
+        self.memory_budget = memory_budget
+        self.sql_threshold = sql_threshold
+        self.summarize = summarize
+        self._retired = ResultCache(max_entries=RETIRED_VERSIONS)
+        self._entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.reloads = 0
+
+    def _entry(self, dataset_id: str, create: bool = False) -> _Entry:
+        with self._lock:
+            entry = self._entries.get(dataset_id)
+            if entry is None:
+                if not create and not self.store.exists(dataset_id):
+                    raise KeyError(dataset_id)
+                # Unknown here but stored on disk (e.g. uploaded through another worker)
+                entry = self._entries[dataset_id] = _Entry(dataset_id)
+                if not create:
+                    entry.stored_version = 0
+            self._entries.move_to_end(dataset_id)
+            entry.last_used = time.time()
+            return entry
+
+    def publish(self, dataset_id: str, salary_data: pd.DataFrame, economic_data: pd.DataFrame,
+                legal_data: pd.DataFrame, source: str, persist: bool = False,
+                backend: Optional[str] = None) -> DatasetSnapshot:
+        """Replace the tables of `dataset_id` (creating it if needed).
+
+        `backend` is 'memory' or 'sql'; by default it is chosen from the table's size.
+        """
+        if (backend or choose_backend(salary_data, self.sql_threshold)) == 'sql':
+            scratch = self.store.scratch_dir()
+            try:
+                path = os.path.join(scratch, sql_filename())
+                SQLDataset.from_frame(path, salary_data)
+                return self.publish_sql(dataset_id, path, economic_data, legal_data, source)
+            finally:
+                shutil.rmtree(scratch, ignore_errors=True)
+
+        entry = self._entry(dataset_id, create=True)
+        with entry.lock, (self.store.lock(dataset_id) if persist else nullcontext()):
+            self._retire(entry.store.current())
+            snapshot = entry.store.publish(salary_data, economic_data, legal_data, source,
+                                           version=self._next_version(dataset_id, entry)
+                                           if persist else None)
+            entry.source, entry.records = source, snapshot.records
+            self._measure(entry, snapshot)
+            if persist:
+                self._save(entry, snapshot)
+        self._enforce_budget(keep=dataset_id)
+        return snapshot
+
+    def publish_sql(self, dataset_id: str, sql_path: str, economic_data: pd.DataFrame,
+                    legal_data: pd.DataFrame, source: str) -> DatasetSnapshot:
+        """Adopt a database built by SQLDataset.create() as the salary table of `dataset_id`.
+
+        The file is moved into the store, so it must live on the store's filesystem
+        (see ColumnarStore.scratch_dir()).
+        """
+        entry = self._entry(dataset_id, create=True)
+        with entry.lock, self.store.lock(dataset_id):
+            self._retire(entry.store.current())
+            version = self._next_version(dataset_id, entry)
+            self.store.save(dataset_id, {'economic_data': economic_data, 'legal_data': legal_data},
+                            {'version': version, 'source': source, 'backend': 'sql',
+                             'engine': SQL_ENGINE},
+                            files={sql_filename(): sql_path})
+            sql = SQLDataset(self.store.file_path(dataset_id, sql_filename()))
+            snapshot = entry.store.publish(None, economic_data, legal_data, source,
+                                           version=version, sql=sql)
+            entry.stored_version = version
+            entry.source, entry.records = source, snapshot.records
+            self._measure(entry, snapshot)
+        self._enforce_budget(keep=dataset_id)
+        return snapshot
+
+    def create(self, salary_data: pd.DataFrame, economic_data: pd.DataFrame,
+               legal_data: pd.DataFrame, source: str,
+               backend: Optional[str] = None) -> DatasetSnapshot:
+        """Register tables under a fresh dataset id."""
+        return self.publish(self.new_id(), salary_data, economic_data, legal_data,
+                            source, persist=True, backend=backend)
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex[:12]
+
+    def get(self, dataset_id: str) -> Optional[DatasetSnapshot]:
+        """Current snapshot of a dataset, reloading it from disk if it was evicted.
+
+        Raises KeyError for ids that are neither resident nor stored.
+        """
+        entry = self._entry(dataset_id)
+        snapshot = entry.store.current()
+        if entry.stored_version is None or (snapshot is not None
+                                            and not self._stale(dataset_id, entry)):
+            return snapshot
+
+        with entry.lock:
+            snapshot = entry.store.current()
+            if snapshot is None or self._stale(dataset_id, entry):
+                with self.store.lock(dataset_id, shared=True):
+                    snapshot = self._reload(dataset_id, entry)
+        self._enforce_budget(keep=dataset_id)
+        return snapshot
+
+    def peek(self, dataset_id: str) -> Optional[DatasetSnapshot]:
+        """The resident snapshot of a dataset, if any; never reloads nor counts as a use."""
+        with self._lock:
+            entry = self._entries.get(dataset_id)
+        return entry.store.current() if entry is not None else None
+
+    def _stale(self, dataset_id: str, entry: _Entry) -> bool:
+        """Whether another worker stored a newer version of a shared dataset.
+
+        Raises KeyError (and forgets the dataset) once it was deleted from the store.
+        The default dataset is loaded by every worker itself, so it is never stale.
+        """
+        if dataset_id == DEFAULT_DATASET or entry.stored_version is None:
+            return False
+        stored = self.store.version(dataset_id)
+        if stored is None:
+            with self._lock:
+                if self._entries.get(dataset_id) is entry:
+                    del self._entries[dataset_id]
+            raise KeyError(dataset_id)
+        return stored != entry.stored_version
+
+    def _next_version(self, dataset_id: str, entry: _Entry) -> int:
+        """Version number for a write; the caller holds the store lock of the dataset."""
+        return max(entry.store.version, self.store.version(dataset_id) or 0) + 1
+
+    def _reload(self, dataset_id: str, entry: _Entry) -> DatasetSnapshot:
+        """Publish the stored copy of a dataset; the caller holds entry.lock and a store lock."""
+        started = time.perf_counter()
+        self._retire(entry.store.current())
+        tables, meta = self.store.load(dataset_id)
+        sql = None
+        if meta.get('backend') == 'sql':
+            engine = meta.get('engine', 'sqlite')
+            filename = meta.get('sql_file', sql_filename(engine))
+            sql = SQLDataset(self.store.file_path(dataset_id, filename), engine)
+        snapshot = entry.store.publish(tables.get('salary_data'), tables['economic_data'],
+                                       tables['legal_data'], meta['source'],
+                                       version=meta['version'], sql=sql)
+        entry.stored_version = meta['version']
+        entry.source, entry.records = meta['source'], snapshot.records
+        self._measure(entry, snapshot)
+        self.reloads += 1
+        logger.info(f"Reloaded dataset {dataset_id} ({snapshot.records} records) "
+                    f"in {time.perf_counter() - started:.2f}s")
+        return snapshot
+
+    def append(self, dataset_id: str, chunks: Iterable[pd.DataFrame],
+               dedup: Optional[List[str]] = None,
+               country_tables: Optional[Callable] = None) -> Tuple[DatasetSnapshot, int]:
+        """Add salary rows to a dataset; returns its new snapshot and the rows added.
+
+        Rows are aligned to the dataset's columns. With `dedup`, rows matching an
+        existing row on those columns are dropped (hashed row signatures).
+        `country_tables(economic_data, legal_data, countries)` may return the
+        economic and legal tables extended to cover the (new) rows' countries.
+        """
+        entry = self._entry(dataset_id)
+        with entry.lock, self.store.lock(dataset_id):
+            current = entry.store.current()
+            if current is None or self._stale(dataset_id, entry):
+                current = self._reload(dataset_id, entry)
+            self._retire(current)
+            columns = list((current.sql.schema if current.sql is not None
+                            else current.salary_data).columns)
+            missing = [c for c in dedup or [] if c not in columns]
+            if missing:
+                raise ValueError(f"Unknown dedup column(s): {', '.join(missing)}")
+
+            if current.sql is not None:
+                sql, added = current.sql.append(chunks, dedup)
+                salary_data, indexes, countries = None, None, sql.distinct('Country')
+            else:
+                sql = None
+                frames = [chunk.reindex(columns=columns) for chunk in chunks]
+                rows = (pd.concat(frames, ignore_index=True) if frames
+                        else current.salary_data.iloc[:0])
+                if dedup and len(rows):
+                    hashes = hash_rows(rows, dedup)
+                    known = current.indexes.row_signatures(dedup).contains(hashes)
+                    rows = rows[~known & ~pd.Series(hashes).duplicated().to_numpy()]
+                added = len(rows)
+                salary_data = pd.concat([current.salary_data, rows], ignore_index=True)
+                indexes = current.indexes.extended(salary_data, current.records)
+                countries = rows['Country'].unique().tolist()
+
+            tables = {'economic_data': current.economic_data, 'legal_data': current.legal_data}
+            if country_tables is not None:
+                extended = country_tables(current.economic_data, current.legal_data, countries)
+                tables = {name: table for name, table in zip(tables, extended)
+                          if table is not tables[name]}
+            economic_data = tables.get('economic_data', current.economic_data)
+            legal_data = tables.get('legal_data', current.legal_data)
+            version = (self._next_version(dataset_id, entry)
+                       if entry.stored_version is not None else None)
+            snapshot = entry.store.publish(salary_data, economic_data, legal_data, current.source,
+                                           version=version, sql=sql, indexes=indexes)
+
+            # Write and measure only what changed
+            if entry.stored_version == current.version:
+                meta = {'version': snapshot.version, 'source': snapshot.source}
+                if sql is not None:
+                    # DuckDB appends write a new file (see SQLDataset.append())
+                    meta.update(backend='sql', engine=sql.engine,
+                                sql_file=os.path.basename(sql.path))
+                self.store.append(dataset_id, meta, replace=tables, rows=None if sql is not None
+                                  else {'salary_data': rows})
+                entry.stored_version = snapshot.version
+            elif entry.stored_version is not None:
+                self._save(entry, snapshot)
+            entry.nbytes += (sum(estimate_nbytes(table) - estimate_nbytes(getattr(current, name))
+                                 for name, table in tables.items())
+                             + round(added * entry.derived_per_row)
+                             + (estimate_nbytes(rows) if sql is None else 0))
+            entry.records = snapshot.records
+        self._enforce_budget(keep=dataset_id)
+        return snapshot, added
+
+    @staticmethod
+    def _measure(entry: _Entry, snapshot: DatasetSnapshot):
+        """Estimate the footprint of a published or reloaded snapshot, walking all of it.
+
+        The result cache is left out, as it changes after publication and counts its
+        own bytes; appends only add the estimated size of what they add.
+        """
+        seen = {id(snapshot.cache)}
+        tables = sum(estimate_nbytes(table, seen) for table in
+                     (snapshot.salary_data, snapshot.economic_data, snapshot.legal_data))
+        derived = estimate_nbytes(snapshot.indexes, seen) + estimate_nbytes(snapshot.sql, seen)
+        entry.nbytes = tables + derived
+        entry.derived_per_row = derived / max(snapshot.records, 1)
+
+    @staticmethod
+    def _resident_bytes(entry: _Entry, snapshot: Optional[DatasetSnapshot]) -> int:
+        return entry.nbytes + snapshot.cache.nbytes if snapshot is not None else 0
+
+    def _retire(self, snapshot: Optional[DatasetSnapshot]):
+        """Keep the summary of a version that is about to be replaced."""
+        if snapshot is None or self.summarize is None:
+            return
+        try:
+            self._retired.get_or_compute((snapshot.dataset_id, snapshot.version),
+                                         lambda: self.summarize(snapshot))
+        except Exception:
+            logger.warning(f"Could not summarize version {snapshot.version} of dataset "
+                           f"{snapshot.dataset_id}", exc_info=True)
+
+    def retired(self, dataset_id: str, version: int):
+        """Summary of a replaced version of a dataset, if still kept (else None)."""
+        return self._retired.get((dataset_id, version))
+
+    def delete(self, dataset_id: str):
+        if dataset_id == DEFAULT_DATASET:
+            raise ValueError('The default dataset cannot be deleted')
+        entry = self._entry(dataset_id)
+        with entry.lock, self.store.lock(dataset_id):
+            with self._lock:
+                self._entries.pop(dataset_id, None)
+            self.store.delete(dataset_id)
+
+    def _save(self, entry: _Entry, snapshot: DatasetSnapshot):
+        self.store.save(snapshot.dataset_id, {
+            'salary_data': snapshot.salary_data,
+            'economic_data': snapshot.economic_data,
+            'legal_data': snapshot.legal_data,
+        }, {'version': snapshot.version, 'source': snapshot.source})
+        entry.stored_version = snapshot.version
+
+    def _enforce_budget(self, keep: str):
+        """Evict least recently used datasets (never `keep`) until the budget holds."""
+        with self._lock:
+            resident = [(dataset_id, entry, self._resident_bytes(entry, entry.store.current()))
+                        for dataset_id, entry in self._entries.items()
+                        if entry.store.current() is not None]
+        total = sum(nbytes for _, _, nbytes in resident)
+
+        for dataset_id, entry, nbytes in resident:
+            if total <= self.memory_budget:
+                break
+            if dataset_id == keep:
+                continue
+            with entry.lock:
+                snapshot = entry.store.current()
+                if snapshot is None:
+                    continue
+                if entry.stored_version != snapshot.version:
+                    with self.store.lock(dataset_id):
+                        self._save(entry, snapshot)
+                entry.store.evict(snapshot)
+            total -= nbytes
+            self.evictions += 1
+            logger.info(f"Evicted dataset {dataset_id} ({nbytes / 2**20:.1f} MiB) "
+                        f"to stay within the memory budget")
+            entry.nbytes = 0
+
+        if total > self.memory_budget:
+            logger.warning(f"Resident datasets use {total / 2**20:.1f} MiB, above the "
+                           f"{self.memory_budget / 2**20:.0f} MiB budget")
+
+    def memory_usage(self) -> int:
+        with self._lock:
+            return sum(self._resident_bytes(entry, entry.store.current())
+                       for entry in self._entries.values())
+
+    def describe(self) -> List[Dict]:
+        """One row per known dataset, most recently used first."""
+        with self._lock:
+            entries = list(self._entries.items())[::-1]
+        rows = []
+        for dataset_id, entry in entries:
+            snapshot = entry.store.current()
+            rows.append({
+                'dataset_id': dataset_id,
+                'source': entry.source,
+                'version': snapshot.version if snapshot is not None else entry.stored_version,
+                'records': entry.records,
+                'backend': snapshot.backend if snapshot is not None else None,
+                'resident': snapshot is not None,
+                'memory_bytes': self._resident_bytes(entry, snapshot),
+                'disk_bytes': (self.store.disk_bytes(dataset_id)
+                               if entry.stored_version is not None else 0),
+                'last_used': entry.last_used,
+                'cache': snapshot.cache.stats() if snapshot is not None else None,
+            })
+        return rows
@@ -0,0 +1,133 @@
+"""JSON encoding of API responses.
+
+The app's Flask JSON provider, so jsonify() and every cached payload go
+through it:
+
+- orjson, when installed, encodes the response with NumPy arrays and scalars
+  handled natively (OPT_SERIALIZE_NUMPY); otherwise the standard json module
+  is used, with arrays converted one whole column at a time.
+- Records(frame) puts a DataFrame in a response as a list of row objects.
+  pandas' C encoder writes it column by column, skipping the per-cell Python
+  objects of to_dict(orient='records'), and the bytes are spliced into the
+  response.
+- NaN and +/-Inf always become null. The json module would write NaN, which is
+  not valid JSON. Timestamps become ISO 8601 strings.
+
+Object keys keep their insertion order (Flask's provider sorted them).
+"""
+import datetime
+import json
+import math
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional; the json fallback gives the same output, slower
+    orjson = None
+
+ORJSON_OPTIONS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if orjson else 0
+# Decimal places pandas writes for floats (its maximum)
+RECORDS_DOUBLE_PRECISION = 15
+
+
+class Records:
+    """A DataFrame serialized as a list of row objects."""
+
+    __slots__ = ('frame',)
+
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame
+
+    def __len__(self):
+        return len(self.frame)
+
+    def to_json(self) -> bytes:
+        return self.frame.to_json(orient='records', double_precision=RECORDS_DOUBLE_PRECISION,
+                                  date_format='iso', default_handler=str).encode()
+
+
+def _array_values(array: np.ndarray) -> list:
+    if array.dtype.kind == 'f':
+        finite = np.isfinite(array)
+        if not finite.all():
+            return np.where(finite, array, None).tolist()
+    elif array.dtype.kind == 'M':
+        return [None if pd.isna(value) else value.isoformat()
+                for value in pd.DatetimeIndex(array.ravel())]
+    elif array.dtype.kind == 'O':
+        return _finite(array.tolist())  # mixed columns may hold NaN next to strings
+    return array.tolist()
+
+
+def _default(value: Any):
+    """Types neither encoder handles natively."""
+    if isinstance(value, Records):
+        return json.loads(value.to_json())  # only reached when nested below the top level
+    if isinstance(value, np.ndarray):
+        return _array_values(value)
+    if isinstance(value, np.generic):
+        return _finite(value.item())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return _array_values(value.to_numpy())
+    if isinstance(value, pd.DataFrame):
+        return json.loads(Records(value).to_json())
+    if value is pd.NaT or value is pd.NA:
+        return None
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def _finite(value):
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(item) for item in value]
+    return value
+
+
+def _dumps_value(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS)
+    try:
+        text = json.dumps(obj, default=_default, allow_nan=False, separators=(',', ':'))
+    except ValueError:  # NaN/Inf in plain Python floats
+        text = json.dumps(_finite(obj), default=_default, allow_nan=False,
+                          separators=(',', ':'))
+    return text.encode()
+
+
+def dumps(obj: Any) -> bytes:
+    """JSON bytes of a response payload."""
+    if isinstance(obj, Records):
+        return obj.to_json()
+    if isinstance(obj, dict) and any(isinstance(value, Records) for value in obj.values()):
+        return b'{' + b','.join(_dumps_value(str(key)) + b':' + dumps(value)
+                                for key, value in obj.items()) + b'}'
+    return _dumps_value(obj)
+
+
+def loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+class APIJSONProvider(JSONProvider):
+    """Flask JSON provider writing responses with dumps() above."""
+
+    def dumps(self, obj: Any, **kwargs) -> str:
+        return dumps(obj).decode()
+
+    def loads(self, s, **kwargs) -> Any:
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype='application/json')
@@ -0,0 +1,91 @@
+"""Serialization time of API responses: Flask's jsonify vs serialization.py.
+
+Encodes a salary-like table of each size as a records response (as
+/api/data/salaries does) and as column arrays (as the aggregate endpoints do):
+
+    python serialization_benchmark.py                 # 10k, 100k and 1M rows
+    python serialization_benchmark.py --rows 10000,50000 --repeat 5
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import serialization
+from serialization import Records
+
+
+def salary_frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    salary = rng.normal(65000, 15000, rows)
+    salary[rng.random(rows) < 0.01] = np.nan
+    return pd.DataFrame({
+        'Country': rng.choice(['Germany', 'Poland', 'Hungary', 'India'], rows),
+        'Role_Name': rng.choice(['DevOps Engineer', 'SRE', 'Cloud Engineer'], rows),
+        'Experience_Level': rng.choice(['Junior', 'Mid', 'Senior'], rows),
+        'Years_of_Experience': rng.integers(0, 20, rows),
+        'Salary_EUR': salary,
+        'Salary_Avg_USD': salary * 1.1,
+        'Skills': rng.choice(['Python, Docker', 'Kubernetes, Terraform', ''], rows),
+    })
+
+
+def _best(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def run(rows: int, repeat: int) -> dict:
+    frame = salary_frame(rows)
+    columns = {name: frame[name].to_numpy() for name in ('Years_of_Experience', 'Salary_EUR')}
+    flask_json = DefaultJSONProvider(Flask(__name__))
+    orjson = serialization.orjson
+
+    def with_fallback(fn):
+        serialization.orjson = None
+        try:
+            return fn()
+        finally:
+            serialization.orjson = orjson
+
+    cases = {
+        # jsonify: per-cell Python objects, then the json module (writes NaN, invalid JSON)
+        'records jsonify': lambda: flask_json.dumps(
+            {'data': frame.to_dict(orient='records')}).encode(),
+        'records new': lambda: serialization.dumps({'data': Records(frame)}),
+        'records new (no orjson)': lambda: with_fallback(
+            lambda: serialization.dumps({'data': Records(frame)})),
+        'columns jsonify': lambda: flask_json.dumps(
+            {name: column.tolist() for name, column in columns.items()}).encode(),
+        'columns new': lambda: serialization.dumps(columns),
+        'columns new (no orjson)': lambda: with_fallback(lambda: serialization.dumps(columns)),
+    }
+    if orjson is None:
+        cases = {name: case for name, case in cases.items() if 'no orjson' not in name}
+    return {name: _best(case, repeat) for name, case in cases.items()}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', default='10000,100000,1000000')
+    parser.add_argument('--repeat', type=int, default=3, help='best of this many runs')
+    args = parser.parse_args(argv)
+
+    for rows in (int(value) for value in args.rows.split(',')):
+        results = run(rows, args.repeat)
+        print(f'{rows:>9,} rows')
+        for name, seconds in results.items():
+            print(f'  {name:26} {seconds * 1000:10.1f} ms')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
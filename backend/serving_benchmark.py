@@ -0,0 +1,177 @@
+"""Side-by-side benchmark of the threaded (gunicorn gthread) and ASGI (uvicorn) deployments.
+
+Starts each server on a free port, waits for /api/ready, opens `--idle`
+connections that send half a request and then stall (slow clients), and
+measures how the server answers `--requests` requests to each path from
+`--concurrency` clients meanwhile:
+
+    python serving_benchmark.py                         # both servers, if installed
+    python serving_benchmark.py --servers gthread --idle 200 --json bench.json
+
+A server that is not installed is reported as skipped.
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SERVERS = {
+    # The command line of infra/Dockerfile.backend, bound to a local port
+    'gthread': ('gunicorn', lambda port, workers: [
+        sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}',
+        '--workers', str(workers), '--worker-class', 'gthread', '--threads', '4',
+        '--timeout', '120', 'app:app']),
+    'asgi': ('uvicorn', lambda port, workers: [
+        sys.executable, '-m', 'uvicorn', 'asgi:application', '--host', '127.0.0.1',
+        '--port', str(port), '--workers', str(workers), '--log-level', 'warning']),
+}
+PATHS = ['/api/status', '/api/data/summary', '/api/data/by-country']
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(port: int, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/ready', timeout=2) as resp:
+                if resp.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f'Server on port {port} was not ready after {timeout}s')
+
+
+async def _get(port: int, path: str, timeout: float) -> float:
+    """Seconds for one GET (Connection: close); raises on errors and timeouts."""
+    started = time.perf_counter()
+
+    async def request():
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n\r\n'.encode())
+        await writer.drain()
+        status_line = await reader.readline()
+        await reader.read()
+        writer.close()
+        if b' 200 ' not in status_line:
+            raise RuntimeError(status_line.decode(errors='replace').strip())
+
+    await asyncio.wait_for(request(), timeout)
+    return time.perf_counter() - started
+
+
+async def _idle_connections(port: int, count: int) -> list:
+    """Connections that sent an incomplete request and then went quiet."""
+    writers = []
+    for _ in range(count):
+        try:
+            _, writer = await asyncio.open_connection('127.0.0.1', port)
+        except OSError:
+            break
+        writer.write(b'GET /api/status HTTP/1.1\r\nHost: bench\r\n')
+        writers.append(writer)
+    return writers
+
+
+async def _measure(port: int, idle: int, requests: int, concurrency: int,
+                   timeout: float) -> dict:
+    writers = await _idle_connections(port, idle)
+    results = {'idle_connections': len(writers), 'paths': {}}
+    for path in PATHS:
+        latencies: List[float] = []
+        errors = 0
+        queue = asyncio.Queue()
+        for _ in range(requests):
+            queue.put_nowait(path)
+
+        async def client():
+            nonlocal errors
+            while not queue.empty():
+                queue.get_nowait()
+                try:
+                    latencies.append(await _get(port, path, timeout))
+                except Exception:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        results['paths'][path] = {
+            'ok': len(latencies),
+            'errors': errors,
+            'requests_per_second': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None,
+            'p99_ms': (round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+                             * 1000, 1) if latencies else None),
+        }
+    for writer in writers:
+        writer.close()
+    return results
+
+
+def run_server(kind: str, workers: int, idle: int, requests: int, concurrency: int,
+               timeout: float) -> dict:
+    module, command = SERVERS[kind]
+    if importlib.util.find_spec(module) is None:
+        return {'skipped': f'{module} is not installed'}
+    port = _free_port()
+    process = subprocess.Popen(command(port, workers), cwd=BACKEND_DIR,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_ready(port, timeout=180)
+        return asyncio.run(_measure(port, idle, requests, concurrency, timeout))
+    finally:
+        process.terminate()
+        process.wait(30)
+
+
+def _print_report(report: Dict[str, dict]):
+    for kind, result in report.items():
+        if 'skipped' in result:
+            print(f'{kind}: skipped ({result["skipped"]})')
+            continue
+        print(f'{kind}: {result["idle_connections"]} stalled connections open')
+        for path, stats in result['paths'].items():
+            print(f'  {path:24} {stats["requests_per_second"]:8} req/s  '
+                  f'p50 {stats["p50_ms"]} ms  p99 {stats["p99_ms"]} ms  '
+                  f'errors {stats["errors"]}')
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--servers', default='gthread,asgi', help='comma-separated: gthread, asgi')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--idle', type=int, default=100, help='stalled client connections')
+    parser.add_argument('--requests', type=int, default=200, help='requests per path')
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--timeout', type=float, default=10.0, help='per-request timeout (s)')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args(argv)
+
+    report = {kind: run_server(kind, args.workers, args.idle, args.requests,
+                               args.concurrency, args.timeout)
+              for kind in args.servers.split(',')}
+    _print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as handle:
+            json.dump(report, handle, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from typing import Dict, List, Optional
+
+from skills import SkillIndex
+
+# Relative weight of each feature block in the similarity score
+PROFILE_WEIGHTS = {
+    'skills': 1.0,
+    'Role_Name': 1.0,
+    'Country': 1.0,
+    'Experience_Level': 0.5,
+    'years': 0.5,
+}
+PROFILE_FIELDS = {'role': 'Role_Name', 'country': 'Country', 'experience_level': 'Experience_Level'}
+YEARS_COLUMN = 'Years_of_Experience'
+# Upper edges of the experience buckets; a profile matches records in the same bucket
+YEARS_BUCKETS = [2, 5, 9, 14]
+
+
+def _l2_normalize(matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.csr_matrix(sparse.diags(1.0 / norms) @ matrix)
+
+
+def _one_hot(codes: np.ndarray, width: int) -> sparse.csr_matrix:
+    rows = np.flatnonzero(codes >= 0)
+    return sparse.csr_matrix((np.ones(len(rows)), (rows, codes[rows])),
+                             shape=(len(codes), width))
+
+
+def _years_one_hot(years: np.ndarray) -> sparse.csr_matrix:
+    buckets = np.searchsorted(YEARS_BUCKETS, np.nan_to_num(years, nan=-1), side='left')
+    return _one_hot(np.where(np.isnan(years), -1, buckets), len(YEARS_BUCKETS) + 1)
+
+
+class ProfileIndex:
+    """Normalized sparse profile vectors for cosine-similarity search.
+
+    Each record becomes TF-IDF weighted skills plus one-hot role, country,
+    experience level and years-of-experience bucket, each block scaled by
+    PROFILE_WEIGHTS and the whole row L2-normalized. A search is one sparse
+    matrix product against all rows followed by argpartition for the top k.
+    """
+
+    def __init__(self, skills: Optional[SkillIndex], dimensions: Dict[str, object],
+                 years: Optional[np.ndarray], row_count: int):
+        self.skills = skills
+        self.dimensions = {c: dimensions[c] for c in PROFILE_FIELDS.values() if c in dimensions}
+        self.has_years = years is not None
+        blocks = []
+
+        if skills is not None:
+            document_frequency = np.diff(skills.postings.indptr)
+            self.idf = np.log((1 + row_count) / (1 + document_frequency)) + 1
+            tfidf = _l2_normalize(sparse.csr_matrix(skills.matrix @ sparse.diags(self.idf)))
+            blocks.append(PROFILE_WEIGHTS['skills'] * tfidf)
+        for column, dimension in self.dimensions.items():
+            blocks.append(PROFILE_WEIGHTS[column] * _one_hot(dimension.codes, len(dimension.uniques)))
+        if self.has_years:
+            blocks.append(PROFILE_WEIGHTS['years'] * _years_one_hot(years))
+
+        self.vectors = _l2_normalize(sparse.hstack(blocks, format='csr'))
+
+    @classmethod
+    def from_indexes(cls, salary_data: pd.DataFrame, skills, dimensions) -> Optional['ProfileIndex']:
+        years = None
+        if YEARS_COLUMN in salary_data.columns:
+            years = pd.to_numeric(salary_data[YEARS_COLUMN], errors='coerce').to_numpy(dtype=float)
+        if skills is None and not any(c in dimensions for c in PROFILE_FIELDS.values()):
+            return None
+        return cls(skills, dimensions, years, len(salary_data))
+
+    def query_vectors(self, profiles: List[dict]) -> sparse.csr_matrix:
+        """Encode request profiles exactly like the stored records."""
+        count = len(profiles)
+        blocks = []
+        if self.skills is not None:
+            rows, columns = [], []
+            for row, profile in enumerate(profiles):
+                names = profile.get('skills') or []
+                if isinstance(names, str):
+                    names = names.split(',')
+                ids = [i for i in self.skills.skill_ids(names) if i >= 0]
+                rows += [row] * len(ids)
+                columns += ids
+            skill_matrix = sparse.csr_matrix(
+                (np.ones(len(rows)), (rows, columns)), shape=(count, len(self.skills.vocabulary)))
+            skill_matrix.sum_duplicates()
+            skill_matrix.data[:] = 1.0
+            tfidf = _l2_normalize(sparse.csr_matrix(skill_matrix @ sparse.diags(self.idf)))
+            blocks.append(PROFILE_WEIGHTS['skills'] * tfidf)
+        for field, column in PROFILE_FIELDS.items():
+            if column in self.dimensions:
+                dimension = self.dimensions[column]
+                codes = dimension.codes_of([profile.get(field) or '' for profile in profiles])
+                blocks.append(PROFILE_WEIGHTS[column] * _one_hot(codes, len(dimension.uniques)))
+        if self.has_years:
+            years = pd.to_numeric(pd.Series([p.get('years') for p in profiles], dtype=object),
+                                  errors='coerce').to_numpy(dtype=float)
+            blocks.append(PROFILE_WEIGHTS['years'] * _years_one_hot(years))
+        return _l2_normalize(sparse.hstack(blocks, format='csr'))
+
+    def most_similar(self, profiles: List[dict], k: int):
+        """Top-k (positions, scores) per profile, best first."""
+        queries = self.query_vectors(profiles).toarray()
+        # Sparse records x dense profiles: one product, laid out one row per profile
+        scores = np.ascontiguousarray((self.vectors @ queries.T).T)
+        k = min(k, scores.shape[1])
+        if k == 0:
+            return [(np.array([], dtype=np.intp), np.array([]))] * len(profiles)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in enumerate(top):
+            order = candidates[np.argsort(-scores[row, candidates], kind='stable')]
+            results.append((order, scores[row, order]))
+        return results
@@ -0,0 +1,349 @@
+"""Mergeable per-group salary summaries for fast percentile queries.
+
+Every finest-grain group (one combination of all loaded dimensions) keeps exact
+moments (count, mean, M2, min, max) plus a KLL quantile sketch. A query merges
+the groups that match its filters, so it never sorts rows.
+
+Accuracy: a KLL sketch with k=200 has a normalized rank error of roughly 1.65%
+at 99% confidence, i.e. a reported P90 lies between the true P88.35 and P91.65.
+While a (merged) sketch has not needed to compact - fewer than ~k values - it
+holds every value and quantiles are exact. count/mean/std/min/max are always exact.
+
+GroupSketches are mergeable partials: sketches built from separate chunks of a
+table merge into the sketches of the whole table, so they can be built while a
+large input streams past and stored alongside it (to_bytes/from_bytes).
+"""
+import io
+import json
+
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Mapping, Optional
+
+from caching import ResultCache
+
+DEFAULT_SKETCH_K = 200
+SKETCH_VALUE_COLUMN = 'Salary_Avg_USD'
+# Query results kept per GroupSketches (keys come from request filters)
+QUERY_CACHE_ENTRIES = 128
+
+
+class KLLSketch:
+    """KLL quantile sketch: level h holds sorted samples that each stand for 2**h values."""
+
+    def __init__(self, k: int = DEFAULT_SKETCH_K, seed: int = 0):
+        self.k = k
+        self.count = 0
+        self.levels = [np.empty(0)]
+        self._seed = seed
+        self._rng = None  # created on the first compaction; most groups never compact
+
+    def _capacity(self, level: int) -> int:
+        # Lower levels get geometrically smaller buffers (c = 2/3), the top level gets k
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values) -> 'KLLSketch':
+        """Add a batch of values."""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self.count += len(values)
+            self._compress()
+        return self
+
+    def merge(self, other: 'KLLSketch') -> 'KLLSketch':
+        """Fold another sketch into this one."""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            if len(items):
+                self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+        return self
+
+    def copy(self) -> 'KLLSketch':
+        sketch = KLLSketch(self.k, self._seed)
+        sketch.count = self.count
+        sketch.levels = list(self.levels)  # level arrays are replaced, never modified
+        if self._rng is not None:
+            generator = type(self._rng.bit_generator)()
+            generator.state = self._rng.bit_generator.state
+            sketch._rng = np.random.Generator(generator)
+        return sketch
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # An odd item out stays behind; every other remaining item moves up a level
+                keep, items = items[:len(items) % 2], items[len(items) % 2:]
+                if self._rng is None:
+                    self._rng = np.random.default_rng(self._seed)
+                promoted = items[self._rng.integers(2)::2]
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def is_exact(self) -> bool:
+        return len(self.levels) == 1
+
+    def quantiles(self, fractions) -> np.ndarray:
+        """Estimate quantiles for fractions in [0, 1] (NaN for an empty sketch)."""
+        fractions = np.asarray(fractions, dtype=float)
+        if self.count == 0:
+            return np.full(fractions.shape, np.nan)
+        if self.is_exact():
+            return np.quantile(self.levels[0], fractions)
+
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items_), 2.0 ** level)
+                                  for level, items_ in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        items, cumulative = items[order], np.cumsum(weights[order])
+        targets = fractions * cumulative[-1]
+        return items[np.minimum(np.searchsorted(cumulative, targets, side='left'),
+                                len(items) - 1)]
+
+
+class GroupSketches:
+    """Exact moments plus a KLL sketch for each finest-grain dimension group."""
+
+    def __init__(self, dimensions: List[str], value_column: str = SKETCH_VALUE_COLUMN,
+                 k: int = DEFAULT_SKETCH_K):
+        self.dimensions = list(dimensions)
+        self.value_column = value_column
+        self.k = k
+        self.keys: List[tuple] = []
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.means = np.zeros(0)
+        self.m2 = np.zeros(0)
+        self.mins = np.zeros(0)
+        self.maxs = np.zeros(0)
+        self.sketches: List[KLLSketch] = []
+        # Per group: whether its sketch is shared with the sketches this one was copied
+        # from (then replaced before updating)
+        self._shared = np.zeros(0, dtype=bool)
+        self._lookup: Dict[tuple, int] = {}
+        self._key_columns = None
+        self._cache = ResultCache(max_entries=QUERY_CACHE_ENTRIES)
+
+    @classmethod
+    def from_frame(cls, salary_data: pd.DataFrame, dimensions: List[str],
+                   value_column: str = SKETCH_VALUE_COLUMN) -> Optional['GroupSketches']:
+        if value_column not in salary_data.columns:
+            return None
+        sketches = cls(dimensions, value_column)
+        sketches.update(salary_data)
+        return sketches
+
+    def update(self, rows: pd.DataFrame):
+        """Fold new rows in; cost depends only on the number of rows passed."""
+        values = pd.to_numeric(rows[self.value_column], errors='coerce').to_numpy(dtype=float)
+        valid = ~np.isnan(values)
+        values = values[valid]
+        if not len(values):
+            return
+
+        if self.dimensions:
+            key_frame = rows[self.dimensions].iloc[np.flatnonzero(valid)].astype(str)
+            codes, uniques = pd.MultiIndex.from_frame(key_frame).factorize()
+            batch_keys = list(uniques)
+        else:
+            codes = np.zeros(len(values), dtype=np.intp)
+            batch_keys = [()]
+
+        # Per-batch-group moments in one pass, then Chan's parallel merge into the totals
+        counts = np.bincount(codes, minlength=len(batch_keys))
+        sums = np.bincount(codes, weights=values, minlength=len(batch_keys))
+        means = sums / counts
+        m2 = np.bincount(codes, weights=(values - means[codes]) ** 2, minlength=len(batch_keys))
+        order = np.lexsort((values, codes))
+        sorted_values = values[order]
+        bounds = np.concatenate([[0], np.cumsum(counts)])
+
+        targets = self._fold(batch_keys, counts, means, m2,
+                             sorted_values[bounds[:-1]], sorted_values[bounds[1:] - 1])
+        self._unshare(targets)
+        for batch_group, target in enumerate(targets):
+            self.sketches[target].update(sorted_values[bounds[batch_group]:bounds[batch_group + 1]])
+
+        self._cache = ResultCache(max_entries=QUERY_CACHE_ENTRIES)
+
+    def copy(self) -> 'GroupSketches':
+        """A copy to update while readers keep using this one, which stays unchanged.
+
+        The copy shares the per-group sketches and replaces one before updating
+        it, so copying and then updating a few groups costs little more than the
+        arrays. Only the copy tracks the sharing: this object is not modified,
+        and must not be updated afterwards (snapshots are immutable once published).
+        """
+        sketches = GroupSketches(self.dimensions, self.value_column, self.k)
+        sketches.keys = list(self.keys)
+        sketches._lookup = dict(self._lookup)
+        for name in ('counts', 'means', 'm2', 'mins', 'maxs'):
+            setattr(sketches, name, getattr(self, name).copy())
+        sketches.sketches = list(self.sketches)
+        sketches._shared = np.ones(len(self.keys), dtype=bool)
+        return sketches
+
+    def _unshare(self, groups: np.ndarray):
+        """Give these groups their own sketch before it is modified."""
+        for group in groups[self._shared[groups]].tolist():
+            self.sketches[group] = self.sketches[group].copy()
+        self._shared[groups] = False
+
+    def merge(self, other: 'GroupSketches') -> 'GroupSketches':
+        """Fold in sketches built from other rows of the same table."""
+        if other.dimensions != self.dimensions or other.value_column != self.value_column:
+            raise ValueError('Cannot merge sketches of different dimensions or values')
+        present = np.flatnonzero(other.counts > 0)
+        if len(present):
+            targets = self._fold([other.keys[i] for i in present], other.counts[present],
+                                 other.means[present], other.m2[present],
+                                 other.mins[present], other.maxs[present])
+            self._unshare(targets)
+            for group, target in zip(present, targets):
+                self.sketches[target].merge(other.sketches[group])
+            self._cache = ResultCache(max_entries=QUERY_CACHE_ENTRIES)
+        return self
+
+    def _fold(self, keys: List[tuple], counts: np.ndarray, means: np.ndarray, m2: np.ndarray,
+              mins: np.ndarray, maxs: np.ndarray) -> np.ndarray:
+        """Chan's parallel merge of per-group moments into the totals; returns the group ids."""
+        targets = self._group_ids(keys)
+        old_counts = self.counts[targets]
+        old_means = self.means[targets]
+        total = old_counts + counts
+        delta = means - old_means
+        self.means[targets] = old_means + delta * counts / total
+        self.m2[targets] += m2 + delta ** 2 * old_counts * counts / total
+        self.counts[targets] = total
+        self.mins[targets] = np.fmin(self.mins[targets], mins)
+        self.maxs[targets] = np.fmax(self.maxs[targets], maxs)
+        return targets
+
+    def to_bytes(self) -> bytes:
+        """Serialize to an .npz archive (no pickling), e.g. to store next to a table."""
+        levels = [(group, level, items) for group, sketch in enumerate(self.sketches)
+                  for level, items in enumerate(sketch.levels) if len(items)]
+        meta = {'dimensions': self.dimensions, 'value_column': self.value_column, 'k': self.k,
+                'keys': [list(key) for key in self.keys]}
+        buffer = io.BytesIO()
+        np.savez(buffer, meta=np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8),
+                 counts=self.counts, means=self.means, m2=self.m2, mins=self.mins, maxs=self.maxs,
+                 sketch_counts=np.array([sketch.count for sketch in self.sketches], dtype=np.int64),
+                 level_groups=np.array([group for group, _, _ in levels], dtype=np.int64),
+                 level_numbers=np.array([level for _, level, _ in levels], dtype=np.int64),
+                 level_sizes=np.array([len(items) for _, _, items in levels], dtype=np.int64),
+                 level_items=np.concatenate([items for _, _, items in levels]) if levels
+                 else np.empty(0))
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'GroupSketches':
+        archive = np.load(io.BytesIO(data), allow_pickle=False)
+        meta = json.loads(archive['meta'].tobytes().decode())
+        sketches = cls(meta['dimensions'], meta['value_column'], meta['k'])
+        sketches._group_ids([tuple(key) for key in meta['keys']])
+        for name in ('counts', 'means', 'm2', 'mins', 'maxs'):
+            setattr(sketches, name, archive[name])
+        for sketch, count in zip(sketches.sketches, archive['sketch_counts'].tolist()):
+            sketch.count = count
+        items = np.split(archive['level_items'], np.cumsum(archive['level_sizes'])[:-1])
+        for group, level, values in zip(archive['level_groups'].tolist(),
+                                        archive['level_numbers'].tolist(), items):
+            levels = sketches.sketches[group].levels
+            levels.extend(np.empty(0) for _ in range(level + 1 - len(levels)))
+            levels[level] = values
+        return sketches
+
+    def _group_ids(self, keys: List[tuple]) -> np.ndarray:
+        """Map group keys to group ids, allocating any groups not seen before."""
+        new_keys = [key for key in dict.fromkeys(keys) if key not in self._lookup]
+        if new_keys:
+            for key in new_keys:
+                self._lookup[key] = len(self.keys)
+                self.sketches.append(KLLSketch(self.k, seed=len(self.keys)))
+                self.keys.append(key)
+            grow = len(new_keys)
+            self.counts = np.concatenate([self.counts, np.zeros(grow, dtype=np.int64)])
+            self.means = np.concatenate([self.means, np.zeros(grow)])
+            self.m2 = np.concatenate([self.m2, np.zeros(grow)])
+            self.mins = np.concatenate([self.mins, np.full(grow, np.nan)])
+            self.maxs = np.concatenate([self.maxs, np.full(grow, np.nan)])
+            self._shared = np.concatenate([self._shared, np.zeros(grow, dtype=bool)])
+            self._key_columns = None
+        return np.array([self._lookup[key] for key in keys], dtype=np.intp)
+
+    def _columns(self) -> Dict[str, np.ndarray]:
+        if self._key_columns is None:
+            keys = np.empty((len(self.keys), len(self.dimensions)), dtype=object)
+            keys[:] = self.keys if self.keys else np.empty((0, len(self.dimensions)))
+            self._key_columns = {d: keys[:, i] for i, d in enumerate(self.dimensions)}
+        return self._key_columns
+
+    def query(self, filters: Mapping[str, str], group_by: List[str],
+              fractions: List[float]) -> Dict[str, np.ndarray]:
+        """Merge matching groups into one summary per `group_by` combination.
+
+        Returns parallel columns: the group_by values, count, mean, std, min, max and
+        one pXX column per requested fraction.
+        """
+        cache_key = (tuple(sorted(filters.items())), tuple(group_by), tuple(fractions))
+        return self._cache.get_or_compute(
+            cache_key, lambda: self._query(filters, group_by, fractions))
+
+    def _query(self, filters: Mapping[str, str], group_by: List[str],
+               fractions: List[float]) -> Dict[str, np.ndarray]:
+        key_columns = self._columns()
+        matches = np.ones(len(self.keys), dtype=bool)
+        for column, value in filters.items():
+            matches &= key_columns[column] == value
+        selected = np.flatnonzero(matches & (self.counts > 0))
+
+        if group_by:
+            group_frame = pd.DataFrame({d: key_columns[d][selected] for d in group_by})
+            codes, uniques = pd.MultiIndex.from_frame(group_frame).factorize(sort=True)
+            labels = list(uniques)
+        else:
+            codes = np.zeros(len(selected), dtype=np.intp)
+            labels = [()] if len(selected) else []
+        group_count = len(labels)
+
+        counts = np.bincount(codes, weights=self.counts[selected], minlength=group_count)
+        weighted = np.bincount(codes, weights=self.counts[selected] * self.means[selected],
+                               minlength=group_count)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = weighted / counts
+            spread = self.m2[selected] + self.counts[selected] * (
+                self.means[selected] - means[codes]) ** 2
+            variance = np.bincount(codes, weights=spread, minlength=group_count) / (counts - 1)
+        mins = np.full(group_count, np.inf)
+        maxs = np.full(group_count, -np.inf)
+        np.minimum.at(mins, codes, self.mins[selected])
+        np.maximum.at(maxs, codes, self.maxs[selected])
+
+        merged = [KLLSketch(self.k) for _ in range(group_count if fractions else 0)]
+        for code, group in zip(codes if fractions else [], selected):
+            merged[code].merge(self.sketches[group])
+        quantiles = np.array([sketch.quantiles(fractions) for sketch in merged]).reshape(
+            len(merged), len(fractions))
+
+        result = {}
+        for i, dimension in enumerate(group_by):
+            result[dimension] = np.array([label[i] for label in labels], dtype=object)
+        result['count'] = counts.astype(np.int64)
+        result['mean'] = means
+        result['std'] = np.sqrt(np.where(counts > 1, variance, np.nan))
+        result['min'] = mins
+        result['max'] = maxs
+        for i, fraction in enumerate(fractions):
+            result[f'p{fraction * 100:g}'] = quantiles[:, i]
+        return result
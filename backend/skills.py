@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from typing import Dict, List, Optional
+
+from utils import segment_quantile
+
+SKILLS_COLUMN = 'Skills'
+
+
+class SkillIndex:
+    """Sparse record x skill matrix built once from the comma-separated Skills column.
+
+    The CSC form doubles as an inverted index: column j's row indices are the
+    sorted posting list of records that mention skill j.
+    """
+
+    def __init__(self, skills: pd.Series):
+        tokens = skills.fillna('').astype(str).reset_index(drop=True).str.split(',').explode()
+        tokens = tokens.str.strip()
+        tokens = tokens[tokens != '']
+        columns, vocabulary = pd.factorize(tokens, sort=True)
+
+        self.vocabulary = np.asarray(vocabulary, dtype=object)
+        self._lookup = {skill.lower(): i for i, skill in enumerate(self.vocabulary)}
+        matrix = sparse.csr_matrix(
+            (np.ones(len(columns), dtype=np.float64), (tokens.index.to_numpy(), columns)),
+            shape=(len(skills), len(self.vocabulary)))
+        matrix.sum_duplicates()
+        matrix.data[:] = 1.0  # a skill listed twice still counts once
+        self.matrix = matrix
+        self.postings = matrix.tocsc()
+
+    @classmethod
+    def from_frame(cls, salary_data: pd.DataFrame) -> Optional['SkillIndex']:
+        if SKILLS_COLUMN not in salary_data.columns:
+            return None
+        return cls(salary_data[SKILLS_COLUMN])
+
+    def extended(self, skills: pd.Series) -> 'SkillIndex':
+        """This index with `skills` appended as new rows; existing rows are not re-tokenized."""
+        delta = SkillIndex(skills)
+        vocabulary = pd.Index(self.vocabulary).union(pd.Index(delta.vocabulary))
+        index = SkillIndex.__new__(SkillIndex)
+        index.vocabulary = np.asarray(vocabulary, dtype=object)
+        index._lookup = {skill.lower(): i for i, skill in enumerate(index.vocabulary)}
+        # The union keeps both vocabularies' order, so remapped rows stay sorted
+        blocks = [sparse.csr_matrix((part.matrix.data, vocabulary.get_indexer(part.vocabulary)[
+            part.matrix.indices], part.matrix.indptr), shape=(part.matrix.shape[0], len(vocabulary)))
+                  for part in (self, delta)]
+        index.matrix = sparse.vstack(blocks, format='csr')
+        index.postings = index.matrix.tocsc()
+        return index
+
+    def skill_ids(self, names: List[str]) -> List[int]:
+        """Vocabulary ids for skill names (case-insensitive); unknown names give -1."""
+        return [self._lookup.get(name.strip().lower(), -1) for name in names]
+
+    def rows_with_all(self, names: List[str]) -> np.ndarray:
+        """Sorted row positions of records listing every one of `names`."""
+        ids = self.skill_ids(names)
+        if any(i < 0 for i in ids):
+            return np.array([], dtype=np.intp)
+        indptr, indices = self.postings.indptr, self.postings.indices
+        # Intersect shortest posting lists first so the candidate set shrinks fastest
+        ids.sort(key=lambda i: indptr[i + 1] - indptr[i])
+        rows = indices[indptr[ids[0]]:indptr[ids[0] + 1]]
+        for i in ids[1:]:
+            rows = np.intersect1d(rows, indices[indptr[i]:indptr[i + 1]], assume_unique=True)
+        return rows.astype(np.intp)
+
+    def frequency(self, positions: np.ndarray) -> Dict[str, np.ndarray]:
+        """Number and share of the selected records that list each skill."""
+        counts = np.asarray(self.matrix[positions].sum(axis=0)).ravel()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            share = counts / len(positions)
+        return {'skill': self.vocabulary, 'count': counts.astype(np.int64), 'share': share}
+
+    def salary_by_skill(self, positions: np.ndarray, salaries: np.ndarray,
+                        baseline_codes: np.ndarray) -> Dict[str, np.ndarray]:
+        """Mean/median salary per skill and its premium over the baseline group mean.
+
+        The premium is the average, over records listing the skill, of salary minus
+        the mean salary of the record's baseline group (e.g. its role), so it
+        measures what the skill adds beyond the role mix of its holders.
+        """
+        subset = self.matrix[positions]
+        salaries = np.asarray(salaries, dtype=float)[positions]
+        baseline_codes = np.asarray(baseline_codes)[positions]
+
+        counts = np.asarray(subset.sum(axis=0)).ravel()
+        baseline_counts = np.bincount(baseline_codes)
+        baseline_sums = np.bincount(baseline_codes, weights=salaries)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            baseline_means = baseline_sums / baseline_counts
+            means = (subset.T @ salaries) / counts
+            premium = (subset.T @ (salaries - baseline_means[baseline_codes])) / counts
+
+        # Median per skill: salaries of each posting list, sorted within the list
+        postings = subset.tocsc()
+        skill_of_entry = np.repeat(np.arange(len(self.vocabulary)), np.diff(postings.indptr))
+        entry_salaries = salaries[postings.indices]
+        sorted_salaries = entry_salaries[np.lexsort((entry_salaries, skill_of_entry))]
+        medians = segment_quantile(sorted_salaries, postings.indptr[:-1], counts.astype(np.intp),
+                                   0.5)
+
+        return {
+            'skill': self.vocabulary,
+            'count': counts.astype(np.int64),
+            'mean_salary': means,
+            'median_salary': medians,
+            'premium': premium,
+        }
+
+
+def top_skills(columns: Dict[str, np.ndarray], sort_by: str = 'count', min_count: int = 1,
+               limit: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """Keep skills seen at least `min_count` times, ordered by `sort_by` descending."""
+    if sort_by not in columns or sort_by == 'skill':
+        options = ', '.join(name for name in columns if name != 'skill')
+        raise ValueError(f"Cannot sort skills by '{sort_by}' (choose from {options})")
+    keep = np.flatnonzero(columns['count'] >= min_count)
+    # NaN sorts last; ties keep alphabetical order
+    order = keep[np.argsort(-np.nan_to_num(columns[sort_by][keep], nan=-np.inf), kind='stable')]
+    order = order[:limit]
+    return {name: column[order] for name, column in columns.items()}
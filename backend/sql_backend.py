@@ -0,0 +1,670 @@
+"""Embedded SQL storage for salary tables too large to keep in memory.
+
+The salary table lives in a single database file (DuckDB when it is installed,
+SQLite otherwise) and every /api/data/* query is pushed down as SQL: filters
+become a WHERE clause, group-bys and aggregates run in the engine, and order
+statistics come from window functions, so only result rows reach Python.
+Results match the in-memory path: same filters, same group order, same
+linear-interpolation quantiles.
+
+While the rows stream in, create() also keeps mergeable partial aggregates -
+per-column null counts and min/max, plus the per-group moments and quantile
+sketches of GroupSketches - and stores them in the database. Summaries (but
+for their exact median, selected once per version), percentiles and group-bys
+that only slice along dimension columns are answered from those partials
+without scanning the table, so memory stays bounded by the chunk size while
+loading and by the number of groups while querying.
+
+append() adds rows and updates the partials from the new rows only. Every query
+is limited to the rows an SQLDataset object was opened with (`_row < row_count`),
+so requests pinned to the previous version keep seeing it. SQLite appends to the
+same file. DuckDB refuses a writable connection to a file that this process (or
+any other worker) has open read-only, so its appends go to a copy of the file -
+the next generation - and the previous generation stays readable.
+"""
+import json
+import math
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from caching import ResultCache
+from indexes import (GROUP_DIMENSIONS, RANK_GROUPINGS, SALARY_RANGE_COLUMNS, SORTED_COLUMNS,
+                     hash_rows)
+from queries import (EQUALITY_FILTERS, parse_float_arg, parse_int_arg, parse_offers,
+                     range_filter_params)
+from sketches import SKETCH_VALUE_COLUMN, GroupSketches
+from skills import SKILLS_COLUMN
+
+try:
+    import duckdb
+except ImportError:  # optional; SQLite ships with Python
+    duckdb = None
+
+SQL_ENGINE = 'duckdb' if duckdb is not None else 'sqlite'
+# Records per rows() page without a limit, and the largest limit served: the
+# table may not fit in memory, so a page never holds all of it
+PAGE_ROWS = 1000
+MAX_PAGE_ROWS = 10_000
+# Rows per INSERT batch when loading a frame that is already in memory
+INSERT_CHUNK_ROWS = 50_000
+# Offers per batched rank query (5 bound parameters each)
+RANK_BATCH = 1000
+# Signatures per duplicate lookup query on append
+SIGNATURE_BATCH = 500
+# Aggregates that the per-group moments answer exactly
+MOMENT_AGGREGATES = {'count', 'sum', 'mean', 'std', 'min', 'max'}
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _column_type(dtype) -> str:
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return 'BIGINT'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'DOUBLE'
+    return 'TEXT'
+
+
+def sql_filename(engine: str = SQL_ENGINE) -> str:
+    return f'salaries.{engine}'
+
+
+def _generation_path(path: str, engine: str) -> str:
+    """A new file next to `path` for the next generation of a DuckDB database."""
+    return os.path.join(os.path.dirname(path), f'salaries-{uuid.uuid4().hex[:8]}.{engine}')
+
+
+def _remove_generations(path: str, keep: Iterable[str]):
+    """Delete the other generations of the database at `path`, except `keep`."""
+    directory = os.path.dirname(path)
+    engine = path.rsplit('.', 1)[-1]
+    keep = {os.path.basename(name) for name in keep}
+    for name in os.listdir(directory):
+        if (name.startswith('salaries') and name.endswith(f'.{engine}')
+                and name not in keep):
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+
+def _connect(path: str, read_only: bool, engine: str = SQL_ENGINE):
+    if engine == 'duckdb':
+        return duckdb.connect(path, read_only=read_only)
+    if read_only:
+        return sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+    return sqlite3.connect(path)
+
+
+def _skill_filters(args: Mapping[str, str]) -> List[str]:
+    return [name.strip().lower() for name in (args.get('skills') or '').split(',')
+            if name.strip()]
+
+
+def _update_column_stats(stats: Dict[str, dict], chunk: pd.DataFrame, schema: List[tuple]):
+    """Fold one chunk into the running null counts and numeric min/max per column."""
+    for name, dtype in schema:
+        series = chunk[name]
+        entry = stats.setdefault(name, {'nulls': 0, 'min': None, 'max': None})
+        entry['nulls'] += int(series.isna().sum())
+        if _column_type(dtype) == 'TEXT':
+            continue
+        values = pd.to_numeric(series, errors='coerce')
+        low, high = values.min(), values.max()
+        if not pd.isna(low):
+            entry['min'] = float(low) if entry['min'] is None else min(entry['min'], float(low))
+            entry['max'] = float(high) if entry['max'] is None else max(entry['max'], float(high))
+
+
+def _frame_chunks(frame: pd.DataFrame, rows: int = INSERT_CHUNK_ROWS) -> Iterable[pd.DataFrame]:
+    for start in range(0, len(frame), rows):
+        yield frame.iloc[start:start + rows]
+
+
+class SQLDataset:
+    """A salary table stored in an embedded SQL database, queried without loading it."""
+
+    def __init__(self, path: str, engine: str = SQL_ENGINE,
+                 sketches: Optional[GroupSketches] = None):
+        """Open the database at `path`; `sketches` are its stored ones, if already in memory."""
+        if engine == 'duckdb' and duckdb is None:
+            raise ValueError('This dataset needs DuckDB, which is not installed')
+        self.path = path
+        self.engine = engine
+        self._local = threading.local()
+        # Results computed from this dataset; a republished dataset gets a new object
+        self.cache = ResultCache()
+
+        meta = dict(self._fetch('SELECT key, value FROM dataset_meta'))
+        schema = json.loads(meta['schema'])
+        self.schema = pd.DataFrame({name: pd.Series(dtype=dtype) for name, dtype in schema})
+        self.columns = [name for name, _ in schema]
+        self.row_count = int(meta['row_count'])
+        self.dimensions = {c: c for c in GROUP_DIMENSIONS if c in self.columns}
+        self.sorted_columns = {}
+        for key, candidates in SORTED_COLUMNS.items():
+            present = [c for c in candidates if c in self.columns]
+            if present:
+                self.sorted_columns[key] = present[0]
+        self.salary_range = next(((low, high) for low, high in SALARY_RANGE_COLUMNS
+                                  if low in self.columns and high in self.columns), None)
+        self.has_skills = SKILLS_COLUMN in self.columns
+
+        # Partial aggregates written by create() (absent in databases from older versions)
+        self.column_stats = json.loads(meta['column_stats']) if 'column_stats' in meta else {}
+        self.sketches = None
+        self.sketch_dimensions = set()
+        if sketches is not None:
+            self.sketches = sketches
+        elif 'column_stats' in meta:
+            blobs = dict(self._fetch('SELECT key, value FROM dataset_blobs'))
+            if 'sketches' in blobs:
+                self.sketches = GroupSketches.from_bytes(bytes(blobs['sketches']))
+        if self.sketches is not None:
+            # Sketch keys are strings, so only null-free text dimensions group the same way
+            self.sketch_dimensions = {
+                d for d in self.sketches.dimensions
+                if _column_type(self.schema[d].dtype) == 'TEXT'
+                and self.column_stats[d]['nulls'] == 0}
+
+    @classmethod
+    def create(cls, path: str, chunks: Iterable[pd.DataFrame]) -> 'SQLDataset':
+        """Write salary rows, one chunk at a time, into a new database at `path`.
+
+        Only the current chunk and the partial aggregates are held in memory.
+        """
+        connection = _connect(path, read_only=False)
+        try:
+            columns, schema, row_count = None, None, 0
+            stats, sketches = {}, None
+            for chunk in chunks:
+                if columns is None:
+                    columns = list(chunk.columns)
+                    schema = [(name, str(dtype)) for name, dtype in chunk.dtypes.items()]
+                    definitions = ', '.join(f'{_quote(name)} {_column_type(dtype)}'
+                                            for name, dtype in chunk.dtypes.items())
+                    connection.execute(f'CREATE TABLE salaries (_row INTEGER PRIMARY KEY, '
+                                       f'{definitions})')
+                    connection.execute('CREATE TABLE record_skills (_row BIGINT, skill TEXT)')
+                    if SKETCH_VALUE_COLUMN in columns:
+                        sketches = GroupSketches([c for c in GROUP_DIMENSIONS if c in columns])
+                chunk = chunk.reindex(columns=columns)
+                cls._insert(connection, chunk, columns, row_count)
+                row_count += len(chunk)
+                _update_column_stats(stats, chunk, schema)
+                if sketches is not None:
+                    sketches.update(chunk)
+            if columns is None:
+                raise ValueError('No rows to store')
+
+            indexed = [c for c in GROUP_DIMENSIONS if c in columns]
+            indexed += [next(c for c in candidates if c in columns)
+                        for candidates in SORTED_COLUMNS.values()
+                        if any(c in columns for c in candidates)]
+            for position, column in enumerate(indexed):
+                connection.execute(f'CREATE INDEX idx_salaries_{position} ON salaries '
+                                   f'({_quote(column)})')
+            connection.execute('CREATE INDEX idx_record_skills ON record_skills (skill, _row)')
+            connection.execute('CREATE TABLE row_signatures (key TEXT, hash BIGINT)')
+            connection.execute('CREATE INDEX idx_row_signatures ON row_signatures (key, hash)')
+            connection.execute('CREATE TABLE dataset_meta (key TEXT PRIMARY KEY, value TEXT)')
+            connection.executemany('INSERT INTO dataset_meta VALUES (?, ?)', [
+                ('schema', json.dumps(schema)), ('row_count', str(row_count)),
+                ('column_stats', json.dumps(stats))])
+            connection.execute('CREATE TABLE dataset_blobs (key TEXT PRIMARY KEY, value BLOB)')
+            if sketches is not None:
+                connection.execute('INSERT INTO dataset_blobs VALUES (?, ?)',
+                                   ['sketches', sketches.to_bytes()])
+            if SQL_ENGINE == 'sqlite':
+                connection.execute('ANALYZE')
+            connection.commit()
+        finally:
+            connection.close()
+        return cls(path)
+
+    @classmethod
+    def from_frame(cls, path: str, salary_data: pd.DataFrame) -> 'SQLDataset':
+        return cls.create(path, _frame_chunks(salary_data))
+
+    @staticmethod
+    def _insert(connection, chunk: pd.DataFrame, columns: List[str], first_row: int,
+                engine: str = SQL_ENGINE):
+        rows = np.arange(first_row, first_row + len(chunk))
+        if SKILLS_COLUMN in chunk.columns:
+            tokens = chunk[SKILLS_COLUMN].fillna('').astype(str).set_axis(rows)
+            tokens = tokens.str.split(',').explode().str.strip().str.lower()
+            tokens = tokens[tokens != ''].reset_index().drop_duplicates()
+            skill_rows = list(zip(tokens['index'].tolist(), tokens[SKILLS_COLUMN].tolist()))
+        else:
+            skill_rows = []
+
+        if engine == 'duckdb':
+            frame = chunk.copy()
+            frame.insert(0, '_row', rows)
+            connection.register('chunk_frame', frame)
+            connection.execute('INSERT INTO salaries SELECT * FROM chunk_frame')
+            connection.unregister('chunk_frame')
+        else:
+            values = chunk.astype(object).where(chunk.notna(), None)
+            placeholders = ', '.join('?' * (len(columns) + 1))
+            connection.executemany(
+                f'INSERT INTO salaries VALUES ({placeholders})',
+                ((row, *record) for row, record in
+                 zip(rows.tolist(), values.itertuples(index=False, name=None))))
+        if skill_rows:
+            connection.executemany('INSERT INTO record_skills VALUES (?, ?)', skill_rows)
+
+    def append(self, chunks: Iterable[pd.DataFrame],
+               dedup: Optional[List[str]] = None) -> Tuple['SQLDataset', int]:
+        """Add rows; returns the dataset including them and the number added.
+
+        SQLite work is proportional to the new rows. DuckDB copies the file first
+        (see the module docstring): the returned dataset is at a new path, and
+        generations older than this one are deleted. With `dedup`, rows whose
+        values in those columns match an existing (or earlier new) row are
+        skipped; matching uses hashed row signatures, which are stored per key
+        column list and kept up to date by every later append.
+        """
+        path = self.path
+        if self.engine == 'duckdb':
+            path = _generation_path(self.path, self.engine)
+            shutil.copyfile(self.path, path)
+        try:
+            added, sketches = self._append_to(path, chunks, dedup)
+        except BaseException:
+            if path != self.path:
+                os.remove(path)
+            raise
+        if path != self.path:
+            _remove_generations(path, keep=[self.path, path])
+        return SQLDataset(path, self.engine, sketches), added
+
+    def _append_to(self, path: str, chunks: Iterable[pd.DataFrame],
+                   dedup: Optional[List[str]]) -> Tuple[int, Optional[GroupSketches]]:
+        connection = _connect(path, read_only=False, engine=self.engine)
+        try:
+            stored, = connection.execute(
+                "SELECT value FROM dataset_meta WHERE key = 'row_count'").fetchone()
+            if int(stored) != self.row_count:
+                # Rows were appended since this object was opened: _row values would clash
+                raise ValueError('The dataset was changed by another process, retry the append')
+            connection.execute('CREATE TABLE IF NOT EXISTS row_signatures (key TEXT, hash BIGINT)')
+            connection.execute('CREATE INDEX IF NOT EXISTS idx_row_signatures '
+                               'ON row_signatures (key, hash)')
+            keys = {key: key.split(',') for key, in connection.execute(
+                'SELECT DISTINCT key FROM row_signatures').fetchall()}
+            dedup_key = ','.join(dedup) if dedup else None
+            if dedup and dedup_key not in keys:
+                self._store_signatures(connection, dedup_key, dedup)
+                keys[dedup_key] = list(dedup)
+
+            schema = [(name, str(self.schema[name].dtype)) for name in self.columns]
+            stats = json.loads(json.dumps(self.column_stats))
+            sketches = self.sketches.copy() if self.sketches is not None else None
+            row_count = self.row_count
+            for chunk in chunks:
+                chunk = chunk.reindex(columns=self.columns)
+                hashes = {key: hash_rows(self._typed(chunk, columns), columns)
+                          for key, columns in keys.items()}
+                if dedup:
+                    fresh = ~pd.Series(hashes[dedup_key]).duplicated().to_numpy()
+                    fresh &= ~self._known_signatures(connection, dedup_key, hashes[dedup_key])
+                    chunk = chunk[fresh]
+                    hashes = {key: values[fresh] for key, values in hashes.items()}
+                if not len(chunk):
+                    continue
+                self._insert(connection, chunk, self.columns, row_count, self.engine)
+                for key, values in hashes.items():
+                    connection.executemany('INSERT INTO row_signatures VALUES (?, ?)',
+                                           ((key, value) for value in values.view(np.int64).tolist()))
+                row_count += len(chunk)
+                _update_column_stats(stats, chunk, schema)
+                if sketches is not None:
+                    sketches.update(chunk)
+
+            connection.executemany('UPDATE dataset_meta SET value = ? WHERE key = ?', [
+                (str(row_count), 'row_count'), (json.dumps(stats), 'column_stats')])
+            if sketches is not None:
+                connection.execute("UPDATE dataset_blobs SET value = ? WHERE key = 'sketches'",
+                                   [sketches.to_bytes()])
+            connection.commit()
+        finally:
+            connection.close()
+        return row_count - self.row_count, sketches
+
+    def _typed(self, chunk: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+        """`columns` of a chunk, numeric where the table's column is numeric."""
+        return pd.DataFrame({
+            column: (chunk[column] if _column_type(self.schema[column].dtype) == 'TEXT'
+                     else pd.to_numeric(chunk[column], errors='coerce').astype(float))
+            for column in columns})
+
+    def _store_signatures(self, connection, key: str, columns: List[str]):
+        """Signatures of the rows already stored, for a key used for the first time."""
+        selected = ', '.join(_quote(c) for c in columns)
+        # Its own cursor: DuckDB's execute() returns the connection, whose result
+        # the INSERTs below would replace
+        cursor = connection.cursor()
+        cursor.execute(f'SELECT {selected} FROM salaries WHERE _row < ? ORDER BY _row',
+                       [self.row_count])
+        while True:
+            rows = cursor.fetchmany(INSERT_CHUNK_ROWS)
+            if not rows:
+                break
+            hashes = hash_rows(self._typed(pd.DataFrame(rows, columns=columns), columns), columns)
+            connection.executemany('INSERT INTO row_signatures VALUES (?, ?)',
+                                   ((key, value) for value in hashes.view(np.int64).tolist()))
+        cursor.close()
+
+    @staticmethod
+    def _known_signatures(connection, key: str, hashes: np.ndarray) -> np.ndarray:
+        signed = hashes.view(np.int64)
+        known = set()
+        for start in range(0, len(signed), SIGNATURE_BATCH):
+            batch = signed[start:start + SIGNATURE_BATCH].tolist()
+            placeholders = ', '.join('?' * len(batch))
+            known.update(value for value, in connection.execute(
+                f'SELECT hash FROM row_signatures WHERE key = ? AND hash IN ({placeholders})',
+                [key, *batch]).fetchall())
+        return np.isin(signed, np.fromiter(known, dtype=np.int64, count=len(known)))
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = _connect(self.path, True, self.engine)
+        return connection
+
+    def close(self):
+        """Close this thread's connection (others close when their thread's local is freed)."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def _fetch(self, sql: str, params: Iterable = ()) -> List[tuple]:
+        return self._connection().execute(sql, list(params)).fetchall()
+
+    def where(self, args: Mapping[str, str]) -> Tuple[str, list]:
+        """The WHERE clause (and its parameters) for the /api/data/salaries filters."""
+        clauses, params = [f'_row < {self.row_count}'], []
+        for param, column in EQUALITY_FILTERS.items():
+            value = args.get(param)
+            if value and column in self.dimensions:
+                clauses.append(f'{_quote(column)} = ?')
+                params.append(value)
+
+        salary_min = parse_float_arg(args, 'salary_min')
+        salary_max = parse_float_arg(args, 'salary_max')
+        if salary_min is not None or salary_max is not None:
+            if self.salary_range is None:
+                raise ValueError('Salary range filters are not available for this dataset')
+            if salary_min is not None and salary_max is not None and salary_min > salary_max:
+                raise ValueError('salary_min must not be greater than salary_max')
+            lower, upper = (_quote(c) for c in self.salary_range)
+            clauses += [f'{lower} IS NOT NULL', f'{upper} IS NOT NULL']
+            if salary_max is not None:
+                clauses.append(f'{lower} <= ?')
+                params.append(salary_max)
+            if salary_min is not None:
+                clauses.append(f'{upper} >= ?')
+                params.append(salary_min)
+
+        skills = _skill_filters(args)
+        if skills:
+            if not self.has_skills:
+                raise ValueError('Skill filters are not available for this dataset')
+            for name in skills:
+                clauses.append('_row IN (SELECT _row FROM record_skills WHERE skill = ?)')
+                params.append(name)
+
+        for key, column in self.sorted_columns.items():
+            low = parse_float_arg(args, f'{key}_from')
+            high = parse_float_arg(args, f'{key}_to')
+            if low is None and high is None:
+                continue
+            if low is not None and high is not None and low > high:
+                raise ValueError(f"'{key}_from' must not be greater than '{key}_to'")
+            clauses.append(f'{_quote(column)} IS NOT NULL')
+            if low is not None:
+                clauses.append(f'{_quote(column)} >= ?')
+                params.append(low)
+            if high is not None:
+                clauses.append(f'{_quote(column)} <= ?')
+                params.append(high)
+
+        return ' AND '.join(clauses), params
+
+    def count(self, args: Mapping[str, str]) -> int:
+        where, params = self.where(args)
+        return self._fetch(f'SELECT COUNT(*) FROM salaries WHERE {where}', params)[0][0]
+
+    def rows(self, args: Mapping[str, str]) -> Tuple[List[dict], int]:
+        """One page of filtered records plus the total match count (sort/order/offset/limit).
+
+        Pages hold PAGE_ROWS records without a limit and at most MAX_PAGE_ROWS.
+        """
+        where, params = self.where(args)
+        sort_key = args.get('sort')
+        order = (args.get('order') or 'asc').lower()
+        if order not in ('asc', 'desc'):
+            raise ValueError("Invalid value for 'order': expected 'asc' or 'desc'")
+        if not sort_key:
+            order_by = '_row'
+        elif sort_key not in self.sorted_columns:
+            available = ', '.join(sorted(self.sorted_columns)) or 'none'
+            raise ValueError(f"Cannot sort by '{sort_key}' (available: {available})")
+        elif order == 'desc':
+            # Mirrors the in-memory path: valid values reversed (ties too), missing last in load order
+            column = _quote(self.sorted_columns[sort_key])
+            order_by = (f'{column} IS NULL, {column} DESC, '
+                        f'CASE WHEN {column} IS NULL THEN _row ELSE -_row END')
+        else:
+            column = _quote(self.sorted_columns[sort_key])
+            order_by = f'{column} IS NULL, {column}, _row'
+
+        offset = parse_int_arg(args, 'offset') or 0
+        limit = parse_int_arg(args, 'limit')
+        limit = PAGE_ROWS if limit is None else min(limit, MAX_PAGE_ROWS)
+        page = f' LIMIT {limit} OFFSET {offset}'
+
+        total = self._fetch(f'SELECT COUNT(*) FROM salaries WHERE {where}', params)[0][0]
+        selected = ', '.join(_quote(c) for c in self.columns)
+        records = self._fetch(f'SELECT {selected} FROM salaries WHERE {where} '
+                              f'ORDER BY {order_by}{page}', params)
+        return [dict(zip(self.columns, record)) for record in records], total
+
+    def _sketch_filters(self, args: Mapping[str, str], dimensions: List[str],
+                        value: str) -> Optional[Dict[str, str]]:
+        """The filters as {column: value} when the sketches can answer the query, else None."""
+        if any(args.get(param) for param in range_filter_params(self)) or _skill_filters(args):
+            return None
+        filters = {column: args.get(param) for param, column in EQUALITY_FILTERS.items()
+                   if args.get(param) and column in self.dimensions}
+        return filters if self._sketches_cover(filters, dimensions, value) else None
+
+    def _sketches_cover(self, filters: Mapping[str, str], dimensions: List[str],
+                        value: str) -> bool:
+        return (self.sketches is not None and value == self.sketches.value_column
+                and set(filters) | set(dimensions) <= self.sketch_dimensions)
+
+    def distinct(self, column: str) -> list:
+        """Distinct values of a column in order of first appearance (like Series.unique())."""
+        if self.sketches is not None and column in self.sketch_dimensions and \
+                self.column_stats[self.sketches.value_column]['nulls'] == 0:
+            # Every row is in a sketch group, and groups were allocated in row order
+            position = self.sketches.dimensions.index(column)
+            return list(dict.fromkeys(key[position] for key in self.sketches.keys))
+        return [value for value, in self._fetch(
+            f'SELECT {_quote(column)} FROM salaries WHERE _row < ? '
+            f'GROUP BY {_quote(column)} ORDER BY MIN(_row)', [self.row_count])]
+
+    def value_range(self, low_column: str, high_column: str) -> Tuple[float, float]:
+        if low_column in self.column_stats and high_column in self.column_stats:
+            return self.column_stats[low_column]['min'], self.column_stats[high_column]['max']
+        return self._fetch(f'SELECT MIN({_quote(low_column)}), MAX({_quote(high_column)}) '
+                           f'FROM salaries WHERE _row < ?', [self.row_count])[0]
+
+    def aggregate(self, args: Mapping[str, str], dimensions: List[str], aggregates: List[str],
+                  value: str) -> Dict[str, np.ndarray]:
+        """group_aggregate() pushed down: same columns, same group order."""
+        where, params = self.where(args)
+        filters = self._sketch_filters(args, dimensions, value)
+        if filters is not None and set(aggregates) <= MOMENT_AGGREGATES:
+            summary = self.sketches.query(filters, dimensions, [])
+            columns = {dimension: summary[dimension] for dimension in dimensions}
+            for name in aggregates:
+                columns[name] = (summary['mean'] * summary['count'] if name == 'sum'
+                                 else summary[name])
+            return columns
+        quantiles = {name: 0.5 if name == 'median' else float(name[1:]) / 100
+                     for name in aggregates if name == 'median' or name.startswith('p')}
+        return self._group_stats(where, params, dimensions, value, aggregates, quantiles)
+
+    def group_summary(self, filters: Mapping[str, str], group_by: List[str],
+                      fractions: List[float], value: str) -> Dict[str, np.ndarray]:
+        """GroupSketches.query() layout: from the stored sketches when they cover the
+        query (approximate quantiles, like the in-memory path), else exactly in the engine."""
+        if self._sketches_cover(filters, group_by, value):
+            return self.sketches.query(filters, group_by, fractions)
+        clauses = [f'_row < {self.row_count}'] + [f'{_quote(column)} = ?' for column in filters]
+        names = [f'p{fraction * 100:g}' for fraction in fractions]
+        aggregates = ['count', 'mean', 'std', 'min', 'max'] + names
+        return self._group_stats(' AND '.join(clauses), list(filters.values()),
+                                 group_by, value, aggregates, dict(zip(names, fractions)))
+
+    def median(self, value: str) -> float:
+        """Exact median of a column, e.g. for the summary, where sketches would be approximate."""
+        stats = self._group_stats(f'_row < {self.row_count}', [], [], value, ['p50'],
+                                  {'p50': 0.5})
+        return float(stats['p50'][0]) if len(stats['p50']) else float('nan')
+
+    def _group_stats(self, where: str, params: list, dimensions: List[str], value: str,
+                     aggregates: List[str], quantiles: Dict[str, float]) -> Dict[str, np.ndarray]:
+        keys = ', '.join(_quote(d) for d in dimensions)
+        selected = keys + ', ' if keys else ''
+        partition = f'PARTITION BY {keys}' if dimensions else ''
+        group = f'GROUP BY {keys} ORDER BY {keys}' if dimensions else ''
+        v = _quote(value)
+        rows = f'FROM salaries WHERE {where} AND {v} IS NOT NULL'
+
+        # Two-pass variance (deviations from the group mean), as in group_aggregate()
+        deviations = '0'
+        source = rows
+        if 'std' in aggregates:
+            source = f'FROM (SELECT {selected}{v}, AVG({v}) OVER ({partition}) AS m {rows}) w'
+            deviations = f'SUM(({v} - m) * ({v} - m))'
+        stats = self._fetch(f'SELECT {selected}COUNT(*), SUM({v}), MIN({v}), MAX({v}), '
+                            f'{deviations} {source} {group}', params)
+        stats = [row for row in stats if row[len(dimensions)]]  # no rows -> no group
+        width = len(dimensions)
+        group_keys = [tuple(row[:width]) for row in stats]
+        counts = np.array([row[width] for row in stats], dtype=np.int64)
+        sums = np.array([row[width + 1] for row in stats], dtype=float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / counts
+            squares = np.array([row[width + 4] for row in stats], dtype=float)
+            stds = np.sqrt(np.where(counts > 1, squares / (counts - 1), np.nan))
+
+        values = {}
+        if quantiles and stats:
+            # Only the rows around each requested rank: rn - 1 in (pos - 1, pos + 1]
+            conditions = ' OR '.join('(rn - 1 > (n - 1) * ? - 1 AND rn - 1 <= (n - 1) * ? + 1)'
+                                     for _ in quantiles)
+            fractions = [f for fraction in quantiles.values() for f in (fraction, fraction)]
+            ranked = (f'SELECT {selected}{v} AS v, '
+                      f'ROW_NUMBER() OVER ({partition} ORDER BY {v}) AS rn, '
+                      f'COUNT(*) OVER ({partition}) AS n {rows}')
+            for row in self._fetch(f'SELECT {selected}rn, v FROM ({ranked}) w WHERE {conditions}',
+                                   params + fractions):
+                values[(tuple(row[:width]), row[width])] = row[width + 1]
+
+        columns = {}
+        for i, dimension in enumerate(dimensions):
+            columns[dimension] = np.array([key[i] for key in group_keys], dtype=object)
+        for name in aggregates:
+            if name == 'count':
+                columns[name] = counts
+            elif name == 'sum':
+                columns[name] = sums
+            elif name == 'mean':
+                columns[name] = means
+            elif name == 'std':
+                columns[name] = stds
+            elif name == 'min':
+                columns[name] = np.array([row[width + 2] for row in stats], dtype=float)
+            elif name == 'max':
+                columns[name] = np.array([row[width + 3] for row in stats], dtype=float)
+            else:
+                columns[name] = np.array([
+                    self._interpolate(values, key, count, quantiles[name])
+                    for key, count in zip(group_keys, counts)], dtype=float)
+        return columns
+
+    @staticmethod
+    def _interpolate(values: dict, key: tuple, count: int, fraction: float) -> float:
+        rank = (count - 1) * fraction
+        low, high = values[(key, math.floor(rank) + 1)], values[(key, math.ceil(rank) + 1)]
+        return low + (high - low) * (rank - math.floor(rank))
+
+    def rank_offers(self, offers: List[dict]) -> Dict[str, np.ndarray]:
+        """queries.rank_offers() as one batched join per RANK_BATCH offers."""
+        if 'salary' not in self.sorted_columns or \
+                not all(d in self.dimensions for d in RANK_GROUPINGS['role']):
+            raise ValueError('Salary ranks are not available for this dataset')
+        frame, salaries, levels, by_level = parse_offers(offers)
+        if by_level.any() and not all(d in self.dimensions for d in RANK_GROUPINGS['experience']):
+            raise ValueError('Experience levels are not available for this dataset')
+
+        v = _quote(self.sorted_columns['salary'])
+        country, role = (_quote(d) for d in RANK_GROUPINGS['role'])
+        level_match = (f'AND (o.level IS NULL OR s.{_quote("Experience_Level")} = o.level)'
+                       if by_level.any() else '')
+        offers_rows = [(i, str(c), str(r), str(level) if has_level else None, float(salary))
+                       for i, (c, r, level, has_level, salary) in enumerate(zip(
+                           frame['country'], frame['role'], levels, by_level, salaries))]
+
+        result = {
+            'group_size': np.zeros(len(frame), dtype=np.int64),
+            'below': np.zeros(len(frame), dtype=np.int64),
+            'equal': np.zeros(len(frame), dtype=np.int64),
+            'percentile': np.full(len(frame), np.nan),
+        }
+        for start in range(0, len(offers_rows), RANK_BATCH):
+            batch = offers_rows[start:start + RANK_BATCH]
+            values = ', '.join(['(?, ?, ?, ?, ?)'] * len(batch))
+            sql = (f'WITH o(i, country, role, level, salary) AS (VALUES {values}) '
+                   f'SELECT o.i, COUNT(s._row), '
+                   f'SUM(CASE WHEN s.{v} < o.salary THEN 1 ELSE 0 END), '
+                   f'SUM(CASE WHEN s.{v} = o.salary THEN 1 ELSE 0 END) '
+                   f'FROM o LEFT JOIN salaries s ON s.{country} = o.country AND s.{role} = o.role '
+                   f'{level_match} AND s.{v} IS NOT NULL AND s._row < {self.row_count} '
+                   f'GROUP BY o.i')
+            for i, size, below, equal in self._fetch(sql, [p for row in batch for p in row]):
+                result['group_size'][i] = size
+                result['below'][i] = below or 0
+                result['equal'][i] = equal or 0
+        found = result['group_size'] > 0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result['percentile'] = np.where(
+                found, 100.0 * (result['below'] + 0.5 * result['equal']) / result['group_size'],
+                np.nan)
+        return result
+
+
+def choose_backend(salary_data: Optional[pd.DataFrame], threshold: Optional[int],
+                   size_bytes: Optional[int] = None) -> str:
+    """'sql' when a dataset is at least `threshold` bytes (None disables), else 'memory'."""
+    if threshold is None:
+        return 'memory'
+    if size_bytes is None:
+        size_bytes = int(salary_data.memory_usage(deep=True).sum())
+    return 'sql' if size_bytes >= threshold else 'memory'
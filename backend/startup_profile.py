@@ -0,0 +1,112 @@
+"""Startup-time breakdown of the backend.
+
+Imports app.py in a fresh interpreter with `python -X importtime` and reports
+how long each module took to import, how long the whole import took (the time
+until the worker can answer /api/status), how long each readiness step took
+after that (the time until /api/ready turns 200) and which modules those steps
+imported on first use:
+
+    python startup_profile.py                      # table on stdout
+    python startup_profile.py --json startup.json  # also write the full breakdown
+    python startup_profile.py --budget 1.5         # exit 1 if the import is slower
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Seconds app.py may take to import in a cold interpreter (dataset loading runs after it)
+IMPORT_BUDGET_SECONDS = float(os.environ.get('STARTUP_IMPORT_BUDGET_SECONDS', 1.5))
+
+# Separates the import of app.py from the startup steps in the child's stderr
+_MARKER = '--- startup steps ---'
+
+_CHILD = f"""
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter() - started
+loaded = sorted(sys.modules)
+print({_MARKER!r}, file=sys.stderr, flush=True)
+app.readiness.run()
+print(json.dumps({{'import_seconds': imported,
+                  'ready_seconds': time.perf_counter() - started,
+                  'readiness': app.readiness.describe(),
+                  'loaded': loaded}}))
+"""
+
+
+def parse_importtime(stderr: str, depth: int) -> List[dict]:
+    """Modules imported at nesting `depth` and their own/cumulative import time.
+
+    Each `-X importtime` line is "import time: self | cumulative | name", with
+    the name indented two spaces per nesting level below the importing module.
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or line.endswith('imported package'):
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if (len(name) - len(name.lstrip(' ')) - 1) // 2 == depth:
+            modules.append({'module': name.strip(),
+                            'self_seconds': int(self_us) / 1e6,
+                            'cumulative_seconds': int(cumulative_us) / 1e6})
+    return sorted(modules, key=lambda module: module['cumulative_seconds'], reverse=True)
+
+
+def profile_startup(env: Optional[Dict[str, str]] = None) -> dict:
+    """Import app.py in a child interpreter and return its startup breakdown."""
+    child_env = {**os.environ, 'STARTUP_MODE': 'manual', **(env or {})}
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', _CHILD],
+                            cwd=BACKEND_DIR, env=child_env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f'Importing app.py failed:\n{result.stderr[-2000:]}')
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    imports, _, steps = result.stderr.partition(_MARKER)
+    report['modules'] = parse_importtime(imports, depth=1)  # imported by app.py itself
+    report['deferred_modules'] = parse_importtime(steps, depth=0)
+    return report
+
+
+def _print_report(report: dict, top: int):
+    print(f"import app: {report['import_seconds']:.3f}s   "
+          f"ready: {report['ready_seconds']:.3f}s")
+    print('\nslowest imports (cumulative / self, seconds)')
+    for module in report['modules'][:top]:
+        print(f"  {module['cumulative_seconds']:8.3f} {module['self_seconds']:8.3f}  "
+              f"{module['module']}")
+    print('\nstartup steps (seconds)')
+    for step in report['readiness']['steps']:
+        print(f"  {step['seconds'] or 0:8.3f}  {step['name']} ({step['state']})")
+    print('\nimported by the startup steps (cumulative seconds)')
+    for module in report['deferred_modules'][:top]:
+        print(f"  {module['cumulative_seconds']:8.3f}  {module['module']}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--json', help='also write the full breakdown to this file')
+    parser.add_argument('--top', type=int, default=15, help='number of imports to list')
+    parser.add_argument('--budget', type=float, default=IMPORT_BUDGET_SECONDS,
+                        help='fail when importing app.py takes longer (seconds)')
+    args = parser.parse_args(argv)
+
+    report = profile_startup()
+    report['budget_seconds'] = args.budget
+    _print_report(report, args.top)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as handle:
+            json.dump({key: value for key, value in report.items() if key != 'loaded'},
+                      handle, indent=2)
+    if report['import_seconds'] > args.budget:
+        print(f"\nimport took longer than the {args.budget:.2f}s budget", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""In-memory manifest of the built frontend (frontend/dist).
+
+The directory is scanned once: every file is read into memory with its ETag,
+and pre-built .gz/.br siblings are used as its compressed variants. Files
+without siblings are compressed the first time a client accepts an encoding
+(see compressed.py). Serving a request is then a dictionary lookup, with no
+filesystem access.
+
+Vite puts content-hashed bundles in assets/, so those are cacheable forever
+(`immutable`). index.html and other unhashed files are revalidated through
+their ETag.
+
+Precompress a build so no worker has to compress anything:
+
+    python static_assets.py ../frontend/dist
+"""
+import mimetypes
+import os
+import sys
+from typing import Dict, Optional
+
+from compressed import EncodedPayload, _compress, available_encodings
+
+SIBLINGS = {'.br': 'br', '.gz': 'gzip'}
+IMMUTABLE_PREFIX = 'assets/'
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+# Content types worth compressing (images, fonts and archives already are)
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml',
+                      'application/xml', 'application/manifest+json')
+
+
+def _compressible(mimetype: str) -> bool:
+    return mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+class StaticAsset(EncodedPayload):
+    def __init__(self, body: bytes, mimetype: str, variants: Dict[str, bytes],
+                 cache_control: str):
+        super().__init__(body, mimetype, variants, compressible=_compressible(mimetype))
+        self.cache_control = cache_control
+
+
+class StaticManifest:
+    """Files under `root` by URL path, loaded once."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.assets: Dict[str, StaticAsset] = {}
+        if os.path.isdir(root):
+            self._scan()
+
+    def _scan(self):
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if os.path.splitext(name)[1] in SIBLINGS:
+                    continue
+                path = os.path.join(directory, name)
+                url_path = os.path.relpath(path, self.root).replace(os.sep, '/')
+                self.assets[url_path] = self._load(path, url_path)
+
+    @staticmethod
+    def _load(path: str, url_path: str) -> StaticAsset:
+        with open(path, 'rb') as handle:
+            body = handle.read()
+        variants = {}
+        for suffix, encoding in SIBLINGS.items():
+            if os.path.exists(path + suffix):
+                with open(path + suffix, 'rb') as handle:
+                    variants[encoding] = handle.read()
+        mimetype = mimetypes.guess_type(url_path)[0] or 'application/octet-stream'
+        cache_control = (IMMUTABLE_CACHE_CONTROL if url_path.startswith(IMMUTABLE_PREFIX)
+                         else REVALIDATE_CACHE_CONTROL)
+        return StaticAsset(body, mimetype, variants, cache_control)
+
+    def lookup(self, url_path: str) -> Optional[StaticAsset]:
+        return self.assets.get(url_path)
+
+    @property
+    def index(self) -> Optional[StaticAsset]:
+        return self.assets.get('index.html')
+
+    @property
+    def nbytes(self) -> int:
+        return sum(asset.nbytes for asset in self.assets.values())
+
+
+def precompress(root: str) -> int:
+    """Write .gz/.br siblings next to every compressible file under `root`; returns the count."""
+    written = 0
+    for url_path, asset in StaticManifest(root).assets.items():
+        if not asset.compressible:
+            continue
+        for suffix, encoding in SIBLINGS.items():
+            if encoding not in available_encodings():
+                continue
+            with open(os.path.join(root, url_path) + suffix, 'wb') as handle:
+                handle.write(_compress(asset.body, encoding))
+            written += 1
+    return written
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        sys.exit(f'usage: {sys.argv[0]} <frontend dist directory>')
+    print(f'wrote {precompress(sys.argv[1])} compressed files')
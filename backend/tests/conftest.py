@@ -0,0 +1,27 @@
+import os
+import sys
+import importlib.util
+
+import pytest
+
+# Make the backend modules importable no matter where pytest is started from
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """The backend app, loaded once per test session (loading parses the BMW workbook)."""
+    os.environ['DATASET_STORE_DIR'] = str(tmp_path_factory.mktemp('datasets'))
+    spec = importlib.util.spec_from_file_location('app_module', os.path.join(BACKEND_DIR, 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.readiness.wait(timeout=300)  # the dataset loads on a background thread
+    module.app.config['UPLOAD_FOLDER'] = str(tmp_path_factory.mktemp('uploads'))
+    return module
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
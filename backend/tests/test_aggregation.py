@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from aggregation import group_aggregate, select_top
+from indexes import DatasetIndexes
+
+
+def _frame(rows=2000):
+    rng = np.random.default_rng(3)
+    return pd.DataFrame({
+        'Country': rng.choice(['Germany', 'Poland', 'India'], rows),
+        'Role_Name': rng.choice(['DevOps Engineer', 'Cloud Engineer', 'SRE'], rows),
+        'Team_Setup': 'Hybrid',
+        'Salary_Avg_USD': rng.normal(60000, 15000, rows),
+    })
+
+
+def test_group_aggregate_matches_pandas():
+    frame = _frame()
+    indexes = DatasetIndexes(frame)
+    positions = np.flatnonzero(frame['Country'].to_numpy() != 'India')
+
+    columns = group_aggregate(indexes, frame['Salary_Avg_USD'].to_numpy(), positions,
+                              ['Country', 'Role_Name'],
+                              ['count', 'mean', 'min', 'max', 'std', 'median', 'p90'])
+
+    expected = (frame.iloc[positions].groupby(['Country', 'Role_Name'])['Salary_Avg_USD']
+                .agg(['count', 'mean', 'min', 'max', 'std', 'median',
+                      lambda s: s.quantile(0.9)]))
+    assert list(zip(columns['Country'], columns['Role_Name'])) == list(expected.index)
+    np.testing.assert_array_equal(columns['count'], expected['count'])
+    for name in ['mean', 'min', 'max', 'std', 'median']:
+        np.testing.assert_allclose(columns[name], expected[name])
+    np.testing.assert_allclose(columns['p90'], expected['<lambda_0>'])
+
+
+def test_aggregate_endpoint(client):
+    resp = client.get('/api/data/aggregate?dimensions=Country,Experience_Level'
+                      '&aggregates=count,mean,p75&role=DevOps Engineer')
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data['groups'] == len(data['columns']['Country']) > 0
+    assert set(data['columns']) == {'Country', 'Experience_Level', 'count', 'mean', 'p75'}
+
+    by_country = client.get('/api/data/by-country').get_json()
+    assert {row['country'] for row in by_country} == {'Germany', 'Hungary', 'India', 'Poland'}
+
+    assert client.get('/api/data/aggregate?aggregates=p101').status_code == 400
+
+
+def test_select_top_respects_min_count_and_direction():
+    columns = {
+        'Country': np.array(['A', 'B', 'C', 'D']),
+        'count': np.array([5, 1, 7, 3]),
+        'mean': np.array([10.0, 99.0, 30.0, np.nan]),
+    }
+    top = select_top(columns, 'mean', 2, descending=True, min_count=2)
+    assert top['Country'].tolist() == ['C', 'A']
+    bottom = select_top(columns, 'mean', 5, descending=False)
+    assert bottom['Country'].tolist() == ['A', 'C', 'B']
+
+
+def test_top_endpoint_is_cached_per_version(client, app_module):
+    cache = app_module.datasets.get('default').indexes.cache
+    first = client.get('/api/data/top?n=3&metric=median&min_count=50').get_json()
+    hits = cache.hits
+    second = client.get('/api/data/top?min_count=50&metric=median&n=3').get_json()
+    assert first == second and cache.hits == hits + 1
+    assert first['groups'] == 3
+    assert first['columns']['median'] == sorted(first['columns']['median'], reverse=True)
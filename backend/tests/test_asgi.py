@@ -0,0 +1,82 @@
+import asyncio
+import json
+from urllib.parse import unquote
+
+from flask import Flask, Response
+
+from asgi_adapter import WsgiToAsgi
+
+
+def _call(application, method, path, body=b'', headers=(), chunk=None):
+    """Run one HTTP request through `application`; returns (status, headers, body messages)."""
+    path, _, query = path.partition('?')
+    scope = {'type': 'http', 'method': method, 'path': unquote(path), 'raw_path': path.encode(),
+             'query_string': query.encode(),
+             'http_version': '1.1', 'scheme': 'http', 'server': ('testserver', 80),
+             'client': ('127.0.0.1', 5000), 'root_path': '',
+             'headers': [(name.encode(), value.encode()) for name, value in headers]}
+    chunk = chunk or max(len(body), 1)
+    messages = [{'type': 'http.request', 'body': body[start:start + chunk],
+                 'more_body': start + chunk < len(body)}
+                for start in range(0, max(len(body), 1), chunk)]
+    sent = []
+
+    async def receive():
+        await asyncio.sleep(0)  # the body arrives in pieces
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    start, bodies = sent[0], sent[1:]
+    assert start['type'] == 'http.response.start' and not bodies[-1].get('more_body', False)
+    return start['status'], dict(start['headers']), [m['body'] for m in bodies if m['body']]
+
+
+def test_api_routes_through_asgi(app_module):
+    application = WsgiToAsgi(app_module.app, threads=2)
+    status, headers, bodies = _call(application, 'GET', '/api/data/top?n=3')
+    assert status == 200 and headers[b'content-type'] == b'application/json'
+    assert json.loads(b''.join(bodies))['groups'] == 3
+
+    csv = ('Country,Role_Name,Salary_Min_USD,Salary_Max_USD\n'
+           + 'Germany,DevOps Engineer,60000,80000\n' * 200).encode()
+    body = (b'--xyz\r\nContent-Disposition: form-data; name="file"; filename="asgi.csv"\r\n'
+            b'Content-Type: text/csv\r\n\r\n' + csv + b'\r\n--xyz--\r\n')
+    status, _, bodies = _call(application, 'POST', '/api/upload', body, chunk=1000, headers=[
+        ('content-type', 'multipart/form-data; boundary=xyz'),
+        ('content-length', str(len(body)))])
+    assert status == 200
+    assert json.loads(b''.join(bodies))['records'] == 200
+
+
+def test_streams_chunks_and_rejects_large_bodies():
+    app = Flask(__name__)
+
+    @app.route('/stream', methods=['GET', 'POST'])
+    def stream():
+        return Response((f'part{i};' for i in range(3)), mimetype='text/plain')
+
+    application = WsgiToAsgi(app, threads=1, max_body_bytes=10)
+    status, _, bodies = _call(application, 'GET', '/stream')
+    assert status == 200 and bodies == [b'part0;', b'part1;', b'part2;']
+
+    status, _, _ = _call(application, 'POST', '/stream', b'x' * 11,
+                         headers=[('content-length', '11')])
+    assert status == 413
+    status, _, _ = _call(application, 'POST', '/stream', b'x' * 11, chunk=4)  # no length given
+    assert status == 413
+
+
+def test_routes_on_the_decoded_path():
+    app = Flask(__name__)
+
+    @app.route('/items/<name>')
+    def item(name):
+        return name
+
+    application = WsgiToAsgi(app, threads=1)
+    for raw, name in (('/items/two%20words', 'two words'), ('/items/caf%C3%A9', 'café')):
+        status, _, bodies = _call(application, 'GET', raw)
+        assert status == 200 and b''.join(bodies).decode('utf-8') == name
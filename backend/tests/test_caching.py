@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from caching import COALESCED_RETRY_AFTER, ResultCache
+from compressed import EncodedPayload
+from executor import Overloaded
+
+
+def _stampede(cache, key, compute, callers=8):
+    """Start `callers` concurrent get_or_compute calls and return their futures."""
+    pool = ThreadPoolExecutor(callers)
+    futures = [pool.submit(cache.get_or_compute, key, compute) for _ in range(callers)]
+    pool.shutdown(wait=False)
+    return futures
+
+
+def test_concurrent_misses_share_one_computation():
+    cache = ResultCache()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {'rows': 42}
+
+    futures = _stampede(cache, ('forecast',), compute)
+    started.wait(5)
+    while cache.coalesced < len(futures) - 1:  # every other caller is now waiting
+        time.sleep(0.01)
+    release.set()
+
+    results = [future.result(5) for future in futures]
+    assert len(calls) == 1 and all(result is results[0] for result in results)
+    assert cache.stats() == {'entries': 1, 'bytes': 0, 'hits': 0, 'misses': 1, 'coalesced': 7}
+    assert cache.get_or_compute(('forecast',), compute) is results[0] and cache.hits == 1
+
+
+def test_waiters_share_the_failure_and_nothing_is_cached():
+    cache = ResultCache()
+    release = threading.Event()
+
+    def compute():
+        release.wait(5)
+        raise ValueError('bad parameter')
+
+    futures = _stampede(cache, 'key', compute, callers=4)
+    while cache.coalesced < 3:
+        time.sleep(0.01)
+    release.set()
+
+    for future in futures:
+        with pytest.raises(ValueError, match='bad parameter'):
+            future.result(5)
+    assert len(cache) == 0
+    assert cache.get_or_compute('key', lambda: 'ok') == 'ok'
+
+
+def test_payload_variants_count_against_the_byte_bound():
+    cache = ResultCache(max_bytes=4000)
+    first = cache.get_or_compute('first', lambda: EncodedPayload(os.urandom(1024)))
+    second = cache.get_or_compute('second', lambda: EncodedPayload(os.urandom(1024)))
+    assert cache.nbytes == 2048
+
+    first.variant('gzip')  # compressed after it was stored: still counted
+    assert cache.nbytes == first.nbytes + second.nbytes > 3000
+    # Incompressible bodies roughly double: the least recently used entry goes
+    second.variant('gzip')
+    second.variant('br')
+    assert cache.get('first') is None and cache.get('second') is second
+    assert cache.nbytes == second.nbytes
+
+
+def test_waiters_get_their_own_exception_and_give_up_after_the_timeout():
+    cache = ResultCache(wait_timeout=0.2)
+    release = threading.Event()
+
+    def compute():
+        release.wait(5)
+        raise Overloaded('forecast', 3)
+
+    futures = _stampede(cache, 'key', compute, callers=3)
+    while cache.coalesced < 2:
+        time.sleep(0.01)
+    time.sleep(0.5)  # the waiters' timeout passes while the leader still computes
+    release.set()
+    errors = [future.exception(5) for future in futures]
+    assert all(isinstance(error, Overloaded) for error in errors)
+    assert sorted(error.work_class for error in errors) == ['coalesced', 'coalesced', 'forecast']
+
+    release.clear()
+    futures = _stampede(cache, 'key', compute, callers=3)
+    while cache.coalesced < 4:
+        time.sleep(0.01)
+    release.set()
+    errors = [future.exception(5) for future in futures]
+    assert len({id(error) for error in errors}) == 3
+    assert all(error.work_class == 'forecast' and error.retry_after == 3 for error in errors)
+    original = next(error for error in errors if error.__cause__ is None)
+    assert all(error.__cause__ is original for error in errors if error is not original)
+
+
+def test_endpoint_answers_503_when_a_coalesced_wait_times_out(app_module, client, monkeypatch):
+    snapshot = app_module.datasets.get(app_module.DEFAULT_DATASET)
+    monkeypatch.setattr(snapshot.cache, 'wait_timeout', 0.1)
+    rows = app_module._salary_by_dimension_rows
+    entered, release = threading.Event(), threading.Event()
+
+    def slow_rows(*args):
+        entered.set()
+        release.wait(5)
+        return rows(*args)
+
+    monkeypatch.setattr(app_module, '_salary_by_dimension_rows', slow_rows)
+    url = '/api/data/by-country?role=SRE&experience_level=Senior'
+    leader = ThreadPoolExecutor(1).submit(app_module.app.test_client().get, url)
+    try:
+        assert entered.wait(5)
+        resp = client.get(url)
+        assert resp.status_code == 503
+        assert resp.headers['Retry-After'] == str(COALESCED_RETRY_AFTER)
+        assert resp.get_json()['work_class'] == 'coalesced'
+    finally:
+        release.set()
+    assert leader.result(5).status_code == 200
+    assert client.get(url).status_code == 200
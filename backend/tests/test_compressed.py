@@ -0,0 +1,69 @@
+import gzip
+import json
+
+import brotli
+
+import compressed
+from compressed import EncodedPayload, choose_encoding
+
+
+def test_choose_encoding_follows_accept_encoding():
+    assert choose_encoding('gzip, deflate, br, zstd') == 'br'
+    assert choose_encoding('gzip;q=1.0, br;q=0.5') == 'gzip'
+    assert choose_encoding('br;q=0, gzip') == 'gzip'
+    assert choose_encoding('*') == 'br'
+    assert choose_encoding('identity') is None and choose_encoding('') is None
+    assert choose_encoding('br', encodings=('gzip',)) is None
+
+
+def test_payload_compresses_each_encoding_once():
+    payload = EncodedPayload(b'{"rows": [1, 2, 3]}' * 100)
+    assert payload.variant('gzip') is payload.variant('gzip')
+    assert gzip.decompress(payload.variant('gzip')) == payload.body
+    assert brotli.decompress(payload.variant('br')) == payload.body
+    assert payload.nbytes > len(payload.body)
+
+
+def test_payload_moves_to_higher_levels_when_served_again(monkeypatch):
+    levels = []
+    monkeypatch.setattr(compressed, '_compress', lambda body, encoding, fast=False: (
+        levels.append((encoding, fast)) or f'{encoding}:{fast}'.encode()))
+    payload = EncodedPayload(b'x' * 1000)
+    served = [payload.variant('br') for _ in range(compressed.RECOMPRESS_AFTER + 1)]
+    assert served[0] == b'br:True' and served[-1] == b'br:False'
+    assert levels == [('br', True), ('br', False)]
+
+    payload.precompress()  # warmed: only what is not at the higher levels yet
+    assert levels[2:] == [('gzip', False)] and payload.variant('gzip') == b'gzip:False'
+
+
+def test_large_salary_pages_are_not_cached(client, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'SALARY_PAGE_CACHE_BYTES', 10_000)
+    cache = app_module.datasets.get('default').cache
+    assert client.get('/api/data/salaries?limit=1&offset=7').status_code == 200
+    assert client.get('/api/data/salaries?limit=500&offset=7').status_code == 200
+    cached = [key[1] for key in cache._entries if key[0] == 'salaries']
+    assert (('limit', '1'), ('offset', '7')) in cached
+    assert (('limit', '500'), ('offset', '7')) not in cached
+
+
+def test_cached_responses_are_precompressed(client):
+    plain = client.get('/api/data/salaries?limit=200')
+    assert plain.status_code == 200 and 'Content-Encoding' not in plain.headers
+
+    resp = client.get('/api/data/salaries?limit=200', headers={'Accept-Encoding': 'gzip, br'})
+    assert resp.headers['Content-Encoding'] == 'br'
+    assert resp.headers['Vary'] == 'Accept-Encoding'
+    assert json.loads(brotli.decompress(resp.data)) == plain.get_json()
+
+    resp = client.get('/api/data/salaries?limit=200', headers={'Accept-Encoding': 'gzip'})
+    assert resp.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(resp.data)) == plain.get_json()
+
+    again = client.get('/api/data/salaries?limit=200', headers={
+        'Accept-Encoding': 'gzip', 'If-None-Match': resp.headers['ETag']})
+    assert again.status_code == 304
+
+    chart = client.get('/api/charts/heatmap', headers={'Accept-Encoding': 'gzip'})
+    assert chart.headers['Content-Encoding'] == 'gzip'
+    assert 'data' in json.loads(gzip.decompress(chart.data))
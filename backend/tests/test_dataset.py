@@ -0,0 +1,49 @@
+import threading
+
+import pandas as pd
+
+from dataset import SnapshotStore
+
+
+def _frame(salary):
+    return pd.DataFrame({'Country': ['Germany', 'Poland'], 'Role_Name': ['Dev', 'Dev'],
+                         'Salary_Avg_USD': [salary, salary]})
+
+
+def test_pinned_snapshot_survives_publish():
+    store = SnapshotStore()
+    assert store.current() is None
+    first = store.publish(_frame(1.0), pd.DataFrame(), pd.DataFrame(), 'test')
+    pinned = store.current()
+    second = store.publish(_frame(2.0), pd.DataFrame(), pd.DataFrame(), 'test')
+
+    assert (first.version, second.version) == (1, 2)
+    assert store.current() is second
+    assert pinned is first and pinned.salary_data['Salary_Avg_USD'].tolist() == [1.0, 1.0]
+    assert pinned.indexes.row_count == 2
+
+
+def test_readers_never_see_mixed_snapshots():
+    store = SnapshotStore()
+    store.publish(_frame(0.0), pd.DataFrame(), pd.DataFrame(), 'test')
+    mismatches = []
+    done = threading.Event()
+
+    def read():
+        while not done.is_set():
+            snapshot = store.current()
+            # Every table and index in a snapshot belongs to the same publication
+            salary = snapshot.salary_data['Salary_Avg_USD'].iloc[0]
+            if salary != snapshot.version - 1 or snapshot.indexes.row_count != snapshot.records:
+                mismatches.append(snapshot.version)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for version in range(1, 30):
+        store.publish(_frame(float(version)), pd.DataFrame(), pd.DataFrame(), 'test')
+    done.set()
+    for reader in readers:
+        reader.join()
+
+    assert not mismatches and store.current().version == 30
@@ -0,0 +1,52 @@
+import io
+
+import numpy as np
+
+from diff import diff_groups
+
+
+def _groups(countries, counts, means):
+    return {'Country': np.array(countries, dtype=object), 'count': np.array(counts),
+            'mean': np.array(means, dtype=float), 'median': np.array(means, dtype=float)}
+
+
+def test_diff_groups_joins_on_keys():
+    base = _groups(['Germany', 'India', 'Poland'], [10, 5, 8], [70.0, 20.0, 50.0])
+    target = _groups(['Hungary', 'Poland', 'Germany'], [4, 8, 12], [45.0, 56.0, 69.0])
+    diff = diff_groups(base, target, n=1)
+
+    assert diff['dimensions'] == ['Country']
+    assert diff['changed']['Country'].tolist() == ['Poland', 'Germany']
+    assert diff['changed']['count_delta'].tolist() == [0, 2]
+    assert diff['changed']['mean_delta'].tolist() == [6.0, -1.0]
+    assert diff['appeared']['Country'].tolist() == ['Hungary']
+    assert diff['disappeared']['Country'].tolist() == ['India']
+    assert diff['movers']['Country'].tolist() == ['Poland']
+    assert diff_groups(base, target, min_count=9)['movers']['Country'].tolist() == ['Germany']
+
+
+def test_diff_endpoint_between_versions(client):
+    csv = 'Role_Name,Country,Team_Setup,Salary_Min_USD,Salary_Max_USD,Salary_Avg_USD\n'
+    first = client.post('/api/upload', data={'file': (io.BytesIO(
+        (csv + 'Dev,Germany,Remote,1,3,2\nDev,Poland,Remote,4,6,5\n').encode()), 'week1.csv')})
+    dataset_id = first.get_json()['dataset_id']
+    client.post(f'/api/upload?dataset={dataset_id}', data={'mode': 'append', 'file': (
+        io.BytesIO((csv + 'Dev,Poland,Remote,6,8,7\nOps,India,Remote,7,9,8\n').encode()),
+        'week2.csv')})
+
+    body = client.get(f'/api/data/diff?dataset={dataset_id}&base=@1').get_json()
+    assert body['base'] == {'dataset_id': dataset_id, 'version': 1, 'groups': 2}
+    assert body['target']['version'] == 2
+    assert body['changed']['Country'] == ['Germany', 'Poland']
+    assert body['changed']['count_delta'] == [0, 1] and body['changed']['mean_delta'] == [0.0, 1.0]
+    assert body['appeared'] == {'Country': ['India'], 'Role_Name': ['Ops'], 'count': [1],
+                                'mean': [8.0], 'median': [8.0]}
+    assert body['movers']['Country'][0] == 'Poland'
+
+    same = client.get(f'/api/data/diff?base={dataset_id}&target={dataset_id}').get_json()
+    assert not any(same['changed']['mean_delta']) and not same['disappeared']['count']
+    assert client.get('/api/data/diff').status_code == 400
+    assert client.get(f'/api/data/diff?base={dataset_id}@7').status_code == 404
+    assert client.get('/api/data/diff?base=nosuchdataset').status_code == 404
+    # The default dataset groups by experience level too
+    assert client.get(f'/api/data/diff?base={dataset_id}').status_code == 400
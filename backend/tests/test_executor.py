@@ -0,0 +1,85 @@
+import threading
+import time
+
+import pytest
+
+from executor import Executor, Overloaded
+
+
+def test_slots_limit_concurrency_and_reject_after_queue_timeout():
+    executor = Executor(processes=0, retry_after=3)
+    executor.add_class('forecast', limit=1, queue_timeout=0.05)
+
+    with executor.slot('forecast'):
+        assert executor.describe()['classes']['forecast']['running'] == 1
+        with pytest.raises(Overloaded) as rejected:
+            executor.call('forecast', len, 'abc')
+        assert rejected.value.retry_after == 3
+    assert executor.call('forecast', len, 'abc') == 3
+
+    stats = executor.describe()['classes']['forecast']
+    assert stats['rejected'] == 1 and stats['completed'] == 2
+    assert stats['running'] == stats['queued'] == 0
+    assert stats['max_wait_seconds'] >= 0.05
+
+
+def test_call_runs_in_pool_process():
+    executor = Executor(processes=1)
+    executor.add_class('chart', limit=2, queue_timeout=5)
+    try:
+        assert executor.call('chart', pow, 2, 10) == 1024
+        assert executor.describe()['pool_started']
+    finally:
+        executor.shutdown()
+
+
+def test_overloaded_endpoint_answers_503(app_module, client, monkeypatch):
+    busy = Executor(processes=0, retry_after=7)
+    busy.add_class('aggregate', limit=1, queue_timeout=0.01)
+    monkeypatch.setattr(app_module, 'executor', busy)
+
+    held, release = threading.Event(), threading.Event()
+
+    def hold():
+        with busy.slot('aggregate'):
+            held.set()
+            release.wait(5)
+
+    worker = threading.Thread(target=hold)
+    worker.start()
+    held.wait(5)
+    try:
+        resp = client.get('/api/data/aggregate?dimensions=Country&aggregates=max&role=SRE')
+        assert resp.status_code == 503
+        assert resp.headers['Retry-After'] == '7'
+        assert resp.get_json()['work_class'] == 'aggregate'
+    finally:
+        release.set()
+        worker.join()
+    assert client.get('/api/data/aggregate?dimensions=Country&aggregates=max&role=SRE').status_code == 200
+    assert client.get('/api/executor').get_json()['classes']['aggregate']['rejected'] == 1
+
+
+def test_work_waiting_for_a_pool_process_is_rejected_at_the_queue_deadline():
+    executor = Executor(processes=1, retry_after=2)
+    executor.add_class('chart', limit=4, queue_timeout=0.5)
+    try:
+        assert executor.call('chart', pow, 2, 3) == 8  # start the pool process
+        results = []
+        # One call runs, the pool's call queue holds two more; the next one waits
+        busy = [threading.Thread(
+            target=lambda: results.append(executor.call('chart', time.sleep, 1)))
+            for _ in range(3)]
+        for thread in busy:
+            thread.start()
+        time.sleep(0.2)
+        with pytest.raises(Overloaded) as rejected:
+            executor.call('chart', pow, 2, 10)
+        assert rejected.value.work_class == 'chart' and rejected.value.retry_after == 2
+        for thread in busy:
+            thread.join()
+        assert results == [None, None, None]
+        assert executor.describe()['classes']['chart']['rejected'] == 1
+        assert executor.call('chart', pow, 2, 10) == 1024
+    finally:
+        executor.shutdown()
@@ -0,0 +1,148 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import indexes as indexes_module
+from indexes import DatasetIndexes, SalaryRangeIndex, SortedColumnIndex
+from utils import parse_salary_range
+
+
+def test_parse_salary_range_formats():
+    bounds = parse_salary_range(pd.Series([
+        '€45,000 - €52,500',
+        'Ft8,000K - Ft9,500K',
+        '₹6.6 Lakhs - ₹8.1 Lakhs',
+        'zł70,000 - zł83,200',
+        'not a range',
+    ]))
+    assert bounds['low'].tolist()[:4] == [45000.0, 8000000.0, 660000.0, 70000.0]
+    assert bounds['high'].tolist()[:4] == [52500.0, 9500000.0, 810000.0, 83200.0]
+    assert bounds.iloc[4].isna().all()
+
+
+def test_range_overlap_matches_scan():
+    rng = np.random.default_rng(7)
+    lower = rng.uniform(20000, 150000, 5000)
+    upper = lower + rng.uniform(0, 30000, 5000)
+    index = SalaryRangeIndex(lower, upper)
+
+    for low, high in [(60000, 80000), (-np.inf, 30000), (140000, np.inf), (75000, 75000)]:
+        expected = np.flatnonzero((lower <= high) & (upper >= low))
+        np.testing.assert_array_equal(index.overlapping(low, high), expected)
+
+
+def test_salaries_salary_range_filter(client):
+    resp = client.get('/api/data/salaries?salary_min=60000&salary_max=80000&country=Germany')
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data['count'] > 0
+    for row in data['data']:
+        assert row['Country'] == 'Germany'
+        assert row['Salary_Range_Min_EUR'] <= 80000 and row['Salary_Range_Max_EUR'] >= 60000
+
+    assert client.get('/api/data/salaries?salary_min=abc').status_code == 400
+
+
+def test_sorted_column_between_and_ordering():
+    values = np.array([5.0, np.nan, 1.0, 3.0, 3.0, 9.0])
+    index = SortedColumnIndex('Salary_EUR', values)
+
+    np.testing.assert_array_equal(index.between(3, 5), [0, 3, 4])
+    np.testing.assert_array_equal(index.ordered(np.arange(6)), [2, 3, 4, 0, 5, 1])
+    np.testing.assert_array_equal(index.ordered(np.array([0, 1, 2, 5]), descending=True),
+                                  [5, 0, 2, 1])
+
+
+def test_salaries_range_sort_and_pagination(client):
+    resp = client.get('/api/data/salaries?country=Poland&experience_from=5'
+                      '&salary_from=20000&salary_to=90000&sort=salary&order=desc&limit=100')
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data['count'] == 100 and data['total'] >= 100
+    salaries = [row['Salary_EUR'] for row in data['data']]
+    assert salaries == sorted(salaries, reverse=True)
+    assert all(row['Country'] == 'Poland' and row['Years_of_Experience'] >= 5
+               and 20000 <= row['Salary_EUR'] <= 90000 for row in data['data'])
+
+    second = client.get('/api/data/salaries?country=Poland&experience_from=5'
+                        '&salary_from=20000&salary_to=90000&sort=salary&order=desc'
+                        '&offset=100&limit=100').get_json()
+    assert second['data'][0]['Salary_EUR'] <= salaries[-1]
+
+    assert client.get('/api/data/salaries?sort=bogus').status_code == 400
+
+
+def test_salary_rank_batch_matches_scan(app_module):
+    snapshot = app_module.datasets.get('default')
+    salary_data = snapshot.salary_data
+    rank_index = snapshot.indexes.salary_ranks['role']
+    rng = np.random.default_rng(11)
+    countries = rng.choice(['Germany', 'Poland', 'Atlantis'], 300)
+    roles = rng.choice(salary_data['Role_Name'].unique(), 300)
+    salaries = rng.uniform(0, 150000, 300)
+
+    ranks = rank_index.lookup([countries, roles], salaries)
+
+    for i in range(300):
+        peers = salary_data.loc[(salary_data['Country'] == countries[i])
+                                & (salary_data['Role_Name'] == roles[i]), 'Salary_EUR']
+        assert ranks['group_size'][i] == len(peers)
+        assert ranks['below'][i] == (peers < salaries[i]).sum()
+
+
+def test_rank_endpoint(client):
+    resp = client.get('/api/data/rank?salary=60000&country=Germany&role=Cloud Engineer')
+    assert resp.status_code == 200
+    offer = resp.get_json()['data'][0]
+    assert 0 <= offer['percentile'] <= 100 and offer['peers'] > 0
+
+    resp = client.post('/api/data/rank', json={'offers': [
+        {'salary': 72000, 'country': 'Poland', 'role': 'Platform Engineer'},
+        {'salary': 72000, 'country': 'Poland', 'role': 'Platform Engineer',
+         'experience_level': 'Senior'},
+    ]})
+    data = resp.get_json()['data']
+    assert data[0]['peers'] > data[1]['peers'] > 0
+
+
+def test_extended_indexes_match_full_rebuild(app_module):
+    salary_data = app_module.datasets.get('default').salary_data
+    # Later rows bring values (a country, skills) the first part has never seen
+    head = salary_data[salary_data['Country'] != 'India'].iloc[:20000]
+    rest = salary_data.drop(head.index)
+    table = pd.concat([head, rest], ignore_index=True)
+    full = DatasetIndexes(table)
+    extended = DatasetIndexes(head.reset_index(drop=True)).extended(table, len(head))
+
+    for column, codes in full.dimensions.items():
+        np.testing.assert_array_equal(extended.dimensions[column].uniques, codes.uniques)
+        np.testing.assert_array_equal(extended.dimensions[column].codes, codes.codes)
+    for key, index in full.sorted_columns.items():
+        np.testing.assert_array_equal(extended.sorted_columns[key].order, index.order)
+        assert extended.sorted_columns[key].valid_count == index.valid_count
+    np.testing.assert_array_equal(extended.salary_range.positions, full.salary_range.positions)
+    np.testing.assert_array_equal(extended.skills.vocabulary, full.skills.vocabulary)
+    assert (extended.skills.matrix != full.skills.matrix).nnz == 0
+    for name in ('count', 'mean', 'max'):
+        np.testing.assert_allclose(extended.sketches.query({}, ['Country'], [])[name],
+                                   full.sketches.query({}, ['Country'], [])[name])
+
+
+def test_lookup_indexes_are_built_once_under_concurrent_requests(app_module, monkeypatch):
+    salary_data = app_module.datasets.get('default').salary_data.iloc[:2000]
+    indexes = DatasetIndexes(salary_data)
+    builds = []
+    rank_index = indexes_module.SalaryRankIndex
+
+    def counted(*args):
+        builds.append(args)
+        return rank_index(*args)
+
+    monkeypatch.setattr(indexes_module, 'SalaryRankIndex', counted)
+    with ThreadPoolExecutor(8) as pool:
+        ranks = list(pool.map(lambda _: indexes.salary_ranks, range(16)))
+        signatures = list(pool.map(lambda _: indexes.row_signatures(['Country']), range(16)))
+    assert all(result is ranks[0] for result in ranks)
+    assert len(builds) == len(ranks[0]) > 0
+    assert all(result is signatures[0] for result in signatures)
@@ -0,0 +1,63 @@
+import json
+import os
+import subprocess
+import sys
+
+from metrics import MetricsRegistry
+
+
+def _families(registry):
+    registry.counter('jobs_total', 'Jobs', ('kind',)).inc(('a"b',), 2)
+    registry.gauge('workers_busy', 'Busy workers').set(3)
+    registry.histogram('job_seconds', 'Job time', buckets=(0.1, 1.0)).observe(0.5)
+
+
+def test_exposition_format():
+    registry = MetricsRegistry()
+    _families(registry)
+    text = registry.exposition()
+    assert '# TYPE jobs_total counter\njobs_total{kind="a\\"b"} 2\n' in text
+    assert 'workers_busy 3\n' in text
+    assert ('job_seconds_bucket{le="0.1"} 0\njob_seconds_bucket{le="1.0"} 1\n'
+            'job_seconds_bucket{le="+Inf"} 1\njob_seconds_sum 0.5\njob_seconds_count 1\n') in text
+
+
+def test_workers_are_merged(tmp_path):
+    registry = MetricsRegistry(str(tmp_path))
+    _families(registry)
+    registry.flush()
+    state = json.loads((tmp_path / f'metrics_{os.getpid()}.json').read_text())
+
+    live = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])
+    exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+    exited.wait()
+    try:
+        for pid in (live.pid, exited.pid):
+            (tmp_path / f'metrics_{pid}.json').write_text(json.dumps(dict(state, pid=pid)))
+        text = registry.exposition()
+    finally:
+        live.kill()
+        live.wait()
+    # Counters and histograms include exited workers; gauges only running ones
+    assert 'jobs_total{kind="a\\"b"} 6\n' in text
+    assert 'job_seconds_count 3\n' in text
+    assert 'workers_busy 6\n' in text
+
+
+def test_collectors_run_on_scrape():
+    registry = MetricsRegistry()
+    queued = registry.gauge('queued', 'Queued work')
+    registry.add_collector(lambda: queued.set(7))
+    assert 'queued 7\n' in registry.exposition()
+
+
+def test_metrics_endpoint(client):
+    client.get('/api/data/summary')
+    resp = client.get('/metrics')
+    assert resp.status_code == 200
+    assert resp.content_type.startswith('text/plain; version=0.0.4')
+    text = resp.get_data(as_text=True)
+    assert 'http_requests_total{route="/api/data/summary",method="GET",status="200"}' in text
+    assert 'dataset_load_duration_seconds_count{phase="read"} 1' in text
+    assert 'dataset_rows{dataset="default"}' in text
+    assert 'app_ready 1' in text
@@ -0,0 +1,60 @@
+import time
+
+import pytest
+from flask import Flask, jsonify
+
+from profiling import RequestProfiler
+
+
+def _busy_wait(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+@pytest.fixture
+def make_client(tmp_path):
+    def make(**options):
+        app = Flask(__name__)
+
+        @app.route('/slow')
+        def slow():
+            _busy_wait(0.05)
+            return jsonify({'ok': True})
+
+        RequestProfiler(dump_dir=str(tmp_path), **options).install(app)
+        return app.test_client()
+    return make
+
+
+def test_profile_on_demand_needs_the_token(make_client):
+    client = make_client(token='secret')
+    assert client.get('/slow?profile=1').status_code == 403
+    assert client.get('/slow', headers={'X-Profile': '1'}).status_code == 403
+    assert client.get('/slow').get_json() == {'ok': True}
+
+    resp = client.get('/slow?profile=1', headers={'X-Profile-Token': 'secret'})
+    assert resp.status_code == 200
+    assert resp.headers['X-Profiled-Status'] == '200'
+    stacks = resp.get_data(as_text=True).splitlines()
+    assert any('slow (tests/test_profiling.py' in line and '_busy_wait' in line
+               for line in stacks)
+    assert sum(int(line.rsplit(' ', 1)[1]) for line in stacks) >= 5
+
+    resp = client.get('/slow', headers={'X-Profile': 'cprofile', 'X-Profile-Token': 'secret'})
+    assert 'Ordered by: cumulative time' in resp.get_data(as_text=True)
+    assert client.get('/slow?profile=svg',
+                      headers={'X-Profile-Token': 'secret'}).status_code == 400
+
+
+def test_profiling_is_off_without_token(make_client):
+    assert make_client().get('/slow?profile=1').get_json() == {'ok': True}
+
+
+def test_slow_requests_are_dumped(make_client, tmp_path):
+    client = make_client(slow_ms=20, sample_rate=1.0, max_dumps=2)
+    for _ in range(3):
+        assert client.get('/slow').get_json() == {'ok': True}
+    dumps = sorted(tmp_path.glob('*-slow-*ms.collapsed'))
+    assert len(dumps) == 2
+    assert '_busy_wait' in dumps[-1].read_text()
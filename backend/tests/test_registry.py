@@ -0,0 +1,160 @@
+import io
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from columnar_store import ColumnarStore
+from registry import DatasetRegistry
+
+
+def _tables(salary, rows=50):
+    salary_data = pd.DataFrame({
+        'Country': ['Germany', 'Poland'] * (rows // 2),
+        'Role_Name': ['Dev'] * rows,
+        'Skills': ['Python, SQL', ''] * (rows // 2),
+        'Salary_Min_USD': [salary * 0.9] * rows,
+        'Salary_Max_USD': [salary * 1.1] * rows,
+        'Salary_Avg_USD': [float(salary)] * rows,
+    })
+    economic = pd.DataFrame({'country': ['Germany'], 'inflation_rate': [2.5]})
+    legal = pd.DataFrame({'country': ['Germany'], 'benefits': [['Pension', 'Paid Leave']]})
+    return salary_data, economic, legal
+
+
+def test_lru_eviction_and_reload(tmp_path):
+    registry = DatasetRegistry(ColumnarStore(str(tmp_path)), memory_budget=1)
+    registry.publish('default', *_tables(1), 'first')
+    second = registry.create(*_tables(2), 'second')
+
+    # Over budget: the least recently used dataset goes to disk
+    rows = {row['dataset_id']: row for row in registry.describe()}
+    assert not rows['default']['resident'] and rows['default']['disk_bytes'] > 0
+    assert rows[second.dataset_id]['resident'] and registry.evictions == 1
+
+    reloaded = registry.get('default')
+    assert reloaded.version == 1 and registry.reloads == 1
+    pd.testing.assert_frame_equal(reloaded.salary_data, _tables(1)[0])
+    pd.testing.assert_frame_equal(reloaded.legal_data, _tables(1)[2])
+    assert registry.get(second.dataset_id) is not None
+
+    with pytest.raises(KeyError):
+        registry.get('missing')
+
+
+def test_datasets_are_shared_through_the_store(tmp_path):
+    created = DatasetRegistry(ColumnarStore(str(tmp_path)), 2**30).create(*_tables(3), 'upload')
+    other_worker = DatasetRegistry(ColumnarStore(str(tmp_path)), 2**30)
+    assert other_worker.get(created.dataset_id).salary_data['Salary_Avg_USD'].iloc[0] == 3.0
+
+
+def test_store_appends_parts_and_merges_them(tmp_path):
+    store = ColumnarStore(str(tmp_path))
+    salary, economic, legal = _tables(1, rows=64)
+    store.save('upload', {'salary_data': salary, 'legal_data': legal}, {'version': 1})
+    appended = [salary]
+    for version in range(2, 12):
+        rows = _tables(version, rows=4)[0]
+        appended.append(rows)
+        store.append('upload', {'version': version}, rows={'salary_data': rows},
+                     replace={'legal_data': legal.assign(version=version)})
+
+    tables, meta = store.load('upload')
+    pd.testing.assert_frame_equal(tables['salary_data'],
+                                  pd.concat(appended, ignore_index=True))
+    assert tables['legal_data']['version'].tolist() == [11] and meta['version'] == 11
+    # Only the stored base and a few merged tail parts, and no stale directories
+    with open(tmp_path / 'upload' / 'dataset.json') as handle:
+        parts = json.load(handle)['parts']
+    assert [part['rows'] for part in parts['salary_data']] == [96, 8]
+    assert sorted(os.listdir(tmp_path / 'upload')) == sorted(
+        ['dataset.json'] + [part['dir'] for table in parts.values() for part in table])
+
+
+def test_upload_creates_separate_dataset(client):
+    csv = _tables(50000)[0].assign(Team_Setup='Remote').to_csv(index=False)
+    response = client.post('/api/upload', data={'file': (io.BytesIO(csv.encode()), 'delta.csv')})
+    dataset_id = response.get_json()['dataset_id']
+
+    uploaded = client.get(f'/api/data/summary?dataset={dataset_id}').get_json()
+    default = client.get('/api/data/summary').get_json()
+    assert uploaded['total_records'] == 50 and default['total_records'] > 50
+    assert any(row['dataset_id'] == dataset_id
+               for row in client.get('/api/datasets').get_json()['datasets'])
+
+    assert client.delete(f'/api/datasets/{dataset_id}').status_code == 200
+    assert client.get(f'/api/data/summary?dataset={dataset_id}').status_code == 404
+    assert client.get('/api/data/summary?dataset=../etc').status_code == 404
+
+
+def test_append_updates_indexes_and_skips_duplicates(tmp_path):
+    registry = DatasetRegistry(ColumnarStore(str(tmp_path)), 2**30)
+    created = registry.create(*_tables(1, rows=4), 'upload')
+    delta = pd.DataFrame({'Country': ['India', 'Germany', 'India'], 'Role_Name': ['Dev'] * 3,
+                          'Skills': ['Go', 'Python, SQL', 'Go'],
+                          'Salary_Min_USD': [9.0, 0.9, 9.0], 'Salary_Max_USD': [11.0, 1.1, 11.0],
+                          'Salary_Avg_USD': [10.0, 1.0, 10.0]})
+
+    snapshot, added = registry.append(created.dataset_id, [delta],
+                                      dedup=['Country', 'Salary_Avg_USD'])
+    assert added == 1 and snapshot.records == 5 and snapshot.version == 2
+    assert snapshot.indexes.skills.rows_with_all(['go']).tolist() == [4]
+    assert list(snapshot.indexes.dimensions['Country'].uniques) == ['Germany', 'India', 'Poland']
+    assert created.records == 4  # the previous snapshot is untouched
+
+    other_worker = DatasetRegistry(ColumnarStore(str(tmp_path)), 2**30)
+    assert other_worker.get(created.dataset_id).records == 5
+    with pytest.raises(ValueError):
+        registry.append(created.dataset_id, [delta], dedup=['Bogus'])
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sql'])
+def test_workers_append_to_the_latest_stored_version(tmp_path, backend):
+    first = DatasetRegistry(ColumnarStore(str(tmp_path)), 2**30)
+    dataset_id = first.create(*_tables(1, rows=4), 'upload', backend=backend).dataset_id
+    second = DatasetRegistry(ColumnarStore(str(tmp_path)), 2**30)
+    assert second.get(dataset_id).records == 4
+
+    # Each worker serves and extends what the other one stored
+    first.append(dataset_id, [_tables(2, rows=2)[0]])
+    assert second.get(dataset_id).records == 6
+    snapshot, added = second.append(dataset_id, [_tables(3, rows=2)[0]])
+    assert added == 2 and snapshot.records == 8 and snapshot.version == 3
+    assert first.get(dataset_id).records == 8
+    third = DatasetRegistry(ColumnarStore(str(tmp_path)), 2**30)
+    assert third.get(dataset_id).version == 3 and third.get(dataset_id).records == 8
+
+    first.delete(dataset_id)
+    with pytest.raises(KeyError):
+        second.get(dataset_id)
+
+
+def test_append_upload_to_sql_dataset(client, app_module, monkeypatch):
+    monkeypatch.setattr(app_module.datasets, 'sql_threshold', 0)
+    csv = 'Role_Name,Country,Team_Setup,Salary_Min_USD,Salary_Max_USD,Salary_Avg_USD\n'
+    first = client.post('/api/upload', data={'file': (io.BytesIO(
+        (csv + 'Dev,Germany,Remote,1,3,2\nDev,Poland,Remote,4,6,5\n').encode()), 'week1.csv')})
+    dataset_id = first.get_json()['dataset_id']
+    pinned = app_module.datasets.get(dataset_id)
+
+    delta = csv + 'Dev,Poland,Remote,4,6,5\nOps,India,Remote,7,9,8\nOps,India,Remote,7,9,8\n'
+    response = client.post(f'/api/upload?dataset={dataset_id}', data={
+        'file': (io.BytesIO(delta.encode()), 'week2.csv'), 'mode': 'append',
+        'dedup': 'Role_Name,Country,Salary_Avg_USD'})
+    body = response.get_json()
+    assert body['backend'] == 'sql' and body['appended'] == 1 and body['records'] == 3
+    assert body['countries'] == ['Germany', 'Poland', 'India']
+
+    summary = client.get(f'/api/data/summary?dataset={dataset_id}').get_json()
+    assert summary['salary_stats']['max'] == 9 and summary['total_records'] == 3
+    columns = client.get(f'/api/data/aggregate?dimensions=Country&aggregates=count,sum,p50'
+                         f'&dataset={dataset_id}').get_json()['columns']
+    assert columns == {'Country': ['Germany', 'India', 'Poland'], 'count': [1, 1, 1],
+                       'sum': [2.0, 8.0, 5.0], 'p50': [2.0, 8.0, 5.0]}
+    # Requests pinned to the previous version still see only its rows
+    assert pinned.sql.count({}) == 2 and pinned.sql.rows({})[1] == 2
+
+    bad = client.post(f'/api/upload?dataset={dataset_id}', data={
+        'file': (io.BytesIO(b'a,b\n1,2\n'), 'bad.csv'), 'mode': 'append'})
+    assert bad.status_code == 400
@@ -0,0 +1,55 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import serialization
+from serialization import Records, dumps
+
+
+@pytest.fixture(params=['orjson', 'json'])
+def encoder(request, monkeypatch):
+    if request.param == 'orjson':
+        if serialization.orjson is None:
+            pytest.skip('orjson is not installed')
+    else:
+        monkeypatch.setattr(serialization, 'orjson', None)
+    return request.param
+
+
+def test_non_finite_values_become_null(encoder):
+    payload = {
+        'array': np.array([1.5, np.nan, np.inf, -np.inf]),
+        'scalars': [float('nan'), np.float64('inf'), np.float32(2.5), np.int64(7)],
+        'when': pd.Timestamp('2025-03-01'),
+        'missing': pd.NaT,
+        'labels': np.array(['Germany', None], dtype=object),
+        'mixed': np.array(['Germany', np.nan, None, 1.5, np.inf], dtype=object),
+    }
+    assert json.loads(dumps(payload)) == {
+        'array': [1.5, None, None, None],
+        'scalars': [None, None, 2.5, 7],
+        'when': '2025-03-01T00:00:00',
+        'missing': None,
+        'labels': ['Germany', None],
+        'mixed': ['Germany', None, None, 1.5, None],
+    }
+
+
+def test_records_match_to_dict(encoder):
+    frame = pd.DataFrame({
+        'Country': ['Germany', 'Poland', None],
+        'Salary_Avg_USD': [66000.125, np.nan, 71234.56789],
+        'Years': [3, 5, 8],
+        'benefits': [['Pension'], [], ['Car', 'Gym']],
+    })
+    body = dumps({'success': True, 'count': np.int64(3), 'data': Records(frame)})
+    expected = frame.astype(object).where(frame.notna(), None).to_dict(orient='records')
+    assert json.loads(body) == {'success': True, 'count': 3, 'data': expected}
+
+
+def test_jsonify_uses_the_api_encoder(app_module):
+    with app_module.app.app_context():
+        resp = app_module.jsonify({'value': np.float64('nan'), 'rows': Records(pd.DataFrame({'a': [1]}))})
+    assert resp.get_data() == b'{"value":null,"rows":[{"a":1}]}'
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from indexes import DatasetIndexes
+
+
+def test_profile_search_finds_exact_profile_first():
+    frame = pd.DataFrame({
+        'Country': ['Germany', 'Germany', 'Poland', 'India'],
+        'Role_Name': ['Platform Engineer', 'Cloud Engineer', 'Platform Engineer', 'DevOps Engineer'],
+        'Experience_Level': ['Senior', 'Senior', 'Junior', 'Junior'],
+        'Years_of_Experience': [8, 8, 2, 1],
+        'Skills': ['Kubernetes, AWS, Terraform', 'Azure, Docker', 'Kubernetes, GCP', 'Bash, Linux'],
+        'Salary_Avg_USD': [90000.0, 80000.0, 50000.0, 20000.0],
+    })
+    profiles = DatasetIndexes(frame).profiles
+
+    results = profiles.most_similar([
+        {'role': 'Platform Engineer', 'country': 'Germany', 'experience_level': 'Senior',
+         'skills': 'Kubernetes, AWS, Terraform', 'years': 8},
+        {'role': 'Platform Engineer', 'skills': ['kubernetes']},
+    ], k=2)
+
+    positions, scores = results[0]
+    assert positions[0] == 0 and np.isclose(scores[0], 1.0)
+    assert set(results[1][0]) == {0, 2}
+
+
+def test_similar_endpoint_batch(client):
+    resp = client.post('/api/similar', json={'k': 5, 'profiles': [
+        {'role': 'Site Reliability Engineer (SRE)', 'country': 'Poland', 'skills': 'Kubernetes'},
+        {'role': 'Cloud Engineer', 'country': 'India', 'years': 3},
+    ]})
+    assert resp.status_code == 200
+    first, second = resp.get_json()['data']
+    assert len(first) == len(second) == 5
+    assert [m['similarity'] for m in first] == sorted((m['similarity'] for m in first),
+                                                       reverse=True)
+    assert first[0]['Country'] == 'Poland'
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sketches import QUERY_CACHE_ENTRIES, SKETCH_VALUE_COLUMN, GroupSketches, KLLSketch
+
+
+def test_kll_exact_below_capacity_and_bounded_rank_error():
+    small = np.arange(150, dtype=float)
+    np.testing.assert_allclose(KLLSketch().update(small).quantiles([0.25, 0.5]),
+                               np.quantile(small, [0.25, 0.5]))
+
+    values = np.random.default_rng(1).lognormal(10, 1, 200_000)
+    sketch = KLLSketch()
+    for chunk in np.array_split(values, 50):
+        sketch.merge(KLLSketch().update(chunk))
+    fractions = np.linspace(0.05, 0.95, 19)
+    ranks = np.searchsorted(np.sort(values), sketch.quantiles(fractions)) / len(values)
+    assert np.abs(ranks - fractions).max() < 0.0165
+
+
+def test_group_sketches_incremental_update_matches_full_build():
+    rng = np.random.default_rng(5)
+    frame = pd.DataFrame({
+        'Country': rng.choice(['Germany', 'Poland'], 3000),
+        'Role_Name': rng.choice(['DevOps Engineer', 'Cloud Engineer'], 3000),
+        'Salary_Avg_USD': rng.normal(60000, 10000, 3000),
+    })
+    full = GroupSketches.from_frame(frame, ['Country', 'Role_Name'])
+    incremental = GroupSketches.from_frame(frame.iloc[:1000], ['Country', 'Role_Name'])
+    incremental.update(frame.iloc[1000:])
+
+    for sketches in (full, incremental):
+        result = sketches.query({'Country': 'Poland'}, ['Role_Name'], [0.5])
+        expected = frame[frame['Country'] == 'Poland'].groupby('Role_Name')['Salary_Avg_USD']
+        np.testing.assert_array_equal(result['count'], expected.count())
+        np.testing.assert_allclose(result['mean'], expected.mean())
+        np.testing.assert_allclose(result['std'], expected.std())
+        np.testing.assert_allclose(result['p50'], expected.median(), rtol=0.05)
+
+
+def test_group_sketches_copy_shares_untouched_groups():
+    rng = np.random.default_rng(7)
+    frame = pd.DataFrame({'Country': rng.choice(['Germany', 'Poland', 'India'], 3000),
+                          'Salary_Avg_USD': rng.normal(60000, 10000, 3000)})
+    original = GroupSketches.from_frame(frame, ['Country'])
+    before = original.query({}, ['Country'], [0.5, 0.9])
+
+    updated = original.copy()
+    assert not original._shared.any() and updated._shared.all()
+    updated.update(pd.DataFrame({'Country': ['Poland', 'Spain'] * 500,
+                                 'Salary_Avg_USD': [1.0, 2.0] * 500}))
+    poland, germany = original._lookup[('Poland',)], original._lookup[('Germany',)]
+    assert updated.sketches[germany] is original.sketches[germany]
+    assert updated.sketches[poland] is not original.sketches[poland]
+    for column, values in original.query({}, ['Country'], [0.5, 0.9]).items():
+        np.testing.assert_array_equal(values, before[column])
+    assert updated.query({'Country': 'Poland'}, [], [])['count'][0] == \
+        before['count'][list(before['Country']).index('Poland')] + 500
+
+
+def test_group_sketches_query_cache_is_bounded():
+    frame = pd.DataFrame({'Country': ['Germany', 'Poland'] * 50,
+                          'Salary_Avg_USD': np.arange(100, dtype=float)})
+    sketches = GroupSketches.from_frame(frame, ['Country'])
+    for i in range(QUERY_CACHE_ENTRIES + 50):  # e.g. clients probing arbitrary filter values
+        assert sketches.query({'Country': f'Nowhere {i}'}, [], [0.5])['count'].tolist() == []
+    assert len(sketches._cache) == QUERY_CACHE_ENTRIES
+    first = sketches.query({'Country': 'Poland'}, [], [0.5])
+    assert sketches.query({'Country': 'Poland'}, [], [0.5]) is first
+
+
+def test_group_sketches_merge_and_round_trip():
+    rng = np.random.default_rng(9)
+    frame = pd.DataFrame({
+        'Country': rng.choice(['Germany', 'Poland', 'India'], 5000),
+        'Salary_Avg_USD': rng.lognormal(11, 0.4, 5000),
+    })
+    partials = [GroupSketches.from_frame(chunk, ['Country'])
+                for chunk in (frame.iloc[i:i + 1250] for i in range(0, 5000, 1250))]
+    merged = partials[0]
+    for partial in partials[1:]:
+        merged.merge(partial)
+    restored = GroupSketches.from_bytes(merged.to_bytes())
+
+    expected = frame.groupby('Country')['Salary_Avg_USD']
+    for sketches in (merged, restored):
+        result = sketches.query({}, ['Country'], [0.9])
+        np.testing.assert_array_equal(result['count'], expected.count())
+        np.testing.assert_allclose(result['std'], expected.std())
+        np.testing.assert_allclose(result['max'], expected.max())
+        np.testing.assert_allclose(result['p90'], expected.quantile(0.9), rtol=0.05)
+    np.testing.assert_array_equal(restored.query({}, ['Country'], [0.9])['p90'],
+                                  merged.query({}, ['Country'], [0.9])['p90'])
+
+
+def test_percentiles_endpoint(client):
+    resp = client.get('/api/data/percentiles?dimensions=Country,Role_Name&percentiles=25,75,90')
+    assert resp.status_code == 200
+    columns = resp.get_json()['columns']
+    assert all(a <= b <= c for a, b, c in zip(columns['p25'], columns['p75'], columns['p90']))
+    assert client.get('/api/data/percentiles?salary_from=10').status_code == 400
+
+
+def test_summary_median_is_exact(client, app_module):
+    salary_data = app_module.datasets.get('default').salary_data
+    median = client.get('/api/data/summary').get_json()['salary_stats']['median']
+    assert median == pytest.approx(salary_data[SKETCH_VALUE_COLUMN].median())
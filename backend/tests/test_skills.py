@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from skills import SkillIndex
+
+
+def test_skill_index_matches_string_matching():
+    skills = pd.Series(['AWS, Docker, Python', 'Docker, Kubernetes', '', 'AWS, Kubernetes, Docker',
+                        'Python, Bash, Python'])
+    salaries = np.array([70000.0, 50000.0, 40000.0, 90000.0, 60000.0])
+    roles = np.array([0, 1, 1, 0, 1])
+    index = SkillIndex(skills)
+
+    np.testing.assert_array_equal(index.rows_with_all(['docker', 'Kubernetes']), [1, 3])
+    assert len(index.rows_with_all(['Docker', 'Rust'])) == 0
+
+    columns = index.salary_by_skill(np.arange(5), salaries, roles)
+    stats = dict(zip(columns['skill'], zip(columns['count'], columns['mean_salary'],
+                                           columns['median_salary'], columns['premium'])))
+    assert stats['Docker'][:3] == (3, 70000.0, 70000.0)
+    # Role means: role 0 = 80000, role 1 = 50000 -> AWS holders sit at -10000 and +10000
+    assert stats['AWS'][3] == 0.0
+    assert stats['Python'][0] == 2  # listed twice in one record, counted once
+
+
+def test_skill_endpoints(client):
+    frequency = client.get('/api/skills?limit=3').get_json()['columns']
+    assert frequency['count'] == sorted(frequency['count'], reverse=True)
+
+    resp = client.get('/api/skills/salary?sort=premium&min_count=50&country=Germany')
+    assert resp.status_code == 200
+    premium = resp.get_json()['columns']['premium']
+    assert premium == sorted(premium, reverse=True)
+
+    docker = client.get('/api/data/salaries?skills=Docker,Kubernetes&limit=20').get_json()
+    assert docker['total'] > 0
+    assert all('Docker' in row['Skills'] and 'Kubernetes' in row['Skills']
+               for row in docker['data'])
@@ -0,0 +1,189 @@
+"""Parity suite: every /api/data/* read endpoint must answer the same from both backends."""
+import io
+import os
+import re
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+import sql_backend
+
+# Sketch-based percentiles (/percentiles) are approximate and the two backends
+# build their sketches from differently sized batches; everything else, the
+# summary median included, must agree to rounding
+SKETCHED = ('/api/data/percentiles',)
+QUANTILE_KEY = re.compile(r'\.(median|p\d+(\.\d+)?)(\[|$)')
+
+READ_QUERIES = [
+    '/api/data/summary',
+    '/api/data/by-country',
+    '/api/data/by-role?country=Poland',
+    '/api/data/salaries?limit=50',
+    '/api/data/salaries?country=Germany&role=Data Engineer&offset=5&limit=20',
+    '/api/data/salaries?salary_min=60000&salary_max=80000&sort=salary&order=desc&limit=100',
+    '/api/data/salaries?salary_from=30000&salary_to=90000&sort=experience&limit=100&offset=300',
+    '/api/data/salaries?skills=docker, Kubernetes&experience_from=5&sort=salary&limit=100',
+    '/api/data/salaries?skills=Docker,NoSuchSkill',
+    '/api/data/salaries?country=Atlantis',
+    '/api/data/aggregate',
+    '/api/data/aggregate?dimensions=Country,Role_Name&aggregates=count,sum,mean,std,min,max,median,p90',
+    '/api/data/aggregate?dimensions=Experience_Level&aggregates=p0,p10,p100&value=Salary_EUR',
+    '/api/data/aggregate?dimensions=Location&skills=Python&salary_min=50000&aggregates=count,mean',
+    '/api/data/aggregate?dimensions=Country&country=Atlantis',
+    '/api/data/top?n=5&metric=median&min_count=30',
+    '/api/data/top?dimensions=Location&metric=std&direction=asc&n=3',
+    '/api/data/percentiles',
+    '/api/data/percentiles?dimensions=Country,Experience_Level&percentiles=10,50,99',
+    '/api/data/percentiles?dimensions=Role_Name&country=Germany',
+    '/api/data/rank?salary=72000&country=Poland&role=Data Engineer',
+    '/api/data/rank?salary=50000&country=Germany&role=Data Engineer&experience_level=Senior',
+    # Errors must match too
+    '/api/data/salaries?sort=bogus',
+    '/api/data/salaries?salary_min=9&salary_max=1',
+    '/api/data/aggregate?dimensions=Bogus',
+    '/api/data/aggregate?value=Country',
+    '/api/data/percentiles?salary_from=1',
+    '/api/data/rank?country=Poland',
+]
+
+
+@pytest.fixture(scope='module')
+def sql_dataset(app_module):
+    snapshot = app_module.datasets.get('default')
+    sql_snapshot = app_module.datasets.publish(
+        'parity', snapshot.salary_data, snapshot.economic_data, snapshot.legal_data,
+        'parity', backend='sql')
+    assert sql_snapshot.sql is not None and sql_snapshot.records == snapshot.records
+    return 'parity'
+
+
+def assert_same(memory, sql, path='', sketched=False):
+    if isinstance(memory, dict):
+        assert sorted(memory) == sorted(sql), path
+        for key in memory:
+            assert_same(memory[key], sql[key], f'{path}.{key}', sketched)
+    elif isinstance(memory, list):
+        assert len(memory) == len(sql), path
+        for i, (a, b) in enumerate(zip(memory, sql)):
+            assert_same(a, b, f'{path}[{i}]', sketched)
+    elif isinstance(memory, float) or isinstance(sql, float):
+        if sketched and QUANTILE_KEY.search(path):
+            assert sql == pytest.approx(memory, rel=0.05), path
+        else:
+            assert sql == pytest.approx(memory, rel=1e-9, abs=1e-6), path
+    else:
+        assert memory == sql, path
+
+
+@pytest.mark.parametrize('url', READ_QUERIES)
+def test_read_endpoint_parity(client, sql_dataset, url):
+    memory = client.get(url)
+    separator = '&' if '?' in url else '?'
+    sql = client.get(f'{url}{separator}dataset={sql_dataset}')
+    assert memory.status_code == sql.status_code
+    assert_same(memory.get_json(), sql.get_json(), sketched=url.startswith(SKETCHED))
+
+
+def test_rank_batch_parity(client, sql_dataset):
+    offers = [{'salary': 40000 + 1000 * i, 'country': country, 'role': 'Data Engineer'}
+              for i, country in enumerate(['Germany', 'Poland', 'India', 'Hungary', 'Atlantis'])]
+    offers.append({'salary': 61000, 'country': 'Germany', 'role': 'Data Engineer',
+                   'experience_level': 'Mid'})
+    memory = client.post('/api/data/rank', json={'offers': offers}).get_json()
+    sql = client.post(f'/api/data/rank?dataset={sql_dataset}', json={'offers': offers}).get_json()
+    assert_same(memory, sql)
+
+
+def test_sql_salary_pages_are_bounded(client, app_module, sql_dataset, monkeypatch):
+    monkeypatch.setattr(sql_backend, 'PAGE_ROWS', 30)
+    monkeypatch.setattr(sql_backend, 'MAX_PAGE_ROWS', 40)
+    records = app_module.datasets.get(sql_dataset).records
+    body = client.get(f'/api/data/salaries?dataset={sql_dataset}&offset=1').get_json()
+    assert body['count'] == 30 and body['total'] == records
+    body = client.get(f'/api/data/salaries?dataset={sql_dataset}&limit=500').get_json()
+    assert body['count'] == 40 and body['total'] == records
+
+
+def test_frame_only_endpoints_refuse_sql(client, sql_dataset):
+    response = client.get(f'/api/skills?dataset={sql_dataset}')
+    assert response.status_code == 400
+    assert client.get(f'/api/economic?dataset={sql_dataset}').status_code == 200
+
+
+def test_large_csv_upload_streams_into_sql(client, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'CSV_CHUNK_ROWS', 7)
+    monkeypatch.setattr(app_module.datasets, 'sql_threshold', 0)
+    csv = 'Role_Name,Country,Team_Setup,Salary_Min_USD,Salary_Max_USD,Salary_Avg_USD\n' + ''.join(
+        f'Dev,{"Germany" if i % 3 else "Poland"},Remote,{i},{i + 10},{i + 5}\n' for i in range(50))
+    response = client.post('/api/upload', data={'file': (io.BytesIO(csv.encode()), 'big.csv')})
+    body = response.get_json()
+    assert body['backend'] == 'sql' and body['records'] == 50
+    assert body['countries'] == ['Poland', 'Germany']
+
+    # Built chunk by chunk, the stored partials answer group-bys without a table scan
+    sql = app_module.datasets.get(body['dataset_id']).sql
+    assert sql.sketch_dimensions == {'Country', 'Role_Name', 'Team_Setup'}
+    top = client.get(f'/api/data/aggregate?dimensions=Country&aggregates=count,max'
+                     f'&dataset={body["dataset_id"]}').get_json()
+    assert top['columns'] == {'Country': ['Germany', 'Poland'], 'count': [33, 17],
+                              'max': [54.0, 53.0]}
+    summary = client.get(f'/api/data/summary?dataset={body["dataset_id"]}').get_json()
+    assert summary['salary_stats']['min'] == 0 and summary['salary_stats']['max'] == 59
+    assert summary['salary_stats']['avg'] == pytest.approx(29.5)
+    assert summary['salary_stats']['median'] == 29.5
+
+
+def test_upload_backend_crosses_over_at_the_sql_threshold(client, app_module, monkeypatch):
+    csv = ('Role_Name,Country,Team_Setup,Salary_Min_USD,Salary_Max_USD,Salary_Avg_USD\n'
+           + 'Dev,Germany,Remote,100,110,105\n' * 40).encode()
+
+    streamed = []
+    stream = app_module.create_sql_dataset_from_csv
+    monkeypatch.setattr(app_module, 'create_sql_dataset_from_csv',
+                        lambda *args: streamed.append(args) or stream(*args))
+
+    def upload(threshold, max_bytes):
+        monkeypatch.setattr(app_module.datasets, 'sql_threshold', threshold)
+        monkeypatch.setitem(app_module.app.config, 'MAX_CONTENT_LENGTH', max_bytes)
+        return client.post('/api/upload', data={'file': (io.BytesIO(csv), 'edge.csv')})
+
+    assert upload(2**30, 4 * len(csv)).get_json()['backend'] == 'memory'
+    # Just below the threshold the file is parsed, and the parsed frame is larger
+    assert upload(len(csv) + 1, 4 * len(csv)).get_json()['backend'] == 'sql'
+    assert not streamed
+    assert upload(len(csv), 4 * len(csv)).get_json()['backend'] == 'sql'
+    assert len(streamed) == 1
+    # An upload limit below the threshold turns the would-be SQL upload away
+    assert upload(len(csv), len(csv) // 2).status_code == 413
+
+
+def test_duckdb_append_while_other_connections_read(tmp_path):
+    duckdb = pytest.importorskip('duckdb')
+    from sql_backend import SQLDataset
+
+    path = str(tmp_path / 'salaries.duckdb')
+    frame = pd.DataFrame({'Country': ['Germany', 'Poland'], 'Role_Name': ['Dev', 'Ops'],
+                          'Salary_Avg_USD': [1.0, 2.0]})
+    first = SQLDataset.from_frame(path, frame)
+    assert first.count({}) == 2  # this process now has the file open read-only
+    # ... and so has another worker
+    reader = subprocess.Popen([sys.executable, '-c', (
+        'import duckdb, sys; connection = duckdb.connect(sys.argv[1], read_only=True); '
+        'print(connection.execute("SELECT COUNT(*) FROM salaries").fetchone()[0], flush=True); '
+        'sys.stdin.read()'), path], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    try:
+        assert reader.stdout.readline().strip() == '2'
+        second, added = first.append([frame.assign(Salary_Avg_USD=[3.0, 4.0])])
+        third, _ = second.append([frame.assign(Salary_Avg_USD=[5.0, 6.0])])
+    finally:
+        reader.communicate('')
+
+    assert added == 2 and second.path != path and third.count({}) == 6
+    assert first.count({}) == 2 and second.count({}) == 4  # earlier versions stay readable
+    # Only the previous generation is kept next to the current one
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        os.path.basename(p) for p in (second.path, third.path))
+    assert duckdb.connect(third.path, read_only=True).execute(
+        "SELECT value FROM dataset_meta WHERE key = 'row_count'").fetchone() == ('6',)
@@ -0,0 +1,12 @@
+from startup_profile import IMPORT_BUDGET_SECONDS, profile_startup
+
+
+def test_cold_import_stays_within_budget(tmp_path):
+    report = profile_startup({'DATASET_STORE_DIR': str(tmp_path)})
+
+    assert report['import_seconds'] <= IMPORT_BUDGET_SECONDS
+    # Heavy dependencies wait for the first chart (or never load at all)
+    assert 'plotly.express' not in report['loaded']
+    assert not any(name.startswith('sklearn') for name in report['loaded'])
+    assert 'plotly.express' in {module['module'] for module in report['deferred_modules']}
+    assert all(step['state'] == 'done' for step in report['readiness']['steps'])
@@ -0,0 +1,41 @@
+import gzip
+
+from static_assets import IMMUTABLE_CACHE_CONTROL, StaticManifest, precompress
+
+
+def _dist(tmp_path):
+    (tmp_path / 'assets').mkdir()
+    (tmp_path / 'index.html').write_text('<html>' + 'app ' * 400 + '</html>')
+    (tmp_path / 'assets' / 'index-abc123.js').write_text('console.log(1);' * 200)
+    (tmp_path / 'assets' / 'logo.png').write_bytes(b'\x89PNG' * 300)
+    return tmp_path
+
+
+def test_manifest_uses_prebuilt_siblings(tmp_path):
+    dist = _dist(tmp_path)
+    assert precompress(str(dist)) == 4  # .gz and .br of the html and js files
+    (dist / 'assets' / 'index-abc123.js.gz').write_bytes(gzip.compress(b'prebuilt'))
+
+    manifest = StaticManifest(str(dist))
+    assert sorted(manifest.assets) == ['assets/index-abc123.js', 'assets/logo.png', 'index.html']
+    script = manifest.lookup('assets/index-abc123.js')
+    assert script.mimetype in ('text/javascript', 'application/javascript')
+    assert gzip.decompress(script.variant('gzip')) == b'prebuilt'
+    assert script.cache_control == IMMUTABLE_CACHE_CONTROL
+    assert manifest.index.cache_control == 'no-cache'
+    assert manifest.lookup('assets/logo.png').negotiate('gzip, br') is None
+
+
+def test_frontend_served_from_memory(app_module, client, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, 'frontend_assets', StaticManifest(str(_dist(tmp_path))))
+
+    script = client.get('/assets/index-abc123.js', headers={'Accept-Encoding': 'gzip'})
+    assert script.headers['Content-Encoding'] == 'gzip'
+    assert script.headers['Cache-Control'] == IMMUTABLE_CACHE_CONTROL
+    assert gzip.decompress(script.data) == b'console.log(1);' * 200
+
+    page = client.get('/dashboard/germany')  # client-side route
+    assert page.status_code == 200 and page.data.startswith(b'<html>')
+    assert page.headers['Cache-Control'] == 'no-cache'
+    revalidated = client.get('/', headers={'If-None-Match': page.headers['ETag']})
+    assert revalidated.status_code == 304
@@ -18,3 +18,41 @@ def test_status_endpoint():
     assert resp.status_code == 200
     data = resp.get_json()
     assert data['status'] == 'ok'
+
+
+def test_ready_after_startup_steps(client):
+    resp = client.get('/api/ready')
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data['ready'] and data['progress'] == 1.0
+    assert [step['name'] for step in data['steps']] == ['dataset', 'summaries', 'forecast']
+    assert all(step['state'] == 'done' for step in data['steps'])
+
+
+def test_data_endpoints_wait_for_dataset(app_module, client, monkeypatch):
+    from readiness import Readiness
+
+    loading = Readiness()
+    loading.add_step('dataset', lambda: None)
+    monkeypatch.setattr(app_module, 'readiness', loading)
+
+    assert client.get('/api/status').get_json()['ready'] is False
+    assert client.get('/api/ready').status_code == 503
+    resp = client.get('/api/data/summary')
+    assert resp.status_code == 503
+    assert resp.headers['Retry-After'] == str(app_module.STARTUP_RETRY_AFTER)
+    assert resp.get_json()['steps'][0]['state'] == 'pending'
+
+    loading.run()
+    assert client.get('/api/data/summary').status_code == 200
+
+
+def test_liveness_endpoints_never_load_datasets(app_module, client, monkeypatch):
+    def load(dataset_id):
+        raise AssertionError(f'{dataset_id} loaded by a liveness check')
+    monkeypatch.setattr(app_module.datasets, 'get', load)
+
+    status = client.get('/api/status?dataset=unknown')
+    assert status.status_code == 200 and status.get_json()['data_loaded']
+    assert client.get('/api/ready').status_code == 200
+    assert client.get('/metrics').status_code == 200
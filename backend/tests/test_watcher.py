@@ -0,0 +1,53 @@
+import os
+
+from watcher import FileWatcher
+
+
+def _touch(path, content, mtime):
+    path.write_text(content)
+    os.utime(path, ns=(mtime, mtime))
+
+
+def test_reload_runs_once_after_the_file_settles(tmp_path):
+    path = tmp_path / 'data.xlsx'
+    _touch(path, 'v1', 1_000_000_000)
+    calls = []
+    watcher = FileWatcher(str(path), lambda: calls.append(path.read_text()), debounce=5)
+
+    assert not watcher.poll(now=0)  # unchanged
+    _touch(path, 'v2 partial', 2_000_000_000)
+    assert not watcher.poll(now=1)
+    _touch(path, 'v2 complete', 3_000_000_000)  # still being written
+    assert not watcher.poll(now=2)
+    assert not watcher.poll(now=6)  # settled for 4s only
+    assert watcher.poll(now=7)
+    assert calls == ['v2 complete'] and watcher.changes == 1
+    assert not watcher.poll(now=20)
+
+    # A deleted file is not reloaded; its replacement is
+    path.unlink()
+    assert not watcher.poll(now=21) and not watcher.poll(now=30)
+    _touch(path, 'v3', 4_000_000_000)
+    assert not watcher.poll(now=31)
+    assert watcher.poll(now=36)
+    assert calls == ['v2 complete', 'v3']
+
+
+def test_reload_swaps_default_dataset(app_module, client, monkeypatch):
+    original = app_module.datasets.get('default')
+    before = client.get('/api/data/summary').get_json()['total_records']
+
+    monkeypatch.setattr(app_module, 'load_bmw_dataset', lambda: None)
+    assert not app_module.reload_bmw_data()  # unusable file: keep serving the current data
+    assert app_module.datasets.get('default') is original
+
+    monkeypatch.setattr(app_module, 'load_bmw_dataset', lambda: original.salary_data.head(100))
+    try:
+        assert app_module.reload_bmw_data()
+        reloaded = app_module.datasets.get('default')
+        assert reloaded.version > original.version
+        assert client.get('/api/data/summary').get_json()['total_records'] == 100
+    finally:
+        app_module.datasets.publish('default', original.salary_data, original.economic_data,
+                                    original.legal_data, original.source)
+    assert client.get('/api/data/summary').get_json()['total_records'] == before
@@ -1,8 +1,28 @@
+import re
 import pandas as pd
 import numpy as np
 from typing import List
 from datetime import datetime
 
+# Matches posted ranges such as '€45,000 - €52,500', 'Ft8,000K - Ft9,500K'
+# or '₹6.6 Lakhs - ₹8.1 Lakhs'; currency symbols are ignored, unit suffixes scale.
+_SALARY_RANGE_PATTERN = re.compile(
+    r'^\D*?(?P<low>\d[\d,]*(?:\.\d+)?)\s*(?P<low_unit>lakhs?|crores?|k|m)?'
+    r'\s*[-–—]\s*'
+    r'\D*?(?P<high>\d[\d,]*(?:\.\d+)?)\s*(?P<high_unit>lakhs?|crores?|k|m)?\s*$',
+    re.IGNORECASE,
+)
+
+_SALARY_UNIT_MULTIPLIERS = {
+    '': 1.0,
+    'k': 1e3,
+    'm': 1e6,
+    'lakh': 1e5,
+    'lakhs': 1e5,
+    'crore': 1e7,
+    'crores': 1e7,
+}
+
 def format_currency(amount, currency: str = "Euro") -> str:
     """Format amount as currency in Euro."""
     if pd.isna(amount) or amount == 0:
@@ -90,6 +110,24 @@ def clean_numeric_column(series: pd.Series) -> pd.Series:
     
     return pd.to_numeric(series, errors='coerce')
 
+def parse_salary_range(series: pd.Series) -> pd.DataFrame:
+    """Parse posted salary ranges into numeric 'low'/'high' columns (local currency).
+
+    Runs as a single vectorized regex extraction; rows that don't look like a range
+    come back as NaN so callers can choose their own fallback.
+    """
+    parts = series.astype(str).str.extract(_SALARY_RANGE_PATTERN)
+    bounds = {}
+    for side in ('low', 'high'):
+        amount = pd.to_numeric(parts[side].str.replace(',', '', regex=False), errors='coerce')
+        unit = parts[f'{side}_unit'].fillna('').str.lower().map(_SALARY_UNIT_MULTIPLIERS)
+        bounds[side] = amount.to_numpy(dtype=float) * unit.to_numpy(dtype=float)
+
+    return pd.DataFrame({
+        'low': np.fmin(bounds['low'], bounds['high']),
+        'high': np.fmax(bounds['low'], bounds['high']),
+    }, index=series.index)
+
 def generate_country_flag_emoji(country: str) -> str:
     """Generate flag emoji for country (fallback to text)."""
     flag_map = {
@@ -121,6 +159,23 @@ def create_summary_stats(data: pd.DataFrame, column: str) -> dict:
         'q75': series.quantile(0.75)
     }
 
+def segment_quantile(sorted_values: np.ndarray, starts: np.ndarray, counts: np.ndarray,
+                     fraction: float) -> np.ndarray:
+    """Quantile of each segment of an array sorted within contiguous segments.
+
+    Interpolates linearly between the closest ranks, as pandas' quantile() does;
+    empty segments give NaN.
+    """
+    result = np.full(len(counts), np.nan)
+    present = counts > 0
+    rank = (counts[present] - 1) * fraction
+    below = np.floor(rank).astype(np.intp)
+    above = np.ceil(rank).astype(np.intp)
+    low_values = sorted_values[starts[present] + below]
+    high_values = sorted_values[starts[present] + above]
+    result[present] = low_values + (high_values - low_values) * (rank - below)
+    return result
+
 def format_large_number(number: float) -> str:
     """Format large numbers with appropriate suffixes."""
     if abs(number) >= 1e9:
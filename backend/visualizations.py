@@ -1,9 +1,15 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 from utils import format_currency, get_vibrant_colors
 
+# plotly.express takes a noticeable part of a cold start, so plotly is
+# imported by the chart methods on first use rather than with this module.
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+
 class ChartGenerator:
     def __init__(self):
         self.colors = get_vibrant_colors()
@@ -16,6 +22,7 @@ class ChartGenerator:
     
     def create_country_salary_chart(self, data: pd.DataFrame) -> go.Figure:
         """Create vibrant bar chart showing average salaries by country."""
+        import plotly.express as px
         country_data = data.groupby('Country')['Salary_Avg_USD'].mean().reset_index()
         country_data['Salary_Formatted'] = country_data['Salary_Avg_USD'].apply(format_currency)
         
@@ -43,6 +50,7 @@ class ChartGenerator:
     
     def create_role_salary_chart(self, data: pd.DataFrame) -> go.Figure:
         """Create vibrant bar chart showing average salaries by role."""
+        import plotly.express as px
         role_data = data.groupby('Role_Name')['Salary_Avg_USD'].mean().reset_index()
         role_data = role_data.sort_values('Salary_Avg_USD', ascending=True)
         role_data['Salary_Formatted'] = role_data['Salary_Avg_USD'].apply(format_currency)
@@ -72,6 +80,7 @@ class ChartGenerator:
     
     def create_team_setup_chart(self, data: pd.DataFrame) -> go.Figure:
         """Create vibrant sunburst chart showing team setup distribution."""
+        import plotly.express as px
         team_data = data.groupby(['Team_Setup', 'Country']).size().reset_index(name='Count')
         
         fig = px.sunburst(
@@ -93,6 +102,7 @@ class ChartGenerator:
     
     def create_salary_heatmap(self, data: pd.DataFrame) -> go.Figure:
         """Create vibrant heatmap showing salary distribution across countries and roles."""
+        import plotly.graph_objects as go
         # Create pivot table
         heatmap_data = data.pivot_table(
             values='Salary_Avg_USD',
@@ -127,6 +137,7 @@ class ChartGenerator:
     
     def create_forecast_chart(self, forecast_data: pd.DataFrame, group_by: str) -> go.Figure:
         """Create line chart showing salary forecasts."""
+        import plotly.graph_objects as go
         if forecast_data.empty:
             return go.Figure()
         
@@ -177,6 +188,8 @@ class ChartGenerator:
     
     def create_economic_chart(self, data: pd.DataFrame, metric: str, title: str) -> go.Figure:
         """Create bar chart for economic metrics."""
+        import plotly.express as px
+        import plotly.graph_objects as go
         if data.empty or metric not in data.columns:
             return go.Figure()
         
@@ -204,6 +217,8 @@ class ChartGenerator:
     
     def create_sentiment_chart(self, data: pd.DataFrame) -> go.Figure:
         """Create pie chart for workforce sentiment distribution."""
+        import plotly.express as px
+        import plotly.graph_objects as go
         if data.empty or 'Workforce_Sentiment' not in data.columns:
             return go.Figure()
         
@@ -228,6 +243,7 @@ class ChartGenerator:
     
     def create_comparison_chart(self, data: pd.DataFrame) -> go.Figure:
         """Create comparison chart for salary ranges."""
+        import plotly.graph_objects as go
         if data.empty:
             return go.Figure()
         
@@ -0,0 +1,72 @@
+"""Polling file watcher, used to reload the BMW workbook when it is replaced.
+
+Every worker runs its own watcher, so a changed file reaches all of them
+without a request having to land on each one. Changes are debounced: the
+callback runs once the file's mtime and size have stayed the same for
+`debounce` seconds, so a workbook that is still being copied is not parsed
+half-written. mtime polling needs no platform support (inotify is not
+available on every host or shared volume) and one stat() per interval is
+negligible next to a reload.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class FileWatcher:
+    """Calls `on_change()` on a background thread after `path` changes and settles."""
+
+    def __init__(self, path: str, on_change: Callable[[], object], interval: float = 2.0,
+                 debounce: float = 5.0):
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        self.debounce = debounce
+        self.changes = 0
+        self._seen = self._loaded = self._signature()
+        self._changed_at: Optional[float] = None
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:  # missing, or being replaced right now
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def poll(self, now: Optional[float] = None) -> bool:
+        """Check the file once; returns True when on_change() ran."""
+        now = time.monotonic() if now is None else now
+        signature = self._signature()
+        if signature != self._seen:
+            self._seen, self._changed_at = signature, now
+            return False
+        if (self._changed_at is None or now - self._changed_at < self.debounce
+                or signature is None or signature == self._loaded):
+            return False
+
+        self._changed_at, self._loaded = None, signature
+        self.changes += 1
+        logger.info(f"{self.path} changed, reloading")
+        try:
+            self.on_change()
+        except Exception as e:
+            logger.error(f"Reloading {self.path} failed: {e}", exc_info=True)
+        return True
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.poll()
+
+    def start(self) -> threading.Thread:
+        self._thread = threading.Thread(target=self._run, name='file-watcher', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stopped.set()
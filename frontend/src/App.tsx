@@ -92,6 +92,8 @@ export default function App() {
 
   // UI state
   const [dataLoaded, setDataLoaded] = useState(false)
+  // Uploaded dataset to read from; null means the shared default dataset
+  const [datasetId, setDatasetId] = useState<string | null>(null)
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState<string | null>(null)
   const [activeTab, setActiveTab] = useState('overview')
@@ -140,7 +142,8 @@ export default function App() {
     setError(null)
     try {
       await axios.post(`${API_BASE}/init`)
-      await loadData()
+      setDatasetId(null)
+      await loadData(null)
       setDataLoaded(true)
     } catch (err: any) {
       setError(err.response?.data?.error || 'Failed to initialize data')
@@ -166,10 +169,11 @@ export default function App() {
     formData.append('file', file)
 
     try {
-      await axios.post(`${API_BASE}/upload`, formData, {
+      const response = await axios.post(`${API_BASE}/upload`, formData, {
         headers: { 'Content-Type': 'multipart/form-data' }
       })
-      await loadData()
+      setDatasetId(response.data.dataset_id)
+      await loadData(response.data.dataset_id)
       setDataLoaded(true)
       // Reset file input
       e.target.value = ''
@@ -182,15 +186,16 @@ export default function App() {
     }
   }
 
-  const loadData = async () => {
+  const loadData = async (dataset: string | null = datasetId) => {
     try {
+      const config = dataset ? { params: { dataset } } : {}
       const [summaryRes, countryRes, roleRes, salaryRes, economicRes, legalRes] = await Promise.all([
-        axios.get(`${API_BASE}/data/summary`),
-        axios.get(`${API_BASE}/data/by-country`),
-        axios.get(`${API_BASE}/data/by-role`),
-        axios.get(`${API_BASE}/data/salaries`),
-        axios.get(`${API_BASE}/economic`),
-        axios.get(`${API_BASE}/legal`)
+        axios.get(`${API_BASE}/data/summary`, config),
+        axios.get(`${API_BASE}/data/by-country`, config),
+        axios.get(`${API_BASE}/data/by-role`, config),
+        axios.get(`${API_BASE}/data/salaries`, config),
+        axios.get(`${API_BASE}/economic`, config),
+        axios.get(`${API_BASE}/legal`, config)
       ])
 
       setSummary(summaryRes.data)
@@ -226,6 +231,7 @@ export default function App() {
       // Use first selected country and role for forecast (or 'all' if none selected)
       if (selectedCountries.length > 0) params.append('country', selectedCountries[0])
       if (selectedRoles.length > 0) params.append('role', selectedRoles[0])
+      if (datasetId) params.append('dataset', datasetId)
       
       const response = await axios.get(`${API_BASE}/forecast?${params}`)
       
@@ -18,7 +18,6 @@ requirements = [
     "pandas>=2.3.0",
     "numpy>=2.3.1",
     "plotly>=6.2.0",
-    "scikit-learn>=1.7.0",
     "openpyxl>=3.1.5",
 ]
 
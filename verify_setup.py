@@ -33,7 +33,6 @@ def check_packages():
         'flask': '2.3.2',
         'pandas': '2.3.0',
         'numpy': '2.3.1',
-        'sklearn': '1.7.0',
         'plotly': '6.2.0',
         'flask_cors': '4.0.0',
         'openpyxl': '3.1.5'
@@ -42,16 +41,10 @@ def check_packages():
     all_installed = True
     for package, expected_version in required.items():
         try:
-            if package == 'sklearn':
-                import sklearn
-                version = sklearn.__version__
-                package_name = 'scikit-learn'
-            else:
-                module = __import__(package)
-                version = module.__version__
-                package_name = package
+            module = __import__(package)
+            version = module.__version__
             
-            print(f"✓ {package_name} {version}")
+            print(f"✓ {package} {version}")
         except ImportError:
             print(f"✗ {package} NOT INSTALLED")
             all_installed = False